@@ -1,10 +1,237 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
-import pickle
 import hashlib
-from src.sphincs import spx_keygen, spx_sign, spx_verify
-from src.parameters import get_parameters
+import queue
+import threading
+from src.sphincs import spx_keygen, spx_sign, spx_verify, sig_to_bytes
+from src.parameters import get_parameters, PRF_BLAKE2B, PRF_LEGACY
+from src.formats import read_signature, write_signature, read_key, write_key, FORMAT_PICKLE, FORMAT_BINARY
+from src import instrument
+from src.batch import run_batch, list_files, BatchTotals, OP_SIGN, OP_VERIFY
+
+# File types of the signature save dialog, the chosen one selects the format written.
+SIG_FILETYPES = {
+    "Подпись, pickle (совместима со старыми версиями)": FORMAT_PICKLE,
+    "Подпись, компактный двоичный формат": FORMAT_BINARY
+}
+
+POLL_MS = 50
+HASH_CHUNK = 1 << 20
+
+class Task:
+    """Длительная операция в фоновом потоке: прогресс и результат передаются через очередь, которую опрашивает Tk."""
+
+    def __init__(self, work, params):
+        self.params = params
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.stage = None
+        self.layers_done = 0
+        self.thread = threading.Thread(target=self._run, args=(work,), name="spx-gui-task", daemon=True)
+
+    def report(self, stage, done, total):
+        """Колбэк прогресса; после нажатия «Отмена» прерывает операцию исключением Cancelled."""
+        if self.cancel_event.is_set():
+            raise instrument.Cancelled()
+        self.queue.put(("progress", stage, done, total))
+
+    def _run(self, work):
+        try:
+            with instrument.reporting(self.report):
+                result = work(self.report)
+        except instrument.Cancelled:
+            self.queue.put(("cancelled",))
+        except Exception as e:
+            self.queue.put(("error", e))
+        else:
+            self.queue.put(("done", result))
+
+    def describe(self, stage, done, total):
+        """Текст и процент выполнения для события прогресса."""
+        if stage == "xmss" and self.stage in ("fors", "ht"):
+            d = self.params.d
+            layer = min(self.layers_done, d - 1)
+            return f"Слой гипердерева {layer + 1} из {d}: листья {done}/{total}", 100 * (layer + done / total) / d
+        if stage == "ht":
+            self.layers_done = done
+        if stage != "xmss":
+            self.stage = stage
+        if stage == "hash":
+            return f"Хэширование файла: {done / 2**20:.1f} из {total / 2**20:.1f} МБ", 100 * done / total if total else 100
+        if stage == "fors":
+            return f"Деревья FORS: {done} из {total}", 100 * done / total
+        if stage == "ht":
+            return f"Слои гипердерева: {done} из {total}", 100 * done / total
+        return f"Дерево XMSS: листья {done} из {total}", 100 * done / total
+
+class BatchWindow:
+    """Пакетный режим: файлы хэшируются и подписываются (или проверяются) параллельно в пуле процессов,
+    подписи сохраняются рядом с файлами (<файл>.sig)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.files = []
+        self.rows = {}
+        self.queue = queue.Queue()
+        self.cancel_event = None
+        self.totals = None
+        self.running = False
+        self.closing = False
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Пакетный режим")
+        self.window.geometry("900x560")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = ttk.Frame(self.window, padding="5")
+        controls.pack(fill="x")
+        self.select_files_button = ttk.Button(controls, text="Выбрать файлы", command=self.select_files)
+        self.select_files_button.pack(side="left", padx=5)
+        self.select_dir_button = ttk.Button(controls, text="Выбрать папку", command=self.select_directory)
+        self.select_dir_button.pack(side="left", padx=5)
+        ttk.Label(controls, text="Процессов:").pack(side="left", padx=5)
+        self.workers_var = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Spinbox(controls, from_=1, to=256, textvariable=self.workers_var, width=5).pack(side="left")
+        self.sign_button = ttk.Button(controls, text="Подписать все", command=lambda: self.start(OP_SIGN))
+        self.sign_button.pack(side="left", padx=5)
+        self.verify_button = ttk.Button(controls, text="Проверить все", command=lambda: self.start(OP_VERIFY))
+        self.verify_button.pack(side="left", padx=5)
+        self.cancel_button = ttk.Button(controls, text="Отмена", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+
+        table_frame = ttk.Frame(self.window, padding="5")
+        table_frame.pack(fill="both", expand=True)
+        self.table = ttk.Treeview(table_frame, columns=("size", "status", "time"))
+        self.table.heading("#0", text="Файл")
+        self.table.heading("size", text="Размер")
+        self.table.heading("status", text="Статус")
+        self.table.heading("time", text="Время")
+        self.table.column("#0", width=480)
+        self.table.column("size", width=100, anchor="e")
+        self.table.column("status", width=180)
+        self.table.column("time", width=90, anchor="e")
+        self.table.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.table.config(yscrollcommand=scrollbar.set)
+
+        self.totals_label = ttk.Label(self.window, text="Файлы не выбраны", padding="5")
+        self.totals_label.pack(fill="x")
+
+    def select_files(self):
+        paths = filedialog.askopenfilenames(parent=self.window, title="Выберите файлы")
+        if paths:
+            self.set_files(list(paths))
+
+    def select_directory(self):
+        directory = filedialog.askdirectory(parent=self.window, title="Выберите папку")
+        if directory:
+            self.set_files(list_files([directory]))
+
+    def set_files(self, files):
+        self.files = files
+        self.table.delete(*self.table.get_children())
+        self.rows = {path: self.table.insert("", "end", text=path, values=(f"{os.path.getsize(path) / 2**20:.2f} МБ", "ожидает", ""))
+                     for path in files}
+        self.totals_label.config(text=f"Выбрано файлов: {len(files)}")
+
+    def start(self, op):
+        app = self.app
+        if not self.files:
+            messagebox.showerror("Ошибка", "Сначала выберите файлы или папку!", parent=self.window)
+            return
+        if op == OP_SIGN and not app.sk:
+            messagebox.showerror("Ошибка", "Сначала сгенерируйте или загрузите секретный ключ!", parent=self.window)
+            return
+        if op == OP_VERIFY and not (app.pk or app.sk):
+            messagebox.showerror("Ошибка", "Сначала загрузите или сгенерируйте открытый ключ!", parent=self.window)
+            return
+        key = app.sk if op == OP_SIGN else (app.pk or app.sk)
+        files, params, workers = list(self.files), app.params, max(1, self.workers_var.get())
+
+        for path in files:
+            self.table.set(self.rows[path], "status", "ожидает")
+            self.table.set(self.rows[path], "time", "")
+        self.set_running(True)
+        self.totals = BatchTotals(len(files))
+        self.cancel_event = threading.Event()
+        cancel_event = self.cancel_event
+
+        def work():
+            try:
+                for result in run_batch(op, files, key, params=params, workers=workers, cancel=cancel_event):
+                    self.queue.put(("result", result))
+            except Exception as e:
+                self.queue.put(("error", e))
+            self.queue.put(("finished",))
+
+        threading.Thread(target=work, name="spx-gui-batch", daemon=True).start()
+        self.window.after(POLL_MS, self.poll)
+
+    def set_running(self, running):
+        self.running = running
+        state = "disabled" if running else "normal"
+        for button in (self.select_files_button, self.select_dir_button, self.sign_button, self.verify_button):
+            button.config(state=state)
+        self.cancel_button.config(state="normal" if running else "disabled")
+
+    def poll(self):
+        finished = False
+        while True:
+            try:
+                message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "result":
+                self.show_result(message[1])
+            elif message[0] == "error":
+                messagebox.showerror("Ошибка", f"Пакетная обработка прервана: {message[1]}", parent=self.window)
+            else:
+                finished = True
+        self.show_totals(finished)
+        if not finished:
+            self.window.after(POLL_MS, self.poll)
+            return
+        for path in self.files:
+            if self.table.set(self.rows[path], "status") == "ожидает":
+                self.table.set(self.rows[path], "status", "отменено")
+        self.set_running(False)
+        if self.closing:
+            self.window.destroy()
+
+    def show_result(self, result):
+        self.totals.add(result)
+        row = self.rows[result["path"]]
+        if "error" in result:
+            status = f"ошибка: {result['error']}"
+        elif "valid" in result:
+            status = "подпись верна" if result["valid"] else "подпись неверна"
+        else:
+            status = "подписан"
+        self.table.set(row, "status", status)
+        self.table.set(row, "time", f"{result['seconds']:.2f} с")
+        self.table.see(row)
+
+    def show_totals(self, finished):
+        totals = self.totals
+        text = (f"Готово: {totals.done} из {totals.files}, ошибок: {totals.failed}, {totals.elapsed():.1f} с, "
+                f"{totals.files_per_second():.2f} файлов/с, {totals.bytes_per_second() / 2**20:.2f} МБ/с")
+        if finished and self.cancel_event.is_set():
+            text += " (отменено)"
+        self.totals_label.config(text=text)
+
+    def cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_button.config(state="disabled")
+
+    def close(self):
+        if self.running:
+            self.closing = True
+            self.cancel()
+        else:
+            self.window.destroy()
 
 class GUI:
     def __init__(self, root):
@@ -18,7 +245,9 @@ class GUI:
         self.signature = None
         self.file_path = None
         self.instance = "128f"
-        self.params = get_parameters(self.instance)
+        self.prf = PRF_BLAKE2B
+        self.params = get_parameters(self.instance, prf=self.prf)
+        self.task = None
 
         self.create_widgets()
 
@@ -40,6 +269,11 @@ class GUI:
         self.instance_var.trace("w", self.update_instance)
         ttk.Combobox(param_frame, textvariable=self.instance_var, values=instances, state="readonly", width=10).grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
+        ttk.Label(param_frame, text="PRF:").grid(row=0, column=2, padx=5, pady=5, sticky="e")
+        self.prf_var = tk.StringVar(value=self.prf)
+        self.prf_var.trace("w", self.update_instance)
+        ttk.Combobox(param_frame, textvariable=self.prf_var, values=[PRF_BLAKE2B, PRF_LEGACY], state="readonly", width=10).grid(row=0, column=3, padx=5, pady=5, sticky="w")
+
         key_frame = ttk.LabelFrame(main_frame, text="Управление ключами", padding="5")
         key_frame.pack(fill="x", pady=5)
 
@@ -55,6 +289,7 @@ class GUI:
         self.file_label = ttk.Label(file_frame, text="Файл не выбран", width=50, anchor="w")
         self.file_label.grid(row=0, column=1, padx=5, pady=5, sticky="w")
         ttk.Button(file_frame, text="Выбрать файл", command=self.select_file).grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(file_frame, text="Пакетный режим", command=self.open_batch).grid(row=0, column=3, padx=5, pady=5)
 
         ttk.Button(file_frame, text="Подписать файл (хэш)", command=self.sign_file_hash_with_progress).grid(row=1, column=1, padx=5, pady=5)
         ttk.Button(file_frame, text="Проверить файл", command=self.verify_file).grid(row=2, column=1, padx=5, pady=5)
@@ -72,7 +307,8 @@ class GUI:
 
     def update_instance(self, *args):
         self.instance = self.instance_var.get()
-        self.params = get_parameters(self.instance)
+        self.prf = self.prf_var.get()
+        self.params = get_parameters(self.instance, prf=self.prf)
         self.update_result(f"Выбран набор параметров: {self.instance}\nПараметры: {self.params}")
 
     def select_file(self):
@@ -81,43 +317,105 @@ class GUI:
             self.file_label.config(text=os.path.basename(self.file_path))
             self.update_result(f"Выбран файл: {self.file_path}")
 
+    def run_task(self, title, work, on_done, on_error=None):
+        """
+        Выполняет work(report) в фоновом потоке, показывая окно с прогрессом и кнопкой «Отмена».
+        on_done(result) и on_error(exception) вызываются в потоке Tk.
+        """
+        if self.task is not None:
+            return
+        task = Task(work, self.params)
+        self.task = task
+
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title(title)
+        progress_window.geometry("400x140")
+        progress_window.transient(self.root)
+        progress_window.grab_set()
+
+        status = ttk.Label(progress_window, text="Подготовка...")
+        status.pack(pady=10)
+        progress_bar = ttk.Progressbar(progress_window, mode="determinate", length=340, maximum=100)
+        progress_bar.pack(pady=5)
+
+        def cancel():
+            task.cancel_event.set()
+            status.config(text="Отмена...")
+            cancel_button.state(["disabled"])
+
+        cancel_button = ttk.Button(progress_window, text="Отмена", command=cancel)
+        cancel_button.pack(pady=5)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+
+        def finish(message):
+            progress_window.destroy()
+            self.task = None
+            if message[0] == "done":
+                on_done(message[1])
+            elif message[0] == "cancelled":
+                self.update_result(f"Операция отменена: {title}")
+            elif on_error is not None:
+                on_error(message[1])
+            else:
+                messagebox.showerror("Ошибка", f"{title}: {message[1]}")
+                self.update_result(f"{title}: ошибка: {message[1]}")
+
+        def poll():
+            text = None
+            while True:
+                try:
+                    message = task.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message[0] != "progress":
+                    finish(message)
+                    return
+                text, percent = task.describe(*message[1:])
+            if text is not None and not task.cancel_event.is_set():
+                status.config(text=text)
+                progress_bar["value"] = percent
+            self.root.after(POLL_MS, poll)
+
+        task.thread.start()
+        self.root.after(POLL_MS, poll)
+
+    def open_batch(self):
+        BatchWindow(self)
+
     def generate_keys(self):
-        self.sk, self.pk = spx_keygen(params=self.params)
-        self.update_result(f"Ключи успешно сгенерированы!\n"
-                          f"Набор параметров: {self.instance}\n"
-                          f"Секретный ключ: {[x.hex()[:16] + '...' for x in self.sk]}\n"
-                          f"Открытый ключ: {[x.hex()[:16] + '...' for x in self.pk]}")
+        params = self.params
+
+        def done(keys):
+            self.sk, self.pk = keys
+            self.update_result(f"Ключи успешно сгенерированы!\n"
+                              f"Набор параметров: {params.instance}\n"
+                              f"Секретный ключ: {[x.hex()[:16] + '...' for x in self.sk]}\n"
+                              f"Открытый ключ: {[x.hex()[:16] + '...' for x in self.pk]}")
+
+        self.run_task("Генерация ключей", lambda report: spx_keygen(params=params), done)
 
     def sign_file_hash_with_progress(self):
-        """Подпись файла с прогресс-баром в отдельном окне."""
+        """Подпись файла в фоновом потоке с прогрессом в отдельном окне."""
         if not self.sk:
             messagebox.showerror("Ошибка", "Сначала сгенерируйте или загрузите секретный ключ!")
             return
         if not self.file_path:
             messagebox.showerror("Ошибка", "Сначала выберите файл!")
             return
+        file_path, sk, params = self.file_path, self.sk, self.params
 
-        progress_window = tk.Toplevel(self.root)
-        progress_window.title("Подпись файла")
-        progress_window.geometry("300x100")
-        progress_window.transient(self.root)
-        progress_window.grab_set()
-
-        ttk.Label(progress_window, text="Выполняется подпись...").pack(pady=10)
-        progress_bar = ttk.Progressbar(progress_window, mode="indeterminate", length=200)
-        progress_bar.pack(pady=10)
-        progress_bar.start(10)
+        def work(report):
+            file_hash = self.compute_file_hash(file_path, report)
+            return file_hash, spx_sign(file_hash, sk, params=params)
 
-        def perform_signing():
-            file_hash = self.compute_file_hash(self.file_path)
-            self.signature = spx_sign(file_hash, self.sk, params=self.params)
+        def done(result):
+            file_hash, self.signature = result
             self.update_result(f"Хэш файла подписан!\n"
                               f"Хэш: {file_hash.hex()[:16]}...\n"
-                              f"Длина подписи: {sum(len(x) if isinstance(x, bytes) else len(x) for x in self.signature)} байт "
-                              f"({len(self.signature)} компонентов)")
-            progress_window.destroy()
+                              f"Длина подписи: {len(self.signature)} байт "
+                              f"(R: {params.n}, FORS: {params.fors_bytes}, HT: {params.ht_bytes})")
 
-        self.root.after(100, perform_signing)
+        self.run_task("Подпись файла", work, done)
 
     def verify_file(self):
         if not self.pk:
@@ -129,22 +427,36 @@ class GUI:
         if not self.file_path:
             messagebox.showerror("Ошибка", "Сначала выберите файл!")
             return
-        file_hash = self.compute_file_hash(self.file_path)
-        try:
-            result = spx_verify(file_hash, self.signature, self.pk, params=self.params)
-            self.update_result(f"Результат проверки: {'Подпись верна' if result else 'Подпись неверна'}\n"
+        file_path, signature, pk, params = self.file_path, self.signature, self.pk, self.params
+
+        def work(report):
+            file_hash = self.compute_file_hash(file_path, report)
+            return file_hash, spx_verify(file_hash, signature, pk, params=params)
+
+        def done(result):
+            file_hash, valid = result
+            self.update_result(f"Результат проверки: {'Подпись верна' if valid else 'Подпись неверна'}\n"
                               f"Проверенный хэш: {file_hash.hex()[:16]}...\n"
-                              f"Набор параметров: {self.instance}")
-        except Exception as e:
+                              f"Набор параметров: {params.instance}")
+
+        def failed(e):
             messagebox.showerror("Ошибка проверки", f"Не удалось проверить: {str(e)}")
             self.update_result(f"Проверка не удалась: {str(e)}\n"
-                              f"Набор параметров: {self.instance}")
+                              f"Набор параметров: {params.instance}")
 
-    def compute_file_hash(self, file_path):
+        self.run_task("Проверка файла", work, done, failed)
+
+    def compute_file_hash(self, file_path, report=None):
+        """Хэш файла; report(stage, done, total) получает число обработанных байт."""
         blake2b = hashlib.blake2b()
+        total = os.path.getsize(file_path)
+        done = 0
         with open(file_path, 'rb') as f:
-            while chunk := f.read(8192):
+            while chunk := f.read(HASH_CHUNK):
                 blake2b.update(chunk)
+                done += len(chunk)
+                if report is not None:
+                    report("hash", done, total)
         return blake2b.digest()
 
     def save_keys(self):
@@ -159,10 +471,8 @@ class GUI:
         if base_name:
             sk_file = f"{base_name}.sk"
             pk_file = f"{base_name}.pk"
-            with open(sk_file, 'wb') as f:
-                pickle.dump(self.sk, f)
-            with open(pk_file, 'wb') as f:
-                pickle.dump(self.pk, f)
+            write_key(sk_file, self.sk, self.params)
+            write_key(pk_file, self.pk, self.params)
             self.update_result(f"Ключи сохранены:\nСекретный ключ: {sk_file}\nОткрытый ключ: {pk_file}")
 
     def load_keys(self):
@@ -170,8 +480,12 @@ class GUI:
         if choice:
             sk_file = filedialog.askopenfilename(title="Загрузить секретный ключ", filetypes=[("Файлы секретного ключа", "*.sk")])
             if sk_file:
-                with open(sk_file, 'rb') as f:
-                    self.sk = pickle.load(f)
+                try:
+                    key_params, self.sk, _ = read_key(sk_file, self.instance)
+                except (OSError, ValueError) as e:
+                    messagebox.showerror("Ошибка загрузки ключа", f"Не удалось загрузить {sk_file}: {e}")
+                    return
+                self.apply_key_params(key_params)
                 self.update_result(f"Секретный ключ загружен: {sk_file}\n"
                                   f"Секретный ключ: {[x.hex()[:16] + '...' for x in self.sk]}")
             else:
@@ -179,8 +493,12 @@ class GUI:
         
         pk_file = filedialog.askopenfilename(title="Загрузить открытый ключ", filetypes=[("Файлы открытого ключа", "*.pk")])
         if pk_file:
-            with open(pk_file, 'rb') as f:
-                self.pk = pickle.load(f)
+            try:
+                key_params, self.pk, _ = read_key(pk_file, self.instance)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Ошибка загрузки ключа", f"Не удалось загрузить {pk_file}: {e}")
+                return
+            self.apply_key_params(key_params)
             self.update_result(self.result_text.get("1.0", tk.END).strip() + 
                               f"\nОткрытый ключ загружен: {pk_file}\n"
                               f"Открытый ключ: {[x.hex()[:16] + '...' for x in self.pk]}")
@@ -188,46 +506,49 @@ class GUI:
             self.update_result(self.result_text.get("1.0", tk.END).strip() + 
                               "\nЗагрузка открытого ключа отменена.")
 
+    def apply_key_params(self, key_params):
+        """Устанавливает набор параметров и PRF ключа (для старых файлов — текущий набор с прежним PRF)."""
+        if key_params != self.params:
+            self.instance_var.set(key_params.instance)
+            self.prf_var.set(key_params.prf)
+
     def save_signature(self):
         if not self.signature or not self.file_path:
             messagebox.showerror("Ошибка", "Сначала подпишите файл!")
             return
         base_name = os.path.splitext(self.file_path)[0]
+        filetype_var = tk.StringVar(value=next(iter(SIG_FILETYPES)))
         sig_file = filedialog.asksaveasfilename(
             initialfile=f"{os.path.basename(base_name)}.sig",
             title="Сохранить подпись",
-            filetypes=[("Файлы подписи", "*.sig")]
+            filetypes=[(label, "*.sig") for label in SIG_FILETYPES],
+            typevariable=filetype_var
         )
         if sig_file:
-            sig_data = {
-                "instance": self.instance,
-                "signature": self.signature
-            }
-            with open(sig_file, 'wb') as f:
-                pickle.dump(sig_data, f)
-            self.update_result(f"Подпись сохранена в {sig_file}\n"
+            fmt = SIG_FILETYPES.get(filetype_var.get(), FORMAT_PICKLE)
+            write_signature(sig_file, self.signature, self.params, fmt=fmt)
+            self.update_result(f"Подпись сохранена в {sig_file} (формат: {fmt})\n"
                               f"Сохранённый набор параметров: {self.instance}")
 
     def load_signature(self):
         sig_file = filedialog.askopenfilename(title="Загрузить подпись", filetypes=[("Файлы подписи", "*.sig")])
         if sig_file:
-            with open(sig_file, 'rb') as f:
-                sig_data = pickle.load(f)
-            if isinstance(sig_data, dict) and "instance" in sig_data and "signature" in sig_data:
-                loaded_instance = sig_data["instance"]
-                self.signature = sig_data["signature"]
+            try:
+                loaded_instance, signature = read_signature(sig_file)
+                self.signature = sig_to_bytes(signature)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Ошибка загрузки подписи", f"Не удалось загрузить {sig_file}: {e}")
+                return
+            if loaded_instance is not None:
                 self.instance_var.set(loaded_instance)
                 self.instance = loaded_instance
-                self.params = get_parameters(self.instance)
+                self.params = get_parameters(self.instance, prf=self.prf)
                 self.update_result(f"Подпись загружена из {sig_file}\n"
-                                  f"Длина подписи: {sum(len(x) if isinstance(x, bytes) else len(x) for x in self.signature)} байт "
-                                  f"({len(self.signature)} компонентов)\n"
+                                  f"Длина подписи: {len(self.signature)} байт\n"
                                   f"Набор параметров автоматически установлен: {loaded_instance}")
             else:
-                self.signature = sig_data
                 self.update_result(f"Подпись загружена из {sig_file}\n"
-                                  f"Длина подписи: {sum(len(x) if isinstance(x, bytes) else len(x) for x in self.signature)} байт "
-                                  f"({len(self.signature)} компонентов)\n"
+                                  f"Длина подписи: {len(self.signature)} байт\n"
                                   f"Предупреждение: Информация о наборе параметров отсутствует. Используется текущий: {self.instance}")
 
     def update_result(self, text):
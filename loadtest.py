@@ -0,0 +1,54 @@
+import argparse
+import json
+from src.loadgen import run_sweep, MODE_THREAD, MODE_PROCESS, OP_SIGN, OP_VERIFY
+from src.parameters import INSTANCES, PRF_BLAKE2B, PRF_LEGACY
+
+def format_ms(seconds):
+    return f"{seconds * 1e3:.2f}" if seconds is not None else "-"
+
+def format_mib(size):
+    return f"{size / 2 ** 20:.1f}" if size is not None else "-"
+
+def print_result(r):
+    latency = r["latency"] or {}
+    workers = r["sign_workers"] if r["sign_workers"] is not None else "-"
+    print(f"{r['instance']:<6} {r['operation']:<7} {r['mode']:<8} {r['clients']:>7} {workers:>8} {r['operations']:>6} {r['errors']:>6} "
+          f"{r['throughput']:>10.2f} {format_ms(latency.get('median')):>9} {format_ms(latency.get('p95')):>9} "
+          f"{format_ms(latency.get('p99')):>9} {format_mib(r['tracemalloc_peak_bytes']):>12} {format_mib(r['rss_peak_bytes']):>9}",
+          flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование spx_sign/spx_verify: параллельные клиенты, задержки, память")
+    parser.add_argument("--instances", nargs="+", default=["128f"], choices=list(INSTANCES) + ["all"],
+                        help="Наборы параметров (по умолчанию: 128f; all — все)")
+    parser.add_argument("--op", nargs="+", default=[OP_SIGN, OP_VERIFY], choices=[OP_SIGN, OP_VERIFY],
+                        help="Операции (по умолчанию: sign verify)")
+    parser.add_argument("--prf", type=str, default=PRF_BLAKE2B, choices=[PRF_BLAKE2B, PRF_LEGACY], help="PRF (по умолчанию: blake2b)")
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4],
+                        help="Числа параллельных клиентов; каждое значение — отдельный прогон (по умолчанию: 1 2 4)")
+    parser.add_argument("--mode", type=str, default=MODE_PROCESS, choices=[MODE_THREAD, MODE_PROCESS],
+                        help="Клиенты — потоки или процессы (по умолчанию: process)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Целевая суммарная частота операций в секунду; 0 — без ограничения (по умолчанию: 0)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона в секундах (по умолчанию: 10)")
+    parser.add_argument("--requests", type=int, help="Ограничить общее число операций в прогоне")
+    parser.add_argument("--sign-workers", nargs="+", type=int,
+                        help="Значения workers для spx_sign (параллельная подпись внутри операции); каждое значение — отдельный прогон подписи")
+    parser.add_argument("--out", type=str, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    instances = list(INSTANCES) if "all" in args.instances else args.instances
+
+    print(f"{'Набор':<6} {'Опер.':<7} {'Режим':<8} {'Клиенты':>7} {'Процессы':>8} {'Опер.':>6} {'Ошибки':>6} {'Опер./с':>10} "
+          f"{'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'heap/оп, МиБ':>12} {'RSS, МиБ':>9}")
+    doc = run_sweep(instances, args.op, args.clients, worker_counts=args.sign_workers or [None], prf=args.prf,
+                    progress=print_result, rate=args.rate or None, duration=args.duration, requests=args.requests,
+                    mode=args.mode)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\nРезультаты сохранены в файл: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 import argparse
+import json
+import logging
 import os
-import pickle
-from src.sphincs import spx_keygen, spx_sign, spx_verify
-from src.parameters import get_parameters
+import signal
+import sys
+import time
+from src.sphincs import spx_keygen, spx_sign, spx_verify, sig_to_bytes
+from src.parameters import get_parameters, PRF_BLAKE2B, PRF_LEGACY
+from src import instrument
+from src.formats import mapped_signature, write_signature, read_key, write_key, FORMAT_PICKLE, FORMAT_BINARY
 
 def compute_file_hash(file_path):
     """Вычисление SHA-256 хэша файла."""
@@ -13,10 +19,112 @@ def compute_file_hash(file_path):
             blake2b.update(chunk)
     return blake2b.digest()
 
+def print_stats(stats):
+    """Вывод счётчиков хэш-вызовов и времени по фазам."""
+    data = stats.as_dict()
+    print("Вызовы hash по типам ADRS:", data["hash"], f"(всего: {stats.total_hashes()})")
+    print("Вызовы PRF по типам ADRS:", data["prf"])
+    print(f"hash_msg: {data['hash_msg']}, prf_msg: {data['prf_msg']}")
+    print("Фазы (время включает вложенные фазы):")
+    for name, phase in sorted(data["phases"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"  {name:<16} {phase['seconds'] * 1000:10.2f} мс  ({phase['calls']} вызовов)")
+
+def print_profile(prof, top):
+    """Вывод профиля: разбивка по структуре SPHINCS+ и самые затратные функции."""
+    print(f"\nПрофиль ({prof.wall * 1000:.2f} мс):")
+    print("Разбивка по структуре (время включает вложенные части):")
+    for label, seconds, calls, share in prof.structure():
+        print(f"  {label:<40} {seconds * 1000:10.2f} мс {share:7.1%}  ({calls} вызовов)")
+    print(f"Функции (топ-{top} по собственному времени):")
+    for name, calls, tottime, cumtime in prof.functions(limit=top):
+        print(f"  {name:<60} {calls:>9} {tottime * 1000:10.2f} мс {cumtime * 1000:10.2f} мс")
+
+def run_operation(args, fn):
+    """Выполняет операцию, при необходимости под профилировщиком (--profile) или со счётчиками (--stats)."""
+    if args.profile:
+        from src.profiling import profiled
+        with profiled(sample_stacks=args.profile_collapsed is not None) as prof:
+            result = fn()
+        print_profile(prof, args.profile_top)
+        if args.profile_pstats:
+            prof.dump_stats(args.profile_pstats)
+            print(f"pstats сохранён в: {args.profile_pstats}")
+        if args.profile_collapsed:
+            prof.write_collapsed(args.profile_collapsed)
+            print(f"Стеки для flamegraph сохранены в: {args.profile_collapsed}")
+        return result
+    if args.stats:
+        with instrument.collect() as stats:
+            result = fn()
+        print_stats(stats)
+        return result
+    return fn()
+
+def params_from_key(key_params, params):
+    """Набор параметров, записанный в файле ключа, имеет приоритет над аргументами командной строки."""
+    if key_params != params:
+        print(f"Предупреждение: Ключ создан для {key_params.instance} (PRF: {key_params.prf}), "
+              f"а указано {params.instance} (PRF: {params.prf}). Используются параметры ключа.")
+    return key_params
+
+def load_daemon_keys(args):
+    """Ключи демона: --key ИМЯ=ПУТЬ или --key ПУТЬ (имя — имя файла без расширения), а также --sk/--pk."""
+    specs = list(args.key or [])
+    specs += [path for path in (args.sk, args.pk) if path]
+    keys = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            path = spec
+            name = os.path.splitext(os.path.basename(spec))[0]
+        key_params, key, _ = read_key(path, args.instance)
+        if name in keys and len(keys[name][1]) > len(key):
+            continue
+        keys[name] = (key_params, key)
+    return keys
+
+def daemon_key_id(client, key_id):
+    """Имя ключа для запроса к демону: --key-id или единственный ключ демона."""
+    from src.daemon import DaemonError
+    if key_id:
+        return key_id
+    keys = list(client.health()["keys"])
+    if len(keys) != 1:
+        raise DaemonError(f"у демона несколько ключей ({', '.join(keys)}), укажите --key-id")
+    return keys[0]
+
+def sign_batch(args, params, sk):
+    """Пакетная подпись каталога или списка файлов с отчётом о скорости."""
+    from src.batch import sign_files, list_files, read_manifest, BatchTotals
+    if os.path.isdir(args.sign_batch):
+        files = list_files([args.sign_batch])
+    else:
+        files = read_manifest(args.sign_batch)
+    print(f"Файлов к подписи: {len(files)}")
+
+    totals = BatchTotals(len(files))
+    reported = time.perf_counter()
+    for result in sign_files(files, sk, params=params, workers=args.workers, hash_threads=args.hash_threads,
+                             fmt=args.sig_format):
+        totals.add(result)
+        if "error" in result:
+            print(f"Ошибка: {result['path']}: {result['error']}")
+        if time.perf_counter() - reported >= 1.0:
+            reported = time.perf_counter()
+            print(f"  {totals.done}/{totals.files} файлов, {totals.files_per_second():.2f} файлов/с, "
+                  f"{totals.bytes_per_second() / 2**20:.2f} МБ/с", flush=True)
+
+    print(f"Подписано файлов: {totals.done - totals.failed} из {totals.files}, ошибок: {totals.failed}")
+    print(f"Время: {totals.elapsed():.2f} с, {totals.files_per_second():.2f} файлов/с, "
+          f"{totals.bytes_per_second() / 2**20:.2f} МБ/с ({totals.bytes} байт)")
+    print(f"Подписи сохранены рядом с файлами (<файл>.sig, формат: {args.sig_format})")
+
 def main():
     parser = argparse.ArgumentParser(description="Консольный инструмент для работы с SPHINCS+")
     parser.add_argument("--instance", type=str, default="256f", choices=["128s", "128f", "192s", "192f", "256s", "256f"],
                         help="Набор параметров SPHINCS+ (по умолчанию: 256f)")
+    parser.add_argument("--prf", type=str, default=PRF_BLAKE2B, choices=[PRF_BLAKE2B, PRF_LEGACY],
+                        help="PRF для генерации секретных значений (по умолчанию: blake2b; legacy — как в старых версиях). PRF ключа из файла имеет приоритет, старые ключи pickle читаются с legacy")
     
     parser.add_argument("--gen-keys", action="store_true", help="Сгенерировать пару ключей")
     parser.add_argument("--sk-out", type=str, help="Путь для сохранения секретного ключа")
@@ -25,40 +133,139 @@ def main():
     parser.add_argument("--sign", type=str, help="Подписать сообщение (строка или путь к файлу)")
     parser.add_argument("--sk", type=str, help="Путь к файлу секретного ключа для подписи")
     parser.add_argument("--sig-out", type=str, help="Путь для сохранения подписи")
+    parser.add_argument("--sig-format", type=str, default=FORMAT_PICKLE, choices=[FORMAT_PICKLE, FORMAT_BINARY],
+                        help="Формат файла подписи: pickle или компактный бинарный (заголовок + R || FORS || HT). По умолчанию: pickle")
     parser.add_argument("--from-file", action="store_true", help="Указывает, что --sign это путь к файлу, а не строка")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Число процессов: для --sign деревья FORS и слои гипердерева (по умолчанию: 1), "
+                             "для --sign-batch, --serve и --stdin-jsonl пул процессов (по умолчанию: по числу CPU)")
+
+    parser.add_argument("--sign-batch", type=str, metavar="КАТАЛОГ|СПИСОК",
+                        help="Подписать все файлы каталога (рекурсивно) или файлы из списка (по пути в строке); подписи пишутся рядом как <файл>.sig")
+    parser.add_argument("--hash-threads", type=int, default=4, help="Число потоков хэширования файлов для --sign-batch (по умолчанию: 4)")
 
     parser.add_argument("--verify", type=str, help="Проверить сообщение (строка или путь к файлу)")
     parser.add_argument("--pk", type=str, help="Путь к файлу открытого ключа для проверки")
     parser.add_argument("--sig", type=str, help="Путь к файлу подписи для проверки")
 
+    parser.add_argument("--serve", type=str, metavar="SOCKET",
+                        help="Запустить демон подписи/проверки на Unix-сокете (ключи: --key, --sk, --pk; процессов: --workers, по умолчанию по числу CPU)")
+    parser.add_argument("--key", type=str, action="append", metavar="[ИМЯ=]ПУТЬ", help="Ключ, который обслуживает демон (можно повторять)")
+    parser.add_argument("--no-warm-up", action="store_true", help="Не заполнять кэши демона заранее")
+    parser.add_argument("--daemon", type=str, metavar="SOCKET", help="Подписывать/проверять через запущенный демон")
+    parser.add_argument("--key-id", type=str, help="Имя ключа демона для --sign/--verify через --daemon")
+    parser.add_argument("--daemon-health", action="store_true", help="Показать состояние демона (с --daemon)")
+    parser.add_argument("--daemon-stats", action="store_true", help="Показать статистику демона (с --daemon)")
+
+    parser.add_argument("--stdin-jsonl", action="store_true",
+                        help="Читать записи подписи/проверки в JSONL из stdin и писать результаты в JSONL в stdout (ключи: --key, --sk, --pk; процессов: --workers, 0 — по числу CPU)")
+    parser.add_argument("--ordered", action="store_true", help="Выводить результаты --stdin-jsonl в порядке входных записей")
+    parser.add_argument("--max-pending", type=int, help="Максимум пачек записей в обработке для --stdin-jsonl (по умолчанию: 2 × процессов)")
+
+    parser.add_argument("--stats", action="store_true", help="Показать число вызовов hash/PRF и время по фазам")
+    parser.add_argument("--profile", action="store_true",
+                        help="Выполнить операцию под профилировщиком и показать разбивку по FORS, слоям гипердерева, WOTS+, PRF и хэшированию сообщения")
+    parser.add_argument("--profile-pstats", type=str, help="Сохранить данные профилировщика в формате pstats (с --profile)")
+    parser.add_argument("--profile-collapsed", type=str,
+                        help="Сохранить сэмплированные стеки в формате collapsed для flamegraph.pl/speedscope (с --profile)")
+    parser.add_argument("--profile-top", type=int, default=15, help="Число функций в отчёте профилировщика (по умолчанию: 15)")
+    parser.add_argument("--verbose", action="store_true", help="Выводить отладочные сообщения библиотеки")
+
     args = parser.parse_args()
+    if (args.stats or args.profile) and args.workers not in (None, 1):
+        print("Ошибка: --stats и --profile учитывают только основной процесс, с --workers больше 1 результаты неполные. Используйте --workers 1.")
+        return
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format="%(name)s: %(message)s")
+
+    params = get_parameters(args.instance, prf=args.prf)
+
+    if args.serve:
+        from src.daemon import SigningDaemon
+        try:
+            keys = load_daemon_keys(args)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки ключа: {e}")
+            return
+        if not keys:
+            print("Ошибка: Укажите ключи демона (--key, --sk или --pk)!")
+            return
+        daemon = SigningDaemon(args.serve, keys, workers=args.workers, warm_up=not args.no_warm_up)
+        print(f"Демон слушает {args.serve}, процессов: {daemon.workers}, ключи: "
+              + ", ".join(f"{name} ({p.instance})" for name, (p, _) in keys.items()))
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            print("Демон остановлен")
+        return
+
+    if args.stdin_jsonl:
+        from src.stream import process_stream
+        try:
+            keys = load_daemon_keys(args)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки ключа: {e}", file=sys.stderr)
+            return
+        if not keys:
+            print("Ошибка: Укажите ключи (--key, --sk или --pk)!", file=sys.stderr)
+            return
+        start = time.perf_counter()
+        stats = process_stream(sys.stdin, sys.stdout, keys, workers=args.workers, max_pending=args.max_pending,
+                               ordered=args.ordered)
+        elapsed = time.perf_counter() - start
+        print(f"Обработано записей: {stats.records}, ошибок: {stats.errors}, {elapsed:.2f} с, "
+              f"{stats.records / elapsed if elapsed > 0 else 0.0:.2f} записей/с", file=sys.stderr)
+        return
+
+    if args.daemon:
+        from src.daemon import DaemonClient, DaemonError
+
+    if args.daemon and (args.daemon_health or args.daemon_stats):
+        try:
+            with DaemonClient(args.daemon) as client:
+                if args.daemon_health:
+                    print(json.dumps(client.health(), indent=2, ensure_ascii=False))
+                if args.daemon_stats:
+                    print(json.dumps(client.stats(), indent=2, ensure_ascii=False))
+        except (DaemonError, OSError) as e:
+            print(f"Ошибка демона: {e}")
+        return
 
-    params = get_parameters(args.instance)
     print(f"Используется набор параметров: {args.instance} -> {params}")
 
     if args.gen_keys:
-        sk, pk = spx_keygen(params=params)
+        sk, pk = run_operation(args, lambda: spx_keygen(params=params))
         print("Секретный ключ:", [x.hex()[:16] + "..." for x in sk])
         print("Открытый ключ:", [x.hex()[:16] + "..." for x in pk])
         
         if args.sk_out:
-            with open(args.sk_out, 'wb') as f:
-                pickle.dump(sk, f)
+            write_key(args.sk_out, sk, params)
             print(f"Секретный ключ сохранён в: {args.sk_out}")
         if args.pk_out:
-            with open(args.pk_out, 'wb') as f:
-                pickle.dump(pk, f)
+            write_key(args.pk_out, pk, params)
             print(f"Открытый ключ сохранён в: {args.pk_out}")
         return
 
-    if args.sign:
+    if args.sign_batch:
         if not args.sk:
             print("Ошибка: Укажите путь к секретному ключу (--sk) для подписи!")
             return
-        
-        with open(args.sk, 'rb') as f:
-            sk = pickle.load(f)
-        
+        if not os.path.exists(args.sign_batch):
+            print(f"Ошибка: {args.sign_batch} не найден!")
+            return
+        key_params, sk, _ = read_key(args.sk, args.instance)
+        sign_batch(args, params_from_key(key_params, params), sk)
+        return
+
+    if args.sign:
+        if not args.sk and not args.daemon:
+            print("Ошибка: Укажите путь к секретному ключу (--sk) для подписи!")
+            return
+
+        if not args.daemon:
+            key_params, sk, _ = read_key(args.sk, args.instance)
+            params = params_from_key(key_params, params)
+
         if args.from_file:
             if not os.path.exists(args.sign):
                 print(f"Ошибка: Файл {args.sign} не найден!")
@@ -69,40 +276,39 @@ def main():
             message = args.sign.encode('utf-8')
             print(f"Сообщение: {args.sign}")
 
-        signature = spx_sign(message, sk, params=params)
-        print(f"Длина подписи: {sum(len(x) if isinstance(x, bytes) else sum(len(y) for y in x) for x in signature)} байт")
-        print(f"Компоненты подписи: {[len(x) if isinstance(x, bytes) else len(x) for x in signature]}")
+        if args.daemon:
+            try:
+                with DaemonClient(args.daemon) as client:
+                    signature, params = client.sign(message, daemon_key_id(client, args.key_id))
+            except (DaemonError, OSError) as e:
+                print(f"Ошибка демона: {e}")
+                return
+            print(f"Подписано демоном {args.daemon} ({params.instance}, PRF: {params.prf})")
+        else:
+            try:
+                signature = run_operation(args, lambda: spx_sign(message, sk, params=params, workers=args.workers))
+            except ValueError as e:
+                print(f"Ошибка подписи: {e}")
+                return
+        print(f"Длина подписи: {len(signature)} байт")
+        print(f"Компоненты подписи (R, FORS, HT): {[params.n, params.fors_bytes, params.ht_bytes]} байт")
 
         if args.sig_out:
-            sig_data = {"instance": args.instance, "signature": signature}
-            with open(args.sig_out, 'wb') as f:
-                pickle.dump(sig_data, f)
-            print(f"Подпись сохранена в: {args.sig_out}")
+            write_signature(args.sig_out, signature, params, fmt=args.sig_format)
+            print(f"Подпись сохранена в: {args.sig_out} (формат: {args.sig_format})")
         return
 
     if args.verify:
-        if not args.pk:
+        if not args.pk and not args.daemon:
             print("Ошибка: Укажите путь к открытому ключу (--pk) для проверки!")
             return
         if not args.sig:
             print("Ошибка: Укажите путь к файлу подписи (--sig) для проверки!")
             return
-        
-        with open(args.pk, 'rb') as f:
-            pk = pickle.load(f)
-        with open(args.sig, 'rb') as f:
-            sig_data = pickle.load(f)
-        
-        if isinstance(sig_data, dict) and "instance" in sig_data and "signature" in sig_data:
-            loaded_instance = sig_data["instance"]
-            signature = sig_data["signature"]
-            if loaded_instance != args.instance:
-                print(f"Предупреждение: Набор параметров подписи ({loaded_instance}) отличается от указанного ({args.instance}). Используется {loaded_instance}.")
-                params = get_parameters(loaded_instance)
-        else:
-            signature = sig_data
-            print("Предупреждение: Файл подписи не содержит информацию о наборе параметров. Используется текущий:", args.instance)
 
+        if not args.daemon:
+            key_params, pk, _ = read_key(args.pk, args.instance)
+            params = params_from_key(key_params, params)
         if args.from_file:
             if not os.path.exists(args.verify):
                 print(f"Ошибка: Файл {args.verify} не найден!")
@@ -113,11 +319,29 @@ def main():
             message = args.verify.encode('utf-8')
             print(f"Сообщение: {args.verify}")
 
-        try:
-            result = spx_verify(message, signature, pk, params=params)
-            print(f"Результат проверки: {'Подпись верна' if result else 'Подпись неверна'}")
-        except Exception as e:
-            print(f"Ошибка проверки: {str(e)}")
+        if args.daemon:
+            try:
+                with mapped_signature(args.sig) as (_, signature), DaemonClient(args.daemon) as client:
+                    result = client.verify(message, sig_to_bytes(signature), daemon_key_id(client, args.key_id))
+            except (DaemonError, OSError) as e:
+                print(f"Ошибка демона: {e}")
+                return
+            print(f"Результат проверки (демон {args.daemon}): {'Подпись верна' if result else 'Подпись неверна'}")
+            return
+
+        with mapped_signature(args.sig) as (loaded_instance, signature):
+            if loaded_instance is not None:
+                if loaded_instance != params.instance:
+                    print(f"Предупреждение: Набор параметров подписи ({loaded_instance}) отличается от указанного ({params.instance}). Используется {loaded_instance}.")
+                    params = get_parameters(loaded_instance, prf=params.prf)
+            else:
+                print("Предупреждение: Файл подписи не содержит информацию о наборе параметров. Используется текущий:", params.instance)
+
+            try:
+                result = run_operation(args, lambda: spx_verify(message, signature, pk, params=params))
+                print(f"Результат проверки: {'Подпись верна' if result else 'Подпись неверна'}")
+            except Exception as e:
+                print(f"Ошибка проверки: {str(e)}")
         return
 
     parser.print_help()
@@ -1,4 +1,15 @@
+import struct
+
+_WORD = struct.Struct(">I")
+_TREE = struct.Struct(">IQ")
+_TYPE = struct.Struct(">IIII")
+
 class ADRS:
+    """
+    32-byte address: layer (4) || tree address (12) || type (4) || word_1 (4) || word_2 (4) || word_3 (4).
+    Fields live in a preallocated bytearray and setters write them in place,
+    hash functions read the buffer through `view` without serializing.
+    """
     WOTS_HASH = 0
     WOTS_PK = 1
     TREE = 2
@@ -6,76 +17,78 @@ class ADRS:
     FORS_ROOTS = 4
     WOTS_PRF = 5
 
-    def __init__(self):
-        self.layer = 0
-        self.tree_address = 0
+    LAYER_OFFSET = 0
+    TREE_OFFSET = 4
+    TYPE_OFFSET = 16
+    WORD_1_OFFSET = 20
+    WORD_2_OFFSET = 24
+    WORD_3_OFFSET = 28
 
-        self.type = 0
+    __slots__ = ("buf", "view")
 
-        self.word_1 = 0
-        self.word_2 = 0
-        self.word_3 = 0
+    def __init__(self, buf=None):
+        self.buf = bytearray(32) if buf is None else bytearray(buf)
+        self.view = memoryview(self.buf)
 
     def copy(self):
-        adrs = ADRS()
-        adrs.layer = self.layer
-        adrs.tree_address = self.tree_address
+        return ADRS(self.buf)
 
-        adrs.type = self.type
-        adrs.word_1 = self.word_1
-        adrs.word_2 = self.word_2
-        adrs.word_3 = self.word_3
-        return adrs
+    def snapshot(self):
+        return bytes(self.buf)
 
     def to_bin(self):
-        adrs = self.layer.to_bytes(4, byteorder='big')
-        adrs += self.tree_address.to_bytes(12, byteorder='big')
-
-        adrs += self.type.to_bytes(4, byteorder='big')
-        adrs += self.word_1.to_bytes(4, byteorder='big')
-        adrs += self.word_2.to_bytes(4, byteorder='big')
-        adrs += self.word_3.to_bytes(4, byteorder='big')
-
-        return adrs
+        return bytes(self.buf)
 
     def reset_words(self):
-        self.word_1 = 0
-        self.word_2 = 0
-        self.word_3 = 0
+        _TYPE.pack_into(self.buf, ADRS.TYPE_OFFSET, self.get_type(), 0, 0, 0)
 
     def set_type(self, val):
-        self.type = val
+        _TYPE.pack_into(self.buf, ADRS.TYPE_OFFSET, val, 0, 0, 0)
 
-        self.word_2 = 0
-        self.word_3 = 0
-        self.word_1 = 0
+    def get_type(self):
+        return _WORD.unpack_from(self.buf, ADRS.TYPE_OFFSET)[0]
 
     def set_layer_address(self, val):
-        self.layer = val
+        _WORD.pack_into(self.buf, ADRS.LAYER_OFFSET, val)
+
+    def get_layer_address(self):
+        return _WORD.unpack_from(self.buf, ADRS.LAYER_OFFSET)[0]
 
     def set_tree_address(self, val):
-        self.tree_address = val
+        _TREE.pack_into(self.buf, ADRS.TREE_OFFSET, val >> 64, val & 0xFFFFFFFFFFFFFFFF)
+
+    def get_tree_address(self):
+        high, low = _TREE.unpack_from(self.buf, ADRS.TREE_OFFSET)
+        return (high << 64) | low
 
     def set_key_pair_address(self, val):
-        self.word_1 = val
+        _WORD.pack_into(self.buf, ADRS.WORD_1_OFFSET, val)
 
     def get_key_pair_address(self):
-        return self.word_1
+        return _WORD.unpack_from(self.buf, ADRS.WORD_1_OFFSET)[0]
 
     def set_chain_address(self, val):
-        self.word_2 = val
+        _WORD.pack_into(self.buf, ADRS.WORD_2_OFFSET, val)
 
     def set_hash_address(self, val):
-        self.word_3 = val
+        _WORD.pack_into(self.buf, ADRS.WORD_3_OFFSET, val)
 
     def set_tree_height(self, val):
-        self.word_2 = val
+        _WORD.pack_into(self.buf, ADRS.WORD_2_OFFSET, val)
 
     def get_tree_height(self):
-        return self.word_2
+        return _WORD.unpack_from(self.buf, ADRS.WORD_2_OFFSET)[0]
 
     def set_tree_index(self, val):
-        self.word_3 = val
+        _WORD.pack_into(self.buf, ADRS.WORD_3_OFFSET, val)
 
     def get_tree_index(self):
-        return self.word_3
\ No newline at end of file
+        return _WORD.unpack_from(self.buf, ADRS.WORD_3_OFFSET)[0]
+
+    # Field access of the former int-backed ADRS
+    layer = property(get_layer_address, set_layer_address)
+    tree_address = property(get_tree_address, set_tree_address)
+    type = property(get_type, lambda self, val: _WORD.pack_into(self.buf, ADRS.TYPE_OFFSET, val))
+    word_1 = property(get_key_pair_address, set_key_pair_address)
+    word_2 = property(get_tree_height, set_tree_height)
+    word_3 = property(get_tree_index, set_tree_index)
@@ -2,25 +2,34 @@
 FORS Function
 """
 
+import logging
 from src.parameters import *
 from src.hashes import *
 from src.ADRS import *
-import math
+from src.parallel import get_pool
+from src import instrument
 
-def fors_sk_gen(secret_seed, adrs: ADRS, idx, params=None):
+logger = logging.getLogger(__name__)
+
+def fors_sk_gen(secret_seed, adrs: ADRS, idx, params=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
 
     adrs.set_tree_height(0)
     adrs.set_tree_index(idx)
-    sk = prf(secret_seed, adrs.copy(), params=params)
+    sk = prf_ctx.prf(adrs)
 
     return sk
 
-def fors_treehash(secret_seed, s, z, public_seed, adrs, params=None):
+def fors_treehash(secret_seed, s, z, public_seed, adrs, params=None, ctx=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
 
     if s % (1 << z) != 0:
         return -1
@@ -30,15 +39,15 @@ def fors_treehash(secret_seed, s, z, public_seed, adrs, params=None):
     for i in range(0, 2**z):
         adrs.set_tree_height(0)
         adrs.set_tree_index(s + i)
-        sk = prf(secret_seed, adrs.copy(), params=params)
-        node = hash(public_seed, adrs.copy(), sk, n)
+        sk = prf_ctx.prf(adrs)
+        node = ctx.hash(adrs, sk)
 
         adrs.set_tree_height(1)
         adrs.set_tree_index(s + i)
         if len(stack) > 0:
             while stack[len(stack) - 1]['height'] == adrs.get_tree_height():
                 adrs.set_tree_index((adrs.get_tree_index() - 1) // 2)
-                node = hash(public_seed, adrs.copy(), stack.pop()['node'] + node, n)
+                node = ctx.hash(adrs, stack.pop()['node'] + node)
 
                 adrs.set_tree_height(adrs.get_tree_height() + 1)
 
@@ -48,71 +57,142 @@ def fors_treehash(secret_seed, s, z, public_seed, adrs, params=None):
 
     return stack.pop()['node']
 
-def fors_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None):
+def fors_tree(secret_seed, i, idx, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None):
+    """
+    Builds the i-th FORS tree level by level in one pass.
+    Returns the secret leaf idx, its authentication path and the tree root.
+    """
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    a = params.a
+    t = params.t
+
+    sk = None
+    nodes = []
+    adrs.set_tree_height(0)
+    for j in range(0, t):
+        adrs.set_tree_index(i * t + j)
+        leaf_sk = prf_ctx.prf(adrs)
+        if j == idx:
+            sk = leaf_sk
+        nodes.append(ctx.hash(adrs, leaf_sk))
+
+    auth = []
+    for height in range(1, a + 1):
+        auth.append(nodes[(idx >> (height - 1)) ^ 1])
+
+        adrs.set_tree_height(height)
+        offset = (i * t) >> height
+        children = nodes
+        nodes = []
+        for j in range(0, len(children) // 2):
+            adrs.set_tree_index(offset + j)
+            nodes.append(ctx.hash(adrs, children[2 * j] + children[2 * j + 1]))
+
+    return sk, auth, nodes[0]
+
+def fors_pk_root(roots, public_seed, adrs: ADRS, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    k = params["k"]
-    a = params["a"]
-    t = 2 ** a
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
 
     fors_pk_adrs = adrs.copy()
-
-    root = bytes()
-    for i in range(0, k):
-        root += fors_treehash(secret_seed, i * t, a, public_seed, adrs, params=params)
-
     fors_pk_adrs.set_type(ADRS.FORS_ROOTS)
     fors_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
-    pk = hash(public_seed, fors_pk_adrs, root, params["n"])
-    return pk
+    return ctx.hash(fors_pk_adrs, b"".join(roots))
 
-def fors_sign(m, secret_seed, public_seed, adrs, params=None):
+def _fors_tree_job(job):
+    secret_seed, i, idx, public_seed, adrs_bytes, params = job
+    return fors_tree(secret_seed, i, idx, public_seed, ADRS(adrs_bytes), params=params)
+
+def fors_trees(secret_seed, idxs, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None, workers=None):
+    """
+    Builds the FORS trees i = 0..k-1, revealing leaf idxs[i] of each, and returns their (sk, auth, root) in order.
+    With workers > 1 the trees are spread over a process pool, the result is byte-identical to the serial path.
+    """
     if params is None:
         params = get_parameters()
-    k = params["k"]
-    a = params["a"]
-    t = 2 ** a
-    n = params["n"]  # Добавлено для проверки длины
 
-    m_int = int.from_bytes(m, 'big')
-    sig_fors = []
+    if workers is not None and workers > 1:
+        adrs_bytes = adrs.snapshot()
+        jobs = [(secret_seed, i, idx, public_seed, adrs_bytes, params) for i, idx in enumerate(idxs)]
+        trees = []
+        for tree in get_pool(workers).map(_fors_tree_job, jobs):
+            trees.append(tree)
+            instrument.progress("fors", len(trees), len(idxs))
+        return trees
+
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    trees = []
+    for i, idx in enumerate(idxs):
+        trees.append(fors_tree(secret_seed, i, idx, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx))
+        instrument.progress("fors", i + 1, len(idxs))
+    return trees
+
+def fors_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None, workers=None):
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
 
-    for i in range(0, k):
-        idx = (m_int >> (k - 1 - i) * a) % t
+    trees = fors_trees(secret_seed, [0] * params.k, public_seed, adrs, params=params, ctx=ctx, prf_ctx=prf_ctx, workers=workers)
+    roots = [root for _, _, root in trees]
 
-        adrs.set_tree_height(0)
-        adrs.set_tree_index(i * t + idx)
-        sig_fors += [prf(secret_seed, adrs.copy(), params=params)]
+    return fors_pk_root(roots, public_seed, adrs, params=params, ctx=ctx)
 
-        auth = []
-        for j in range(0, a):
-            s = math.floor(idx // 2 ** j)
-            if s % 2 == 1:
-                s -= 1
-            else:
-                s += 1
-            auth += [fors_treehash(secret_seed, i * t + s * 2**j, j, public_seed, adrs.copy(), params=params)]
+def fors_sign_pk(m, secret_seed, public_seed, adrs, params=None, ctx=None, prf_ctx=None, workers=None):
+    """
+    FORS signature of m together with the FORS public key it compresses to.
+    """
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    k = params.k
+    a = params.a
+    t = params.t
+
+    m_int = int.from_bytes(m, 'big')
+    idxs = [(m_int >> (k - 1 - i) * a) % t for i in range(0, k)]
+    sig_fors = []
+    roots = []
 
+    for sk, auth, root in fors_trees(secret_seed, idxs, public_seed, adrs, params=params, ctx=ctx, prf_ctx=prf_ctx, workers=workers):
+        sig_fors += [sk]
         sig_fors += auth
+        roots.append(root)
 
-    expected_length = k * (a + 1) * n  # Исправлено: длина в байтах
+    expected_length = params.fors_bytes
     total_length = sum(len(x) for x in sig_fors)  # Подсчет байтов
     if total_length != expected_length:
-        print(f"fors_sign: sig_fors length = {total_length}, expected = {expected_length}")
+        logger.warning("fors_sign: sig_fors length = %s, expected = %s", total_length, expected_length)
+    return sig_fors, fors_pk_root(roots, public_seed, adrs, params=params, ctx=ctx)
+
+def fors_sign(m, secret_seed, public_seed, adrs, params=None, ctx=None, prf_ctx=None, workers=None):
+    sig_fors, _ = fors_sign_pk(m, secret_seed, public_seed, adrs, params=params, ctx=ctx, prf_ctx=prf_ctx, workers=workers)
     return sig_fors
 
-def fors_pk_from_sig(sig_fors, m, public_seed, adrs: ADRS, params=None):
+def fors_pk_from_sig(sig_fors, m, public_seed, adrs: ADRS, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    k = params["k"]
-    a = params["a"]
-    t = 2 ** a
-    n = params["n"]
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    k = params.k
+    a = params.a
+    t = params.t
 
-    expected_length = k * (a + 1) * n  # Исправлено: длина в байтах
+    expected_length = params.fors_bytes
     total_length = sum(len(x) for x in sig_fors)  # Подсчет байтов
     if total_length != expected_length:
-        print(f"fors_pk_from_sig: sig_fors length = {total_length}, expected = {expected_length}")
+        logger.debug("fors_pk_from_sig: sig_fors length = %s, expected = %s", total_length, expected_length)
         return None
 
     m_int = int.from_bytes(m, 'big')
@@ -125,24 +205,24 @@ def fors_pk_from_sig(sig_fors, m, public_seed, adrs: ADRS, params=None):
         sk = sigs[i][0]
         adrs.set_tree_height(0)
         adrs.set_tree_index(i * t + idx)
-        node_0 = hash(public_seed, adrs.copy(), sk, n)
+        node_0 = ctx.hash(adrs, sk)
         node_1 = 0
 
         auth = sigs[i][1]
         if len(auth) != a:
-            print(f"fors_pk_from_sig: auth[{i}] length = {len(auth)}, expected = {a}")
+            logger.debug("fors_pk_from_sig: auth[%s] length = %s, expected = %s", i, len(auth), a)
             return None
 
         adrs.set_tree_index(i * t + idx)
         for j in range(0, a):
             adrs.set_tree_height(j + 1)
 
-            if math.floor(idx / 2**j) % 2 == 0:
+            if (idx >> j) % 2 == 0:
                 adrs.set_tree_index(adrs.get_tree_index() // 2)
-                node_1 = hash(public_seed, adrs.copy(), node_0 + auth[j], n)
+                node_1 = ctx.hash(adrs, node_0 + auth[j])
             else:
                 adrs.set_tree_index((adrs.get_tree_index() - 1) // 2)
-                node_1 = hash(public_seed, adrs.copy(), auth[j] + node_0, n)
+                node_1 = ctx.hash(adrs, auth[j] + node_0)
 
             node_0 = node_1
 
@@ -152,14 +232,53 @@ def fors_pk_from_sig(sig_fors, m, public_seed, adrs: ADRS, params=None):
     fors_pk_adrs.set_type(ADRS.FORS_ROOTS)
     fors_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
 
-    pk = hash(public_seed, fors_pk_adrs, root, n)
+    pk = ctx.hash(fors_pk_adrs, root)
     return pk
 
+def fors_pk_from_sig_view(sig, offset, m, adrs: ADRS, params, ctx):
+    """
+    fors_pk_from_sig over the k (sk, auth path) blocks stored in the buffer sig (a memoryview) at offset.
+    """
+    n = params.n
+    k = params.k
+    a = params.a
+    t = params.t
+    block = (a + 1) * n
+
+    m_int = int.from_bytes(m, 'big')
+    roots = []
+    for i in range(0, k):
+        idx = (m_int >> (k - 1 - i) * a) % t
+        start = offset + i * block
+
+        tree_index = i * t + idx
+        adrs.set_tree_height(0)
+        adrs.set_tree_index(tree_index)
+        node = ctx.hash(adrs, sig[start:start + n])
+
+        for j in range(0, a):
+            adrs.set_tree_height(j + 1)
+            tree_index >>= 1
+            adrs.set_tree_index(tree_index)
+            auth = start + (j + 1) * n
+            if (idx >> j) & 1 == 0:
+                node = ctx.hash_pair(adrs, node, sig[auth:auth + n])
+            else:
+                node = ctx.hash_pair(adrs, sig[auth:auth + n], node)
+
+        roots.append(node)
+        instrument.progress("fors", i + 1, k)
+
+    fors_pk_adrs = adrs.copy()
+    fors_pk_adrs.set_type(ADRS.FORS_ROOTS)
+    fors_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
+    return ctx.hash_parts(fors_pk_adrs, roots)
+
 def auths_from_sig_fors(sig, params=None):
     if params is None:
         params = get_parameters()
-    k = params["k"]
-    a = params["a"]
+    k = params.k
+    a = params.a
 
     sigs = []
     step = a + 1
@@ -1,12 +1,17 @@
+import logging
 from src.parameters import *
 from src.hashes import *
 from src.ADRS import *
-import math
+from src import instrument
 
-def chain(x, i, s, public_seed, adrs: ADRS, params=None):
+logger = logging.getLogger(__name__)
+
+def chain(x, i, s, public_seed, adrs: ADRS, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    w = params["w"]
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    w = params.w
 
     if s == 0:
         return bytes(x)
@@ -14,118 +19,132 @@ def chain(x, i, s, public_seed, adrs: ADRS, params=None):
     if (i + s) > (w - 1):
         return -1
 
-    tmp = chain(x, i, s - 1, public_seed, adrs, params=params)
+    return ctx.chain(adrs, x, i, s)
+
+def wots_chains(xs, starts, steps, public_seed, adrs: ADRS, params=None, ctx=None):
+    """
+    Advances every chain c of the key pair in adrs from starts[c] by steps[c] hashes.
+    adrs is used as the address template for all chains and is modified in place.
+    """
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+
+    ends = []
+    chain_ = ctx.chain
+    for c in range(0, len(xs)):
+        adrs.set_chain_address(c)
+        ends.append(chain_(adrs, xs[c], starts[c], steps[c]))
+    return ends
 
-    adrs.set_hash_address(i + s - 1)
-    tmp = hash(public_seed, adrs, tmp, params["n"])
+def wots_msg(m, params):
+    w = params.w
+    len_1 = params.len_1
+
+    msg = base_w(m, w, len_1)
+
+    csum = 0
+    for i in range(0, len_1):
+        csum += w - 1 - msg[i]
 
-    return tmp
+    csum = csum << params.csum_shift
+    csumb = csum.to_bytes(params.csum_bytes, byteorder='big')
+    msg += base_w(csumb, w, params.len_2)
+    return msg
 
-def wots_sk_gen(secret_seed, adrs: ADRS, params=None):
+def wots_sk_gen(secret_seed, adrs: ADRS, params=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    len_0 = params.len_0
 
     sk = []
     for i in range(0, len_0):
         adrs.set_chain_address(i)
         adrs.set_hash_address(0)
-        sk.append(prf(secret_seed, adrs.copy(), params=params))
+        sk.append(prf_ctx.prf(adrs))
     return sk
 
-def wots_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None):
+def wots_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-
-    wots_pk_adrs = adrs.copy()
-    tmp = bytes()
-    for i in range(0, len_0):
-        adrs.set_chain_address(i)
-        adrs.set_hash_address(0)
-        sk = prf(secret_seed, adrs.copy(), params=params)
-        tmp += bytes(chain(sk, 0, w - 1, public_seed, adrs.copy(), params=params))
-
-    wots_pk_adrs.set_type(ADRS.WOTS_PK)
-    wots_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
-
-    pk = hash(public_seed, wots_pk_adrs, tmp, n)
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    w = params.w
+    len_0 = params.len_0
+
+    with instrument.phase("wots_pk_gen"):
+        wots_pk_adrs = adrs.copy()
+        sk = wots_sk_gen(secret_seed, adrs, params=params, prf_ctx=prf_ctx)
+        tmp = wots_chains(sk, [0] * len_0, [w - 1] * len_0, public_seed, adrs, params=params, ctx=ctx)
+
+        wots_pk_adrs.set_type(ADRS.WOTS_PK)
+        wots_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
+
+        pk = ctx.hash(wots_pk_adrs, b"".join(tmp))
     return pk
 
-def wots_sign(m, secret_seed, public_seed, adrs, params=None):
+def wots_sign(m, secret_seed, public_seed, adrs, params=None, ctx=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    len_0 = params.len_0
 
-    csum = 0
-
-    msg = base_w(m, w, len_1)
-
-    for i in range(0, len_1):
-        csum += w - 1 - msg[i]
-
-    padding = (len_2 * math.floor(math.log(w, 2))) % 8 if (len_2 * math.floor(math.log(w, 2))) % 8 != 0 else 8
-    csum = csum << (8 - padding)
-    csumb = csum.to_bytes(math.ceil((len_2 * math.floor(math.log(w, 2))) / 8), byteorder='big')
-    csumw = base_w(csumb, w, len_2)
-    msg += csumw
-
-    sig = []
-    for i in range(0, len_0):
-        adrs.set_chain_address(i)
-        adrs.set_hash_address(0)
-        sk = prf(secret_seed, adrs.copy(), params=params)
-        sig += [chain(sk, 0, msg[i], public_seed, adrs.copy(), params=params)]
+    with instrument.phase("wots_sign"):
+        msg = wots_msg(m, params)
+        sk = wots_sk_gen(secret_seed, adrs, params=params, prf_ctx=prf_ctx)
+        sig = wots_chains(sk, [0] * len_0, msg, public_seed, adrs, params=params, ctx=ctx)
 
     if len(sig) != len_0:
-        print(f"wots_sign: sig length = {len(sig)}, expected = {len_0}")
+        logger.warning("wots_sign: sig length = %s, expected = %s", len(sig), len_0)
     return sig
 
-def wots_pk_from_sig(sig, m, public_seed, adrs: ADRS, params=None):
+def wots_pk_from_sig(sig, m, public_seed, adrs: ADRS, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    w = params.w
+    len_0 = params.len_0
 
     if len(sig) != len_0:
-        print(f"wots_pk_from_sig: sig length = {len(sig)}, expected = {len_0}")
+        logger.debug("wots_pk_from_sig: sig length = %s, expected = %s", len(sig), len_0)
         return None
 
-    csum = 0
     wots_pk_adrs = adrs.copy()
+    msg = wots_msg(m, params)
 
-    msg = base_w(m, w, len_1)
-
-    for i in range(0, len_1):
-        csum += w - 1 - msg[i]
-
-    padding = (len_2 * math.floor(math.log(w, 2))) % 8 if (len_2 * math.floor(math.log(w, 2))) % 8 != 0 else 8
-    csum = csum << (8 - padding)
-    csumb = csum.to_bytes(math.ceil((len_2 * math.floor(math.log(w, 2))) / 8), byteorder='big')
-    csumw = base_w(csumb, w, len_2)
-    msg += csumw
-
-    tmp = bytes()
-    for i in range(0, len_0):
-        adrs.set_chain_address(i)
-        tmp += chain(sig[i], msg[i], w - 1 - msg[i], public_seed, adrs.copy(), params=params)
+    tmp = wots_chains(sig, msg, [w - 1 - x for x in msg], public_seed, adrs, params=params, ctx=ctx)
 
     wots_pk_adrs.set_type(ADRS.WOTS_PK)
     wots_pk_adrs.set_key_pair_address(adrs.get_key_pair_address())
-    pk_sig = hash(public_seed, wots_pk_adrs, tmp, n)
-    return pk_sig
\ No newline at end of file
+    pk_sig = ctx.hash(wots_pk_adrs, b"".join(tmp))
+    return pk_sig
+
+def wots_pk_from_sig_view(sig, offset, m, adrs: ADRS, params, ctx):
+    """
+    wots_pk_from_sig over the len_0 n-byte chain values stored in the buffer sig (a memoryview) at offset.
+    """
+    n = params.n
+    w = params.w
+
+    with instrument.phase("wots_verify"):
+        msg = wots_msg(m, params)
+        chain_ = ctx.chain
+        ends = []
+        for c in range(0, params.len_0):
+            adrs.set_chain_address(c)
+            start = offset + c * n
+            ends.append(chain_(adrs, sig[start:start + n], msg[c], w - 1 - msg[c]))
+
+        key_pair = adrs.get_key_pair_address()
+        adrs.set_type(ADRS.WOTS_PK)
+        adrs.set_key_pair_address(key_pair)
+        return ctx.hash_parts(adrs, ends)
@@ -0,0 +1,178 @@
+"""
+asyncio API: signing and verification offloaded to a managed process pool
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from src.parameters import *
+from src.parallel import cpu_workers
+from src.sphincs import sig_to_bytes
+from src import worker
+from src.worker import UnknownKey
+
+# Key ids kept by AsyncSPX, least recently used dropped first. Workers bound their keys and Signers
+# the same way (worker.MAX_KEYS, worker.MAX_SIGNERS).
+MAX_KEY_IDS = 64
+
+def _register(key_id, material):
+    if material is not None:
+        params, key, warm_up = material
+        worker.add_key(key_id, params, key, warm_up=warm_up)
+
+def _sign_job(key_id, message, material=None):
+    _register(key_id, material)
+    return worker.sign_job(key_id, message)
+
+def _verify_job(key_id, message, signature, material=None):
+    _register(key_id, material)
+    try:
+        return worker.verify_job(key_id, message, signature)
+    except UnknownKey:
+        raise
+    except Exception:
+        return False
+
+def key_id(key, params):
+    """
+    Identifier under which workers keep the prepared state of a key.
+    """
+    h = hashlib.blake2b(repr(params).encode("ascii"), digest_size=16, person=b"spx-aio-key")
+    for part in key:
+        h.update(part)
+    return h.digest()
+
+class AsyncSPX:
+    """
+    Process pool for asyncio callers. At most max_concurrency requests are in flight; further calls wait
+    for a slot (backpressure). Workers prepare each key once (a Signer with its caches for secret keys)
+    and later requests only carry the key id; a key a worker has since dropped is sent again.
+    Cancelling an awaiting call drops the request if it has not started in a worker yet; a request already
+    running in a worker finishes there and its result is discarded. The same holds when timeout expires.
+    """
+
+    def __init__(self, workers=None, max_concurrency=None, timeout=None, warm_up=False):
+        self.workers = cpu_workers(workers)
+        self.max_concurrency = max_concurrency if max_concurrency is not None else 2 * self.workers
+        self.timeout = timeout
+        self.warm_up = warm_up
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = None
+        self._slots_loop = None
+        self._key_ids = OrderedDict()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self._pool.shutdown(cancel_futures=True))
+
+    def _key(self, key, params):
+        key = tuple(bytes(part) for part in key)
+        cached = self._key_ids.get((params, key))
+        if cached is None:
+            cached = key_id(key, params)
+            self._key_ids[(params, key)] = cached
+            if len(self._key_ids) > MAX_KEY_IDS:
+                self._key_ids.popitem(last=False)
+        else:
+            self._key_ids.move_to_end((params, key))
+        return cached, (params, key, self.warm_up)
+
+    def _loop_slots(self):
+        """
+        The in-flight semaphore of the running event loop. An asyncio.Semaphore is bound to one loop, so
+        an AsyncSPX used from successive loops (one asyncio.run after another) gets a fresh one per loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _submit(self, fn, kid, material, *args):
+        async with self._loop_slots():
+            try:
+                return await asyncio.wrap_future(self._pool.submit(fn, kid, *args))
+            except UnknownKey:
+                return await asyncio.wrap_future(self._pool.submit(fn, kid, *args, material))
+
+    async def _run(self, fn, kid, material, args, timeout):
+        if timeout is None:
+            timeout = self.timeout
+        return await asyncio.wait_for(self._submit(fn, kid, material, *args), timeout)
+
+    async def sign(self, m, secret_key, params=None, timeout=None):
+        if params is None:
+            params = get_parameters()
+        kid, material = self._key(secret_key, params)
+        return await self._run(_sign_job, kid, material, (m,), timeout)
+
+    async def verify(self, m, sig, public_key, params=None, timeout=None):
+        if params is None:
+            params = get_parameters()
+        try:
+            sig = sig_to_bytes(sig)
+        except Exception:
+            return False
+        kid, material = self._key(public_key, params)
+        return await self._run(_verify_job, kid, material, (m, sig), timeout)
+
+    async def verify_many(self, items, params=None, timeout=None):
+        """
+        Verifies (m, sig, public_key[, params]) items, sync or async iterable, and returns the results in order.
+        Items are pulled only as slots free up, so a long or lazy source is never fully materialized
+        as pending work. timeout applies to every item.
+        """
+        if params is None:
+            params = get_parameters()
+        window = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(item):
+            try:
+                item_params = item[3] if len(item) > 3 and item[3] is not None else params
+                return await self.verify(item[0], item[1], item[2], params=item_params, timeout=timeout)
+            finally:
+                window.release()
+
+        tasks = []
+        try:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    await window.acquire()
+                    tasks.append(asyncio.ensure_future(one(item)))
+            else:
+                for item in items:
+                    await window.acquire()
+                    tasks.append(asyncio.ensure_future(one(item)))
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+_default = None
+
+def get_default():
+    """
+    The AsyncSPX used by the aspx_* functions, created on first use with one worker per CPU.
+    """
+    global _default
+    if _default is None:
+        _default = AsyncSPX()
+    return _default
+
+async def aspx_sign(m, secret_key, params=None, timeout=None, executor=None):
+    return await (executor or get_default()).sign(m, secret_key, params=params, timeout=timeout)
+
+async def aspx_verify(m, sig, public_key, params=None, timeout=None, executor=None):
+    return await (executor or get_default()).verify(m, sig, public_key, params=params, timeout=timeout)
+
+async def aspx_verify_many(items, params=None, timeout=None, executor=None):
+    return await (executor or get_default()).verify_many(items, params=params, timeout=timeout)
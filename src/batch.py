@@ -0,0 +1,263 @@
+"""
+Batch signing and verification of files over a process pool, signatures stored next to the files
+"""
+
+import collections
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from src.parameters import *
+from src.parallel import cpu_workers
+from src import worker
+from src.formats import read_signature, write_signature, FORMAT_PICKLE
+
+OP_SIGN = "sign"
+OP_VERIFY = "verify"
+
+SIG_SUFFIX = ".sig"
+READ_CHUNK = 1 << 20
+
+def signature_path(path):
+    return path + SIG_SUFFIX
+
+def list_files(paths):
+    """
+    Files to process: regular files as given, directories walked recursively. Signature files are skipped.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files += [os.path.join(root, name) for name in sorted(names) if not name.endswith(SIG_SUFFIX)]
+        else:
+            files.append(path)
+    return files
+
+def read_manifest(path):
+    """
+    Paths listed in a manifest file, one per line; relative paths are taken from the manifest's directory.
+    Empty lines and lines starting with # are ignored.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+_buffers = threading.local()
+
+def hash_file(path):
+    """
+    (blake2b digest, size) of a file. Reads go into one reusable buffer per thread, so memory stays
+    at READ_CHUNK per hashing thread whatever the file size; hashlib releases the GIL while hashing it.
+    """
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = bytearray(READ_CHUNK)
+    view = memoryview(buf)
+    h = hashlib.blake2b()
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        while n := f.readinto(buf):
+            h.update(view[:n])
+            size += n
+    return h.digest(), size
+
+def file_digest(path):
+    """
+    blake2b digest of a file, the message that main.py and gui.py sign for a file.
+    """
+    return hash_file(path)[0]
+
+# The one key of a batch, registered in every worker by the pool initializer
+BATCH_KEY = "batch"
+
+def _sign_file_job(path, fmt):
+    start = time.perf_counter()
+    size = os.path.getsize(path)
+    digest = file_digest(path)
+    signature = worker.sign_job(BATCH_KEY, digest)
+    sig_path = signature_path(path)
+    write_signature(sig_path, signature, worker.key_state(BATCH_KEY)[0], fmt=fmt)
+    return {"path": path, "bytes": size, "seconds": time.perf_counter() - start, "signature": sig_path}
+
+def _sign_digests_job(digests):
+    signer = worker.signer(BATCH_KEY)
+    return [signer.sign(digest) for digest in digests]
+
+def _verify_file_job(path, fmt):
+    start = time.perf_counter()
+    params = worker.key_state(BATCH_KEY)[0]
+    size = os.path.getsize(path)
+    sig_path = signature_path(path)
+    instance, signature = read_signature(sig_path)
+    if instance is not None and instance != params.instance:
+        valid = False
+    else:
+        valid = worker.verify_job(BATCH_KEY, file_digest(path), signature)
+    return {"path": path, "bytes": size, "seconds": time.perf_counter() - start, "signature": sig_path, "valid": valid}
+
+def run_batch(op, paths, key, params=None, workers=None, fmt=FORMAT_PICKLE, max_pending=None, cancel=None):
+    """
+    Signs (or verifies against the signatures next to them) the files in paths and yields one result dict
+    per file as it completes: path, bytes, seconds, signature, valid (verify only) or error.
+    At most max_pending files are in flight. Setting the threading.Event cancel stops the batch:
+    files not started yet are dropped, the ones already running finish.
+    """
+    if params is None:
+        params = get_parameters()
+    workers = cpu_workers(workers)
+    if max_pending is None:
+        max_pending = 2 * workers
+    job = _sign_file_job if op == OP_SIGN else _verify_file_job
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=worker.init_worker,
+                             initargs=({BATCH_KEY: (params, key)},)) as pool:
+        pending = {}
+        remaining = iter(paths)
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending and not (cancel is not None and cancel.is_set()):
+                    path = next(remaining, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending[pool.submit(job, path, fmt)] = path
+                if cancel is not None and cancel.is_set():
+                    exhausted = True
+                    for future in [f for f in pending if f.cancel()]:
+                        del pending[future]
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield {"path": path, "bytes": 0, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            for future in pending:
+                future.cancel()
+
+def _timed_hash(path):
+    start = time.perf_counter()
+    digest, size = hash_file(path)
+    return digest, size, time.perf_counter() - start
+
+def sign_files(paths, secret_key, params=None, workers=None, hash_threads=4, chunk_size=16, fmt=FORMAT_PICKLE,
+               max_pending=None, cancel=None):
+    """
+    Signing pipeline for large batches, yielding the same result dicts as run_batch as chunks complete.
+    Files are hashed by hash_threads threads in this process, at most 2 * hash_threads files at a time.
+    The digests go to the process pool in chunks of chunk_size, and at most max_pending chunks are in flight.
+    Every worker receives the key once. The signatures of a finished chunk are written together,
+    next to their files.
+    """
+    if params is None:
+        params = get_parameters()
+    paths = list(paths)
+    workers = cpu_workers(workers)
+    if max_pending is None:
+        max_pending = 2 * workers
+    chunk_size = max(1, min(chunk_size, len(paths) // (2 * workers)))
+
+    with ThreadPoolExecutor(max_workers=hash_threads) as hasher, \
+         ProcessPoolExecutor(max_workers=workers, initializer=worker.init_worker,
+                             initargs=({BATCH_KEY: (params, secret_key)},)) as pool:
+        hashing = collections.deque()
+        pending = {}
+        chunk = []
+        remaining = iter(paths)
+
+        def finish(done):
+            for future in done:
+                entries, started = pending.pop(future)
+                try:
+                    signatures = future.result()
+                except Exception as e:
+                    for path, size, _, _ in entries:
+                        yield {"path": path, "bytes": size, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+                    continue
+                share = (time.perf_counter() - started) / len(entries)
+                for (path, size, _, hash_seconds), signature in zip(entries, signatures):
+                    sig_path = signature_path(path)
+                    try:
+                        write_signature(sig_path, signature, params, fmt=fmt)
+                    except OSError as e:
+                        yield {"path": path, "bytes": size, "seconds": hash_seconds + share, "error": f"{type(e).__name__}: {e}"}
+                        continue
+                    yield {"path": path, "bytes": size, "seconds": hash_seconds + share, "signature": sig_path}
+
+        try:
+            while True:
+                cancelled = cancel is not None and cancel.is_set()
+                while not cancelled and len(hashing) < 2 * hash_threads:
+                    path = next(remaining, None)
+                    if path is None:
+                        break
+                    hashing.append((path, hasher.submit(_timed_hash, path)))
+                if cancelled or not hashing:
+                    if cancelled:
+                        for future in [f for f in pending if f.cancel()]:
+                            del pending[future]
+                    elif chunk:
+                        pending[pool.submit(_sign_digests_job, [entry[2] for entry in chunk])] = (chunk, time.perf_counter())
+                        chunk = []
+                    if not pending:
+                        break
+                    yield from finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+                    continue
+
+                path, future = hashing.popleft()
+                try:
+                    digest, size, hash_seconds = future.result()
+                except Exception as e:
+                    yield {"path": path, "bytes": 0, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+                    continue
+                chunk.append((path, size, digest, hash_seconds))
+                if len(chunk) >= chunk_size:
+                    if len(pending) >= max_pending:
+                        yield from finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+                    pending[pool.submit(_sign_digests_job, [entry[2] for entry in chunk])] = (chunk, time.perf_counter())
+                    chunk = []
+                else:
+                    yield from finish([future for future in pending if future.done()])
+        finally:
+            for _, future in hashing:
+                future.cancel()
+            for future in pending:
+                future.cancel()
+
+class BatchTotals:
+    """
+    Running totals of a batch: files, bytes, failures and throughput over wall time.
+    """
+
+    def __init__(self, files=0):
+        self.files = files
+        self.done = 0
+        self.bytes = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    def add(self, result):
+        self.done += 1
+        self.bytes += result["bytes"]
+        if "error" in result or result.get("valid") is False:
+            self.failed += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def files_per_second(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def bytes_per_second(self):
+        elapsed = self.elapsed()
+        return self.bytes / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,227 @@
+"""
+Benchmark harness: timed runs with warmup and repeats, summary statistics, machine metadata, baseline comparison
+"""
+
+import datetime
+import gc
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from src.utils import percentile, summarize
+from src.parameters import *
+from src.hashes import *
+from src.ADRS import *
+from src.WOTSplus import *
+from src.xmss import *
+from src.FORS import *
+from src.hypertree import *
+from src.sphincs import spx_keygen, spx_sign, spx_verify
+
+SCHEMA_VERSION = 1
+
+def _git_revision():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def machine_info():
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "git_revision": _git_revision()
+    }
+
+def _time(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+def calibrate(fn, min_time):
+    """
+    Number of calls per sample so that one sample lasts at least min_time seconds.
+    """
+    number = 1
+    while True:
+        elapsed = _time(fn, number)
+        if elapsed >= min_time:
+            return number
+        if elapsed <= 0:
+            number *= 10
+        else:
+            number = max(number * 2, int(number * min_time / elapsed * 1.2))
+
+def run_benchmark(fn, repeat=7, warmup=1, min_time=0.05, number=None):
+    """
+    Times fn: warmup samples are discarded, then `repeat` samples of `number` calls each.
+    Returns summary statistics of the time per call in seconds.
+    """
+    if number is None:
+        number = calibrate(fn, min_time)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(warmup):
+            _time(fn, number)
+        samples = [_time(fn, number) / number for _ in range(repeat)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    result = summarize(samples)
+    result["number"] = number
+    return result
+
+class Fixture:
+    """
+    Deterministic key material and addresses shared by the benchmarks of one parameter set.
+    """
+
+    def __init__(self, params):
+        n = params.n
+        self.params = params
+        self.secret_seed = bytes(range(1, n + 1))
+        self.secret_prf = bytes(range(50, 50 + n))
+        self.public_seed = bytes(range(100, 100 + n))
+        self.ctx = HashContext(self.public_seed, n)
+        self.prf_ctx = prf_context(self.secret_seed, params)
+        self.message = os.urandom(n)
+        self._keys = None
+        self._signature = None
+
+    def keys(self):
+        if self._keys is None:
+            public_root = ht_pk_gen(self.secret_seed, self.public_seed, params=self.params, ctx=self.ctx, prf_ctx=self.prf_ctx)
+            self._keys = ([self.secret_seed, self.secret_prf, self.public_seed, public_root], [self.public_seed, public_root])
+        return self._keys
+
+    def signature(self):
+        if self._signature is None:
+            self._signature = spx_sign(self.message, self.keys()[0], params=self.params)
+        return self._signature
+
+def _bench_hash(f):
+    adrs = ADRS()
+    adrs.set_type(ADRS.TREE)
+    value = bytes(2 * f.params.n)
+    return lambda: f.ctx.hash(adrs, value)
+
+def _bench_prf(f):
+    adrs = ADRS()
+    adrs.set_type(ADRS.WOTS_HASH)
+    return lambda: f.prf_ctx.prf(adrs)
+
+def _bench_chain(f):
+    adrs = ADRS()
+    adrs.set_type(ADRS.WOTS_HASH)
+    x = bytes(f.params.n)
+    steps = f.params.w - 1
+    return lambda: chain(x, 0, steps, f.public_seed, adrs, params=f.params, ctx=f.ctx)
+
+def _bench_treehash(f):
+    adrs = ADRS()
+    return lambda: treehash(f.secret_seed, 0, f.params.h_prime, f.public_seed, adrs.copy(), params=f.params, ctx=f.ctx, prf_ctx=f.prf_ctx)
+
+def _bench_fors_treehash(f):
+    adrs = ADRS()
+    adrs.set_type(ADRS.FORS_TREE)
+    return lambda: fors_treehash(f.secret_seed, 0, f.params.a, f.public_seed, adrs.copy(), params=f.params, ctx=f.ctx, prf_ctx=f.prf_ctx)
+
+def _bench_xmss_sign(f):
+    adrs = ADRS()
+    return lambda: xmss_sign(f.message, f.secret_seed, 0, f.public_seed, adrs.copy(), params=f.params, ctx=f.ctx, prf_ctx=f.prf_ctx)
+
+def _bench_ht_sign(f):
+    return lambda: ht_sign(f.message, f.secret_seed, f.public_seed, 0, 0, params=f.params, ctx=f.ctx, prf_ctx=f.prf_ctx)
+
+def _bench_keygen(f):
+    return lambda: spx_keygen(params=f.params)
+
+def _bench_sign(f):
+    secret_key = f.keys()[0]
+    return lambda: spx_sign(f.message, secret_key, params=f.params)
+
+def _bench_verify(f):
+    public_key = f.keys()[1]
+    signature = f.signature()
+    return lambda: spx_verify(f.message, signature, public_key, params=f.params)
+
+MICRO_BENCHMARKS = {
+    "hash": _bench_hash,
+    "prf": _bench_prf,
+    "chain": _bench_chain,
+    "treehash": _bench_treehash,
+    "fors_treehash": _bench_fors_treehash,
+    "xmss_sign": _bench_xmss_sign,
+    "ht_sign": _bench_ht_sign
+}
+
+FULL_BENCHMARKS = {
+    "keygen": _bench_keygen,
+    "sign": _bench_sign,
+    "verify": _bench_verify
+}
+
+BENCHMARKS = {**MICRO_BENCHMARKS, **FULL_BENCHMARKS}
+
+def run_suite(instances, names=None, prf=PRF_BLAKE2B, repeat=7, warmup=1, min_time=0.05, progress=None):
+    """
+    Runs the selected benchmarks (default: all) for every parameter set.
+    progress(instance, name, result) is called after each benchmark.
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    results = {}
+    for instance in instances:
+        params = get_parameters(instance, prf=prf)
+        fixture = Fixture(params)
+        results[instance] = {}
+        for name in names:
+            result = run_benchmark(BENCHMARKS[name](fixture), repeat=repeat, warmup=warmup, min_time=min_time)
+            results[instance][name] = result
+            if progress is not None:
+                progress(instance, name, result)
+    return {
+        "schema": SCHEMA_VERSION,
+        "machine": machine_info(),
+        "config": {"instances": list(instances), "benchmarks": list(names), "prf": prf,
+                   "repeat": repeat, "warmup": warmup, "min_time": min_time},
+        "results": results
+    }
+
+def compare(baseline, current, threshold=0.10, stat="median"):
+    """
+    Compares two run_suite documents benchmark by benchmark.
+    A benchmark is a regression when its `stat` grew by more than threshold (relative), an improvement
+    when it shrank by as much. Returns a list of dicts sorted by slowdown, worst first.
+    """
+    rows = []
+    for instance, benches in current["results"].items():
+        base_benches = baseline.get("results", {}).get(instance, {})
+        for name, result in benches.items():
+            base = base_benches.get(name)
+            if base is None:
+                rows.append({"instance": instance, "benchmark": name, "baseline": None,
+                             "current": result[stat], "ratio": None, "status": "new"})
+                continue
+            ratio = result[stat] / base[stat] if base[stat] > 0 else float("inf")
+            if ratio > 1 + threshold:
+                status = "regression"
+            elif ratio < 1 / (1 + threshold):
+                status = "improvement"
+            else:
+                status = "ok"
+            rows.append({"instance": instance, "benchmark": name, "baseline": base[stat],
+                         "current": result[stat], "ratio": ratio, "status": status})
+    rows.sort(key=lambda row: -(row["ratio"] or 0))
+    return rows
@@ -0,0 +1,171 @@
+"""
+Cache of built hypertree XMSS trees shared by successive signatures of one key
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class TreeCacheStats:
+    __slots__ = ("hits", "misses", "evictions", "layer_hits", "layer_misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.layer_hits = {}
+        self.layer_misses = {}
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "layer_hits": dict(self.layer_hits),
+            "layer_misses": dict(self.layer_misses)
+        }
+
+class TreeCache:
+    """
+    LRU cache of XMSS tree levels keyed by (key, layer, tree address), bounded by max_bytes.
+    When over budget, entries of the lowest cached layer are evicted first (least recently used first):
+    upper layers have few distinct trees and are reused by every signature, layer 0 almost never.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, min_layer=0):
+        self.max_bytes = max_bytes
+        self.min_layer = min_layer
+        self.bytes = 0
+        self.stats = TreeCacheStats()
+        self._layers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_id(secret_seed, public_seed, params):
+        digest = hashlib.blake2b(secret_seed + public_seed, digest_size=16, person=b"spx-tree-cache").digest()
+        return (params, digest)
+
+    @staticmethod
+    def levels_size(levels):
+        size = sys.getsizeof(levels)
+        for level in levels:
+            size += sys.getsizeof(level) + sum(sys.getsizeof(node) for node in level)
+        return size
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._layers.values())
+
+    def get(self, key, layer, tree_address):
+        with self._lock:
+            entries = self._layers.get(layer)
+            entry = entries.get((key, tree_address)) if entries is not None else None
+            if entry is None:
+                self.stats.misses += 1
+                self.stats.layer_misses[layer] = self.stats.layer_misses.get(layer, 0) + 1
+                return None
+            entries.move_to_end((key, tree_address))
+            self.stats.hits += 1
+            self.stats.layer_hits[layer] = self.stats.layer_hits.get(layer, 0) + 1
+            return entry[0]
+
+    def put(self, key, layer, tree_address, levels):
+        if layer < self.min_layer:
+            return
+        size = TreeCache.levels_size(levels)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            entries = self._layers.setdefault(layer, OrderedDict())
+            old = entries.pop((key, tree_address), None)
+            if old is not None:
+                self.bytes -= old[1]
+            entries[(key, tree_address)] = (levels, size)
+            self.bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            layer = min(layer for layer, entries in self._layers.items() if entries)
+            entries = self._layers[layer]
+            _, (_, size) = entries.popitem(last=False)
+            self.bytes -= size
+            self.stats.evictions += 1
+            if not entries:
+                del self._layers[layer]
+
+    def clear(self):
+        with self._lock:
+            self._layers.clear()
+            self.bytes = 0
+
+DEFAULT_MEMO_BYTES = 16 * 1024 * 1024
+
+class SignatureMemo:
+    """
+    Complete XMSS signatures of the top `layers` hypertree layers of one key.
+    Above layer 0 the signature at layer j depends only on (j, idx_tree, idx_leaf), not on the message,
+    so each entry keeps (sig_xmss, root of the signing tree) under that triple.
+    Layer 0 signs the FORS public key and is never memoized.
+    Unless given, `layers` is the largest count whose every possible entry fits in max_bytes.
+    """
+
+    def __init__(self, params, max_bytes=DEFAULT_MEMO_BYTES, layers=None):
+        self.params = params
+        if layers is None:
+            layers = SignatureMemo.layers_for_budget(params, max_bytes)
+        self.layers = min(layers, params.d - 1)
+        self.min_layer = params.d - self.layers
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    @staticmethod
+    def entry_bytes(params):
+        nodes = params.len_0 + params.h_prime + 1
+        return nodes * (sys.getsizeof(b"") + params.n + 8) + 3 * sys.getsizeof([])
+
+    @staticmethod
+    def layers_for_budget(params, max_bytes):
+        entry = SignatureMemo.entry_bytes(params)
+        layers = 0
+        total = 0
+        while layers < params.d - 1:
+            total += (1 << ((layers + 1) * params.h_prime)) * entry
+            if total > max_bytes:
+                break
+            layers += 1
+        return layers
+
+    def __len__(self):
+        return len(self._entries)
+
+    def covers(self, layer):
+        return layer >= self.min_layer
+
+    def has(self, layer, idx_tree, idx_leaf):
+        return (layer, idx_tree, idx_leaf) in self._entries
+
+    def get(self, layer, idx_tree, idx_leaf):
+        if layer < self.min_layer:
+            return None
+        entry = self._entries.get((layer, idx_tree, idx_leaf))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, layer, idx_tree, idx_leaf, sig_xmss, root):
+        if layer >= self.min_layer:
+            self._entries[(layer, idx_tree, idx_leaf)] = (sig_xmss, root)
+
+    def as_dict(self):
+        return {
+            "layers": self.layers,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
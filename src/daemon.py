@@ -0,0 +1,266 @@
+"""
+Long-running signing/verification daemon on a Unix domain socket, and its client
+"""
+
+import base64
+import collections
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils import summarize
+from src.parameters import *
+from src.parallel import cpu_workers
+from src import worker
+
+# Protocol: one JSON object per line in each direction. Binary fields (message, signature) are base64.
+#   {"id": 1, "op": "sign", "key": "release", "message": "..."}  -> {"id": 1, "ok": true, "signature": "...", "instance": ..., "prf": ...}
+#   {"id": 2, "op": "verify", "key": "release", "message": "...", "signature": "..."} -> {"id": 2, "ok": true, "valid": true}
+#   {"op": "health"}, {"op": "stats"}
+# Failures are answered with {"ok": false, "error": "..."}.
+
+OP_SIGN = "sign"
+OP_VERIFY = "verify"
+OP_HEALTH = "health"
+OP_STATS = "stats"
+
+LATENCY_WINDOW = 1024
+
+class DaemonError(Exception):
+    pass
+
+def encode_field(data):
+    return base64.b64encode(data).decode("ascii")
+
+def decode_field(text, field):
+    if not isinstance(text, str):
+        raise DaemonError(f"missing field {field}")
+    try:
+        return base64.b64decode(text, validate=True)
+    except ValueError:
+        raise DaemonError(f"field {field} is not valid base64") from None
+
+class DaemonStats:
+    def __init__(self):
+        self.started = time.time()
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.in_flight = 0
+        self._latencies = {op: collections.deque(maxlen=LATENCY_WINDOW) for op in (OP_SIGN, OP_VERIFY)}
+        self._lock = threading.Lock()
+
+    def begin(self, op):
+        with self._lock:
+            self.requests[op] += 1
+            self.in_flight += 1
+
+    def end(self, op, seconds, ok):
+        with self._lock:
+            self.in_flight -= 1
+            if not ok:
+                self.errors[op] += 1
+            if op in self._latencies:
+                self._latencies[op].append(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            latencies = {op: summarize(list(values)) for op, values in self._latencies.items() if values}
+            return {
+                "uptime": time.time() - self.started,
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "in_flight": self.in_flight,
+                "latency": latencies
+            }
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.signing_daemon
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise DaemonError("request must be a JSON object")
+            except (ValueError, DaemonError) as e:
+                response = {"ok": False, "error": f"bad request: {e}"}
+            else:
+                response = daemon.handle(request)
+                if "id" in request:
+                    response["id"] = request["id"]
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class SigningDaemon:
+    """
+    Serves sign/verify requests for a fixed set of named keys over a Unix domain socket.
+    keys maps a key name to (params, key) where key is a secret key (4 parts) or a public key (2 parts).
+    Connections are served by threads; the work itself runs in a process pool whose workers keep one warm
+    Signer per secret key. At most max_pending requests are dispatched at a time, the rest wait.
+    """
+
+    def __init__(self, socket_path, keys, workers=None, warm_up=True, max_pending=None):
+        self.socket_path = socket_path
+        self.keys = dict(keys)
+        self.workers = cpu_workers(workers)
+        self.max_pending = max_pending if max_pending is not None else 4 * self.workers
+        self.stats = DaemonStats()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        warm_up_claim = multiprocessing.Value("b", 0) if warm_up else None
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=worker.init_worker,
+                                         initargs=(self.keys, warm_up_claim))
+        self._server = None
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == OP_HEALTH:
+            return {"ok": True, "status": "ok", "pid": os.getpid(), "workers": self.workers,
+                    "keys": {name: {"instance": params.instance, "prf": params.prf, "secret": len(key) == 4}
+                             for name, (params, key) in self.keys.items()}}
+        if op == OP_STATS:
+            return dict(self.stats.as_dict(), ok=True, max_pending=self.max_pending)
+        if op not in (OP_SIGN, OP_VERIFY):
+            return {"ok": False, "error": f"unknown op {op!r}"}
+
+        start = time.perf_counter()
+        self.stats.begin(op)
+        ok = False
+        try:
+            response = self._dispatch(op, request)
+            ok = True
+            return response
+        except DaemonError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.stats.end(op, time.perf_counter() - start, ok)
+
+    def _dispatch(self, op, request):
+        name = request.get("key")
+        if name not in self.keys:
+            raise DaemonError(f"unknown key {name!r}")
+        params, key = self.keys[name]
+        message = decode_field(request.get("message"), "message")
+
+        with self._slots:
+            if op == OP_SIGN:
+                if len(key) != 4:
+                    raise DaemonError(f"key {name!r} is a public key")
+                signature = self._pool.submit(worker.sign_job, name, message).result()
+                return {"ok": True, "signature": encode_field(signature), "instance": params.instance, "prf": params.prf}
+            signature = decode_field(request.get("signature"), "signature")
+            valid = self._pool.submit(worker.verify_job, name, message, signature).result()
+            return {"ok": True, "valid": valid}
+
+    def _claim_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise DaemonError(f"a daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    def _bind(self):
+        """
+        Binds in a fresh 0700 directory next to socket_path and renames the socket into place once it is 0600,
+        so no other user can ever connect. The process umask is left alone: other threads may be creating files.
+        """
+        directory = tempfile.mkdtemp(prefix=".spx-", dir=os.path.dirname(os.path.abspath(self.socket_path)))
+        path = os.path.join(directory, "s")
+        try:
+            server = _Server(path, _Handler)
+            try:
+                os.chmod(path, 0o600)
+                os.rename(path, self.socket_path)
+            except OSError:
+                server.server_close()
+                os.unlink(path)
+                raise
+        finally:
+            os.rmdir(directory)
+        return server
+
+    def serve_forever(self):
+        self._claim_socket()
+        self._server = self._bind()
+        self._server.signing_daemon = self
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._pool.shutdown(cancel_futures=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+class DaemonClient:
+    """
+    Client for SigningDaemon; one connection, requests are answered in order.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._file = self._sock.makefile("rwb")
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def request(self, request):
+        self._next_id += 1
+        request = dict(request, id=self._next_id)
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "request failed"))
+        return response
+
+    def sign(self, message, key):
+        """
+        Returns (signature bytes, params) signed by the daemon with the named key.
+        """
+        response = self.request({"op": OP_SIGN, "key": key, "message": encode_field(message)})
+        return base64.b64decode(response["signature"]), get_parameters(response["instance"], prf=response["prf"])
+
+    def verify(self, message, signature, key):
+        response = self.request({"op": OP_VERIFY, "key": key, "message": encode_field(message),
+                                 "signature": encode_field(bytes(signature))})
+        return response["valid"]
+
+    def health(self):
+        return self.request({"op": OP_HEALTH})
+
+    def stats(self):
+        return self.request({"op": OP_STATS})
@@ -0,0 +1,226 @@
+"""
+File formats for signatures and keys
+"""
+
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import struct
+
+from src.parameters import *
+from src.sphincs import sig_to_bytes, sig_from_bytes
+
+SIG_MAGIC = b"SPXS"
+SIG_VERSION = 1
+
+# magic (4) || format version (1) || instance (4, ASCII), followed by R || FORS || HT
+_SIG_HEADER = struct.Struct(">4sB4s")
+SIG_HEADER_BYTES = _SIG_HEADER.size
+
+FORMAT_PICKLE = "pickle"
+FORMAT_BINARY = "binary"
+
+class FormatError(ValueError):
+    pass
+
+class _PlainUnpickler(pickle.Unpickler):
+    """
+    Legacy files only hold lists, dicts, str and bytes: no class is ever needed to rebuild them,
+    so refusing every global makes loading a file from an untrusted source harmless.
+    """
+
+    def find_class(self, module, name):
+        raise FormatError(f"legacy file references {module}.{name}, refusing to load it")
+
+def _legacy_loads(data):
+    try:
+        return _PlainUnpickler(io.BytesIO(data)).load()
+    except FormatError:
+        raise
+    except Exception as e:
+        raise FormatError(f"not a valid legacy pickle file: {e}") from None
+
+def is_binary_signature(data):
+    return bytes(data[:len(SIG_MAGIC)]) == SIG_MAGIC
+
+def encode_signature(sig, params=None):
+    if params is None:
+        params = get_parameters()
+    body = sig_to_bytes(sig)
+    if len(body) != params.sig_bytes:
+        raise FormatError(f"signature length {len(body)} != {params.sig_bytes} for {params.instance}")
+    return _SIG_HEADER.pack(SIG_MAGIC, SIG_VERSION, params.instance.encode("ascii")) + body
+
+def decode_signature(data):
+    """
+    Returns (instance, signature) from an encoded signature.
+    The signature is a memoryview over data, nothing is copied.
+    """
+    if len(data) < SIG_HEADER_BYTES:
+        raise FormatError("signature is shorter than its header")
+    magic, version, instance = _SIG_HEADER.unpack_from(data, 0)
+    if magic != SIG_MAGIC:
+        raise FormatError("not a binary SPHINCS+ signature")
+    if version != SIG_VERSION:
+        raise FormatError(f"unsupported signature format version {version}")
+    instance = instance.decode("ascii")
+    if instance not in INSTANCES:
+        raise FormatError(f"unknown parameter set {instance}")
+
+    # Checked before taking the view: a view left alive by the exception would keep an mmap from closing.
+    length = len(data) - SIG_HEADER_BYTES
+    if length != get_parameters(instance).sig_bytes:
+        raise FormatError(f"signature length {length} != {get_parameters(instance).sig_bytes} for {instance}")
+    body = memoryview(data)[SIG_HEADER_BYTES:]
+    return instance, body
+
+def load_signature(data):
+    """
+    Returns (instance or None, signature) from either format: binary, or the legacy pickled
+    {"instance": ..., "signature": ...} dict (or bare signature list).
+    """
+    if is_binary_signature(data):
+        return decode_signature(data)
+
+    sig_data = _legacy_loads(data)
+    if isinstance(sig_data, dict) and "instance" in sig_data and "signature" in sig_data:
+        return sig_data["instance"], sig_data["signature"]
+    return None, sig_data
+
+def dump_signature(sig, params=None, fmt=FORMAT_BINARY):
+    if params is None:
+        params = get_parameters()
+    if fmt == FORMAT_BINARY:
+        return encode_signature(sig, params)
+    # The pickle format keeps the nested [r, sig_fors, sig_ht] layout older readers expect.
+    return pickle.dumps({"instance": params.instance, "signature": sig_from_bytes(sig_to_bytes(sig), params)})
+
+def read_signature(path):
+    with open(path, 'rb') as f:
+        return load_signature(f.read())
+
+@contextlib.contextmanager
+def mapped_signature(path):
+    """
+    Like read_signature, but a binary signature file is memory-mapped instead of read:
+    yields (instance, memoryview over the mapping) for spx_verify. The view is only valid inside the block.
+    Legacy pickle files are read as usual.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < SIG_HEADER_BYTES or not is_binary_signature(f.read(len(SIG_MAGIC))):
+            f.seek(0)
+            yield load_signature(f.read())
+            return
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    try:
+        instance, body = decode_signature(view)
+        try:
+            yield instance, body
+        finally:
+            body.release()
+    finally:
+        view.release()
+        mapping.close()
+
+def write_signature(path, sig, params=None, fmt=FORMAT_BINARY):
+    with open(path, 'wb') as f:
+        f.write(dump_signature(sig, params, fmt))
+
+KEY_MAGIC = b"SPXK"
+KEY_VERSION = 1
+
+KEY_PUBLIC = 0
+KEY_SECRET = 1
+
+_KEY_PARTS = {KEY_PUBLIC: 2, KEY_SECRET: 4}
+_PRF_IDS = {PRF_BLAKE2B: 0, PRF_LEGACY: 1}
+_PRF_NAMES = {v: k for k, v in _PRF_IDS.items()}
+
+# magic (4) || format version (1) || kind (1) || instance (4, ASCII) || PRF (1) || extra length (4),
+# followed by the key (2n or 4n bytes), the optional precomputed material and a checksum of everything before it
+_KEY_HEADER = struct.Struct(">4sBB4sBI")
+KEY_HEADER_BYTES = _KEY_HEADER.size
+KEY_CHECKSUM_BYTES = 8
+
+def _key_checksum(data):
+    return hashlib.blake2b(data, digest_size=KEY_CHECKSUM_BYTES, person=b"spx-key-file").digest()
+
+def is_binary_key(data):
+    return bytes(data[:len(KEY_MAGIC)]) == KEY_MAGIC
+
+def encode_key(key, params=None, extra=b""):
+    """
+    Encodes a secret key [secret_seed, secret_prf, public_seed, public_root] or a public key
+    [public_seed, public_root]. `extra` is an opaque slot for precomputed material stored along with the key.
+    """
+    if params is None:
+        params = get_parameters()
+    kind = KEY_SECRET if len(key) == _KEY_PARTS[KEY_SECRET] else KEY_PUBLIC
+    if len(key) != _KEY_PARTS[kind] or any(len(part) != params.n for part in key):
+        raise FormatError(f"key does not match parameter set {params.instance}")
+
+    header = _KEY_HEADER.pack(KEY_MAGIC, KEY_VERSION, kind, params.instance.encode("ascii"),
+                              _PRF_IDS[params.prf], len(extra))
+    body = header + b"".join(key) + bytes(extra)
+    return body + _key_checksum(body)
+
+def decode_key(data):
+    """
+    Returns (params, key, extra) from an encoded key. The key is a list of n-byte parts sliced out of data.
+    """
+    if len(data) < KEY_HEADER_BYTES + KEY_CHECKSUM_BYTES:
+        raise FormatError("key file is shorter than its header")
+    magic, version, kind, instance, prf_id, extra_len = _KEY_HEADER.unpack_from(data, 0)
+    if magic != KEY_MAGIC:
+        raise FormatError("not a binary SPHINCS+ key")
+    if version != KEY_VERSION:
+        raise FormatError(f"unsupported key format version {version}")
+    if kind not in _KEY_PARTS:
+        raise FormatError(f"unknown key kind {kind}")
+    if prf_id not in _PRF_NAMES:
+        raise FormatError(f"unknown PRF id {prf_id}")
+    instance = instance.decode("ascii")
+    if instance not in INSTANCES:
+        raise FormatError(f"unknown parameter set {instance}")
+    params = get_parameters(instance, prf=_PRF_NAMES[prf_id])
+
+    n = params.n
+    key_end = KEY_HEADER_BYTES + _KEY_PARTS[kind] * n
+    end = key_end + extra_len
+    if len(data) != end + KEY_CHECKSUM_BYTES:
+        raise FormatError(f"key file length {len(data)} != {end + KEY_CHECKSUM_BYTES} for {instance}")
+    data = bytes(data)
+    if _key_checksum(data[:end]) != data[end:]:
+        raise FormatError("key file checksum mismatch")
+
+    key = [data[i:i + n] for i in range(KEY_HEADER_BYTES, key_end, n)]
+    return params, key, data[key_end:end]
+
+def load_key(data, instance=None):
+    """
+    Returns (params, key, extra) from either format: binary, or a legacy pickled list of parts.
+    A legacy file records no parameter set: it gets `instance` (the default set when None) with the legacy PRF,
+    the only PRF there was when such files were written.
+    """
+    if is_binary_key(data):
+        return decode_key(data)
+
+    key = _legacy_loads(data)
+    if not isinstance(key, list) or len(key) not in _KEY_PARTS.values() or \
+            not all(isinstance(part, bytes) for part in key):
+        raise FormatError("legacy key file does not hold a key")
+    if instance is None:
+        instance = get_parameters().instance
+    return get_parameters(instance, prf=PRF_LEGACY), key, b""
+
+def read_key(path, instance=None):
+    with open(path, 'rb') as f:
+        return load_key(f.read(), instance)
+
+def write_key(path, key, params=None, extra=b""):
+    with open(path, 'wb') as f:
+        f.write(encode_key(key, params, extra))
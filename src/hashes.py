@@ -5,37 +5,197 @@ Hashing functions and pseudo-random generators (tweakables)
 from src.utils import *
 from src.parameters import *
 from src.ADRS import *
-import math
 import hashlib
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
 def hash(seed, adrs: ADRS, value, n=None):
     if n is None:
-        params = get_parameters()
-        n = params["n"]
+        n = get_parameters().n
     m = hashlib.blake2b()
 
     m.update(seed)
-    m.update(adrs.to_bin())
+    m.update(adrs.view)
     m.update(value)
 
     hashed = m.digest()[:n]
     return hashed
 
-def prf(secret_seed, adrs, params=None):
+class HashContext:
+    """
+    Tweakable hash bound to one public_seed.
+    The seed is absorbed once, every call clones the prepared blake2b state.
+    Output is identical to hash(public_seed, adrs, value, n).
+    """
+    __slots__ = ("public_seed", "n", "_state")
+
+    def __init__(self, public_seed, n):
+        self.public_seed = public_seed
+        self.n = n
+        self._state = hashlib.blake2b(public_seed)
+
+    def hash(self, adrs: ADRS, value):
+        m = self._state.copy()
+        m.update(adrs.view)
+        m.update(value)
+        return m.digest()[:self.n]
+
+    def hash_pair(self, adrs: ADRS, left, right):
+        """
+        hash(adrs, left + right) without building the concatenation; left and right may be memoryviews.
+        """
+        m = self._state.copy()
+        m.update(adrs.view)
+        m.update(left)
+        m.update(right)
+        return m.digest()[:self.n]
+
+    def hash_parts(self, adrs: ADRS, parts):
+        m = self._state.copy()
+        m.update(adrs.view)
+        for part in parts:
+            m.update(part)
+        return m.digest()[:self.n]
+
+    def chain(self, adrs: ADRS, value, start, steps):
+        """
+        Iterates the hash steps times from chain position start.
+        The hash address is written into adrs in place, nothing else is allocated per step.
+        """
+        state = self._state
+        n = self.n
+        view = adrs.view
+        set_hash_address = adrs.set_hash_address
+        for j in range(start, start + steps):
+            set_hash_address(j)
+            m = state.copy()
+            m.update(view)
+            m.update(value)
+            value = m.digest()[:n]
+        return value
+
+class CountingHashContext(HashContext):
+    """
+    HashContext that also counts its hash calls by ADRS type into an instrument.Stats.
+    """
+    __slots__ = ("stats",)
+
+    def __init__(self, public_seed, n, stats):
+        super().__init__(public_seed, n)
+        self.stats = stats
+
+    def hash(self, adrs: ADRS, value):
+        self.stats.count_hash(adrs.get_type())
+        return HashContext.hash(self, adrs, value)
+
+    def hash_pair(self, adrs: ADRS, left, right):
+        self.stats.count_hash(adrs.get_type())
+        return HashContext.hash_pair(self, adrs, left, right)
+
+    def hash_parts(self, adrs: ADRS, parts):
+        self.stats.count_hash(adrs.get_type())
+        return HashContext.hash_parts(self, adrs, parts)
+
+    def chain(self, adrs: ADRS, value, start, steps):
+        if steps > 0:
+            self.stats.count_hash(adrs.get_type(), steps)
+        return HashContext.chain(self, adrs, value, start, steps)
+
+def hash_context(public_seed, n, stats=None):
+    """
+    HashContext for one operation; counting into stats when given (see instrument.current()).
+    """
+    if stats is not None:
+        return CountingHashContext(public_seed, n, stats)
+    return HashContext(public_seed, n)
+
+class Blake2bPRF:
+    """
+    Keyed PRF: blake2b with key=secret_seed and digest_size=n over the ADRS.
+    """
+    __slots__ = ("secret_seed", "n", "_state")
+
+    def __init__(self, secret_seed, n):
+        self.secret_seed = secret_seed
+        self.n = n
+        self._state = hashlib.blake2b(key=secret_seed, digest_size=n)
+
+    def prf(self, adrs: ADRS):
+        m = self._state.copy()
+        m.update(adrs.view)
+        return m.digest()
+
+    def prf_msg(self, opt, value):
+        m = self._state.copy()
+        m.update(opt)
+        m.update(value)
+        return m.digest()
+
+class LegacyPRF:
+    """
+    Original Mersenne-Twister PRF, kept so that keys generated before the keyed PRF stay valid.
+    Uses a private generator instead of reseeding the global one.
+    """
+    __slots__ = ("secret_seed", "n", "_random")
+
+    def __init__(self, secret_seed, n):
+        self.secret_seed = secret_seed
+        self.n = n
+        self._random = random.Random()
+
+    def prf(self, adrs: ADRS):
+        self._random.seed(int.from_bytes(self.secret_seed + adrs.view, "big"))
+        return self._random.randint(0, 256 ** self.n).to_bytes(self.n, byteorder='big')
+
+    def prf_msg(self, opt, value):
+        digest = hash_msg(b'0', b'0', b'0', value, self.n * 2)
+        self._random.seed(int.from_bytes(self.secret_seed + opt + digest, "big"))
+        return self._random.randint(0, 256 ** self.n).to_bytes(self.n, byteorder='big')
+
+class CountingPRF:
+    """
+    Wraps a PRF engine and counts its calls into an instrument.Stats.
+    """
+    __slots__ = ("engine", "stats")
+
+    def __init__(self, engine, stats):
+        self.engine = engine
+        self.stats = stats
+
+    def prf(self, adrs: ADRS):
+        self.stats.count_prf(adrs.get_type())
+        return self.engine.prf(adrs)
+
+    def prf_msg(self, opt, value):
+        self.stats.count_prf_msg()
+        return self.engine.prf_msg(opt, value)
+
+PRF_ENGINES = {
+    PRF_BLAKE2B: Blake2bPRF,
+    PRF_LEGACY: LegacyPRF
+}
+
+def prf_context(secret_seed, params=None, stats=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    
-    random.seed(int.from_bytes(secret_seed + adrs.to_bin(), "big"))
-    return random.randint(0, 256 ** n).to_bytes(n, byteorder='big')
+    engine = PRF_ENGINES[params.prf](secret_seed, params.n)
+    if stats is not None:
+        return CountingPRF(engine, stats)
+    return engine
+
+def prf(secret_seed, adrs, params=None):
+    return prf_context(secret_seed, params).prf(adrs)
 
-def hash_msg(r, public_seed, public_root, value, digest_size=None, params=None):
+def hash_msg(r, public_seed, public_root, value, digest_size=None, params=None, stats=None):
     if params is None:
         params = get_parameters()
     if digest_size is None:
-        digest_size = params["n"]
-    
+        digest_size = params.n
+    if stats is not None:
+        stats.count_hash_msg()
+
     m = hashlib.blake2b()
 
     m.update(r)
@@ -61,12 +221,7 @@ def hash_msg(r, public_seed, public_root, value, digest_size=None, params=None):
     return hashed
 
 def prf_msg(secret_seed, opt, m, params=None):
-    if params is None:
-        params = get_parameters()
-    n = params["n"]
-    
-    random.seed(int.from_bytes(secret_seed + opt + hash_msg(b'0', b'0', b'0', m, n*2, params=params), "big"))
-    return random.randint(0, 256 ** n).to_bytes(n, byteorder='big')
+    return prf_context(secret_seed, params).prf_msg(opt, m)
 
 def base_w(x, w, out_len):
     vin = 0
@@ -74,13 +229,14 @@ def base_w(x, w, out_len):
     total = 0
     bits = 0
     basew = []
+    log_w = w.bit_length() - 1
 
     for consumed in range(0, out_len):
         if bits == 0:
             total = x[vin]
             vin += 1
             bits += 8
-        bits -= math.floor(math.log(w, 2))
+        bits -= log_w
         basew.append((total >> bits) % w)
         vout += 1
 
@@ -89,40 +245,25 @@ def base_w(x, w, out_len):
 def sig_wots_from_sig_xmss(sig, params=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-    
-    return sig[0:len_0]
+
+    return sig[0:params.len_0]
 
 def auth_from_sig_xmss(sig, params=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-    
-    return sig[len_0:]
+
+    return sig[params.len_0:]
 
 def sigs_xmss_from_sig_ht(sig, params=None):
     if params is None:
         params = get_parameters()
-    d = params["d"]
-    h = params["h"]
-    h_prime = h // d
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-    
+    d = params.d
+    h_prime = params.h_prime
+    len_0 = params.len_0
+
     expected_length = d * (h_prime + len_0)
     if len(sig) != expected_length:
-        print(f"sigs_xmss_from_sig_ht: sig length = {len(sig)}, expected = {expected_length}")
+        logger.debug("sigs_xmss_from_sig_ht: sig length = %s, expected = %s", len(sig), expected_length)
     
     sigs = []
     for i in range(0, d):
@@ -134,12 +275,12 @@ def sigs_xmss_from_sig_ht(sig, params=None):
 def auths_from_sig_fors(sig, params=None):
     if params is None:
         params = get_parameters()
-    k = params["k"]
-    a = params["a"]
+    k = params.k
+    a = params.a
 
     expected_length = k * (a + 1)
     if len(sig) != expected_length:
-        print(f"auths_from_sig_fors: sig length = {len(sig)}, expected = {expected_length}")
+        logger.debug("auths_from_sig_fors: sig length = %s, expected = %s", len(sig), expected_length)
         return []
 
     sigs = []
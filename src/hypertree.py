@@ -1,100 +1,235 @@
+import logging
 from src.parameters import *
 from src.hashes import *
 from src.ADRS import *
 from src.xmss import *
+from src.parallel import get_pool
+from src.cache import TreeCache
+from src import instrument
 
-def ht_pk_gen(secret_seed, public_seed, params=None):
+logger = logging.getLogger(__name__)
+
+def ht_layer_tree(secret_seed, public_seed, layer, idx_tree, params=None, ctx=None, prf_ctx=None, cache=None, key=None):
+    """
+    Levels of the XMSS tree idx_tree at hypertree layer `layer`, taken from cache when present.
+    """
     if params is None:
         params = get_parameters()
-    d = params["d"]
+    if cache is not None:
+        if key is None:
+            key = TreeCache.key_id(secret_seed, public_seed, params)
+        levels = cache.get(key, layer, idx_tree)
+        if levels is not None:
+            return levels
 
     adrs = ADRS()
-    adrs.set_layer_address(d - 1)
-    adrs.set_tree_address(0)
-    root = xmss_pk_gen(secret_seed, public_seed, adrs.copy(), params=params)
-    return root
+    adrs.set_layer_address(layer)
+    adrs.set_tree_address(idx_tree)
+    levels = xmss_tree(secret_seed, public_seed, adrs, params=params, ctx=ctx, prf_ctx=prf_ctx)
+
+    if cache is not None:
+        cache.put(key, layer, idx_tree, levels)
+    return levels
 
-def ht_sign(m, secret_seed, public_seed, idx_tree, idx_leaf, params=None):
+def ht_pk_gen(secret_seed, public_seed, params=None, ctx=None, prf_ctx=None, cache=None):
     if params is None:
         params = get_parameters()
-    d = params["d"]
-    h = params["h"]
-    n = params["n"]
-    h_prime = h // d
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    d = params.d
+
+    if cache is not None:
+        levels = ht_layer_tree(secret_seed, public_seed, d - 1, 0, params=params, ctx=ctx, prf_ctx=prf_ctx, cache=cache)
+        return levels[-1][0]
 
     adrs = ADRS()
-    adrs.set_layer_address(0)
-    adrs.set_tree_address(idx_tree)
+    adrs.set_layer_address(d - 1)
+    adrs.set_tree_address(0)
+    root = xmss_pk_gen(secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx)
+    return root
 
-    sig_tmp = xmss_sign(m, secret_seed, idx_leaf, public_seed, adrs.copy(), params=params)
-    sig_ht = sig_tmp
-    root = xmss_pk_from_sig(idx_leaf, sig_tmp, m, public_seed, adrs.copy(), params=params)
+def check_root(root, public_root):
+    """
+    Raises ValueError when the top-layer root rebuilt while signing is not the key's public root:
+    the key was made with another PRF or parameter set, and the signature would never verify.
+    """
+    if public_root is not None and root != public_root:
+        raise ValueError("ht_sign: rebuilt root does not match the public root, wrong PRF or parameter set for this key")
+
+def ht_layers(idx_tree, idx_leaf, params=None):
+    """
+    (idx_tree, idx_leaf) of the XMSS tree used at every hypertree layer, from layer 0 up.
+    """
+    if params is None:
+        params = get_parameters()
+    h_prime = params.h_prime
 
-    for j in range(1, d):
-        idx_leaf = idx_tree % (2 ** h_prime)
+    layers = [(idx_tree, idx_leaf)]
+    for j in range(1, params.d):
+        idx_leaf = idx_tree % (1 << h_prime)
         idx_tree = idx_tree >> h_prime
+        layers.append((idx_tree, idx_leaf))
+    return layers
+
+def _xmss_layer_job(job):
+    secret_seed, public_seed, layer, idx_tree, params = job
+    return ht_layer_tree(secret_seed, public_seed, layer, idx_tree, params=params)
+
+def _wots_sign_job(job):
+    m, secret_seed, public_seed, adrs_bytes, params = job
+    return wots_sign(m, secret_seed, public_seed, ADRS(adrs_bytes), params=params)
+
+def ht_sign_parallel(m, secret_seed, public_seed, idx_tree, idx_leaf, params=None, workers=None, cache=None, memo=None, public_root=None):
+    """
+    ht_sign with all d layers computed concurrently in a process pool.
+    The tree a layer signs with depends only on idx_tree, so all layer trees are built at once first,
+    then every layer WOTS+-signs the root of the tree below it (layer 0 signs m).
+    """
+    if params is None:
+        params = get_parameters()
+    pool = get_pool(workers)
+    layers = ht_layers(idx_tree, idx_leaf, params=params)
+    key = TreeCache.key_id(secret_seed, public_seed, params) if cache is not None else None
+
+    memoized = [memo.get(j, *layer) if memo is not None else None for j, layer in enumerate(layers)]
+    trees = [None] * len(layers)
+    missing = []
+    for j, (idx_tree_j, _) in enumerate(layers):
+        if memoized[j] is not None:
+            continue
+        if cache is not None:
+            trees[j] = cache.get(key, j, idx_tree_j)
+        if trees[j] is None:
+            missing.append(j)
+    jobs = [(secret_seed, public_seed, j, layers[j][0], params) for j in missing]
+    for j, levels in zip(missing, pool.map(_xmss_layer_job, jobs)):
+        trees[j] = levels
+        if cache is not None:
+            cache.put(key, j, layers[j][0], levels)
+    roots = [memoized[j][1] if memoized[j] is not None else trees[j][-1][0] for j in range(0, len(layers))]
+    check_root(roots[-1], public_root)
 
+    adrs = ADRS()
+    signed = [j for j in range(0, len(layers)) if memoized[j] is None]
+    wots_jobs = []
+    for j in signed:
+        idx_tree_j, idx_leaf_j = layers[j]
         adrs.set_layer_address(j)
-        adrs.set_tree_address(idx_tree)
-
-        sig_tmp = xmss_sign(root, secret_seed, idx_leaf, public_seed, adrs.copy(), params=params)
-        sig_ht = sig_ht + sig_tmp
-
-        if j < d - 1:
-            root = xmss_pk_from_sig(idx_leaf, sig_tmp, root, public_seed, adrs.copy(), params=params)
+        adrs.set_tree_address(idx_tree_j)
+        adrs.set_type(ADRS.WOTS_HASH)
+        adrs.set_key_pair_address(idx_leaf_j)
+        msg = m if j == 0 else roots[j - 1]
+        wots_jobs.append((msg, secret_seed, public_seed, adrs.snapshot(), params))
+    for j, sig in zip(signed, pool.map(_wots_sign_job, wots_jobs)):
+        memoized[j] = (sig + xmss_auth_path(trees[j], layers[j][1]), roots[j])
+        if memo is not None:
+            memo.put(j, layers[j][0], layers[j][1], *memoized[j])
+
+    sig_ht = []
+    for sig_xmss, _ in memoized:
+        sig_ht += sig_xmss
+    return sig_ht
 
-    expected_length = d * (h_prime + len_0) * n
+def ht_sign(m, secret_seed, public_seed, idx_tree, idx_leaf, params=None, ctx=None, prf_ctx=None, workers=None, cache=None, memo=None, public_root=None):
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+
+    if workers is not None and workers > 1:
+        sig_ht = ht_sign_parallel(m, secret_seed, public_seed, idx_tree, idx_leaf, params=params, workers=workers, cache=cache, memo=memo, public_root=public_root)
+        instrument.progress("ht", params.d, params.d)
+    else:
+        key = TreeCache.key_id(secret_seed, public_seed, params) if cache is not None else None
+        adrs = ADRS()
+        sig_ht = []
+        root = m
+        for j, (idx_tree, idx_leaf) in enumerate(ht_layers(idx_tree, idx_leaf, params=params)):
+            entry = memo.get(j, idx_tree, idx_leaf) if memo is not None else None
+            if entry is not None:
+                sig_tmp, root = entry
+                sig_ht = sig_ht + sig_tmp
+                instrument.progress("ht", j + 1, params.d)
+                continue
+
+            adrs.set_layer_address(j)
+            adrs.set_tree_address(idx_tree)
+
+            with instrument.phase(f"ht_layer_{j}"):
+                levels = ht_layer_tree(secret_seed, public_seed, j, idx_tree, params=params, ctx=ctx, prf_ctx=prf_ctx, cache=cache, key=key)
+                sig_tmp, root = xmss_sign_root(root, secret_seed, idx_leaf, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx, levels=levels)
+            sig_ht = sig_ht + sig_tmp
+
+            if memo is not None:
+                memo.put(j, idx_tree, idx_leaf, sig_tmp, root)
+            instrument.progress("ht", j + 1, params.d)
+        check_root(root, public_root)
+
+    expected_length = params.ht_bytes
     total_length = sum(len(x) for x in sig_ht) 
-    print(f"ht_sign: sig_ht length = {total_length}, expected = {expected_length}")
+    logger.debug("ht_sign: sig_ht length = %s, expected = %s", total_length, expected_length)
     if total_length != expected_length:
         raise ValueError(f"ht_sign: Invalid sig_ht length: {total_length} != {expected_length}")
     return sig_ht
 
-def ht_verify(m, sig_ht, public_seed, idx_tree, idx_leaf, public_key_ht, params=None):
+def ht_verify(m, sig_ht, public_seed, idx_tree, idx_leaf, public_key_ht, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    d = params["d"]
-    h = params["h"]
-    n = params["n"]
-    h_prime = h // d
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    d = params.d
+    h_prime = params.h_prime
 
     adrs = ADRS()
 
-    sigs_xmss = sigs_xmss_from_sig_ht(sig_ht, params=params)  
-    expected_length = d * (h_prime + len_0) * n
-    total_length = sum(len(x) for x in sig_ht)
-    print(f"ht_verify: sig_ht length = {total_length}, expected = {expected_length}")
-    print(f"ht_verify: sigs_xmss length = {len(sigs_xmss)}, expected = {d}")
+    sigs_xmss = sigs_xmss_from_sig_ht(sig_ht, params=params)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ht_verify: sig_ht length = %s, expected = %s", sum(len(x) for x in sig_ht), params.ht_bytes)
+        logger.debug("ht_verify: sigs_xmss length = %s, expected = %s", len(sigs_xmss), d)
     if len(sigs_xmss) != d:
-        print(f"ht_verify: Invalid sigs_xmss length: {len(sigs_xmss)} != {d}")
+        logger.debug("ht_verify: Invalid sigs_xmss length: %s != %s", len(sigs_xmss), d)
         return False
 
     sig_tmp = sigs_xmss[0]
     adrs.set_layer_address(0)
     adrs.set_tree_address(idx_tree)
-    node = xmss_pk_from_sig(idx_leaf, sig_tmp, m, public_seed, adrs, params=params)
+    node = xmss_pk_from_sig(idx_leaf, sig_tmp, m, public_seed, adrs, params=params, ctx=ctx)
     if node is None:
-        print("ht_verify: Failed to compute node for layer 0")
+        logger.debug("ht_verify: Failed to compute node for layer 0")
         return False
 
     for j in range(1, d):
-        idx_leaf = idx_tree % (2 ** h_prime)
+        idx_leaf = idx_tree % (1 << h_prime)
         idx_tree = idx_tree >> h_prime
 
         sig_tmp = sigs_xmss[j]
         adrs.set_layer_address(j)
         adrs.set_tree_address(idx_tree)
-        node = xmss_pk_from_sig(idx_leaf, sig_tmp, node, public_seed, adrs, params=params)
+        node = xmss_pk_from_sig(idx_leaf, sig_tmp, node, public_seed, adrs, params=params, ctx=ctx)
         if node is None:
-            print(f"ht_verify: Failed to compute node for layer {j}")
+            logger.debug("ht_verify: Failed to compute node for layer %s", j)
             return False
 
-    return node == public_key_ht
\ No newline at end of file
+    return node == public_key_ht
+
+def ht_verify_view(m, sig, offset, idx_tree, idx_leaf, public_key_ht, params, ctx):
+    """
+    ht_verify over the d XMSS signatures stored back to back in the buffer sig (a memoryview) at offset.
+    """
+    h_prime = params.h_prime
+    xmss_bytes = params.xmss_bytes
+
+    adrs = ADRS()
+    node = m
+    for j in range(0, params.d):
+        adrs.set_layer_address(j)
+        adrs.set_tree_address(idx_tree)
+        with instrument.phase(f"ht_layer_{j}"):
+            node = xmss_pk_from_sig_view(idx_leaf, sig, offset + j * xmss_bytes, node, adrs, params, ctx)
+        instrument.progress("ht", j + 1, params.d)
+        idx_leaf = idx_tree % (1 << h_prime)
+        idx_tree = idx_tree >> h_prime
+
+    return node == public_key_ht
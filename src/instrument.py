@@ -0,0 +1,181 @@
+"""
+Opt-in instrumentation: hash/PRF call counters by ADRS type, per-phase timers and progress callbacks
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+from src.ADRS import ADRS
+
+ADRS_TYPE_NAMES = {
+    ADRS.WOTS_HASH: "wots_hash",
+    ADRS.WOTS_PK: "wots_pk",
+    ADRS.TREE: "tree",
+    ADRS.FORS_TREE: "fors_tree",
+    ADRS.FORS_ROOTS: "fors_roots",
+    ADRS.WOTS_PRF: "wots_prf"
+}
+
+class Stats:
+    """
+    Counters and timers collected while instrumentation is active.
+    hash and prf count calls per ADRS type, phases map a phase name to [calls, seconds].
+    Phase times are inclusive: "wots_sign" is also part of the "ht_layer_<j>" it runs in.
+    Only the context that enabled collection is counted: work done in other threads or in process-pool
+    workers (workers > 1) is not seen.
+    """
+    __slots__ = ("hash", "prf", "hash_msg", "prf_msg", "phases", "_lock")
+
+    def __init__(self):
+        self.hash = {}
+        self.prf = {}
+        self.hash_msg = 0
+        self.prf_msg = 0
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def count_hash(self, adrs_type, calls=1):
+        with self._lock:
+            self.hash[adrs_type] = self.hash.get(adrs_type, 0) + calls
+
+    def count_prf(self, adrs_type):
+        with self._lock:
+            self.prf[adrs_type] = self.prf.get(adrs_type, 0) + 1
+
+    def count_hash_msg(self):
+        with self._lock:
+            self.hash_msg += 1
+
+    def count_prf_msg(self):
+        with self._lock:
+            self.prf_msg += 1
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                self.phases[name] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+
+    def merge(self, other):
+        with self._lock:
+            for adrs_type, calls in other.hash.items():
+                self.hash[adrs_type] = self.hash.get(adrs_type, 0) + calls
+            for adrs_type, calls in other.prf.items():
+                self.prf[adrs_type] = self.prf.get(adrs_type, 0) + calls
+            self.hash_msg += other.hash_msg
+            self.prf_msg += other.prf_msg
+            for name, (calls, seconds) in other.phases.items():
+                entry = self.phases.setdefault(name, [0, 0.0])
+                entry[0] += calls
+                entry[1] += seconds
+
+    def total_hashes(self):
+        return sum(self.hash.values())
+
+    def as_dict(self):
+        return {
+            "hash": {ADRS_TYPE_NAMES.get(t, str(t)): c for t, c in sorted(self.hash.items())},
+            "prf": {ADRS_TYPE_NAMES.get(t, str(t)): c for t, c in sorted(self.prf.items())},
+            "hash_msg": self.hash_msg,
+            "prf_msg": self.prf_msg,
+            "phases": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.phases.items()}
+        }
+
+# Context-scoped: collection started in one thread (or asyncio task) is not seen by others.
+_current = contextvars.ContextVar("spx_instrument_stats", default=None)
+
+def current():
+    """
+    The Stats being collected into in the calling context, or None when instrumentation is off.
+    Read it once per operation, when hash and PRF contexts are built, not per hash call.
+    """
+    return _current.get()
+
+def enable(stats=None):
+    """
+    Turns instrumentation on in the calling context and returns the Stats registry that collects everything
+    from now on. Other threads, and process-pool workers, keep collecting nothing.
+    """
+    if stats is None:
+        stats = Stats()
+    _current.set(stats)
+    return stats
+
+def disable():
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+@contextlib.contextmanager
+def collect(stats=None):
+    """
+    Collects into a fresh (or the given) Stats for the duration of the block:
+
+        with collect() as stats:
+            sig = spx_sign(m, sk, params=params)
+        stats.as_dict()
+    """
+    if stats is None:
+        stats = Stats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+class _Phase:
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+_NO_PHASE = contextlib.nullcontext()
+
+def phase(name):
+    """
+    Context manager timing one phase; a shared no-op when instrumentation is off.
+    """
+    stats = _current.get()
+    if stats is None:
+        return _NO_PHASE
+    return _Phase(stats, name)
+
+class Cancelled(Exception):
+    """
+    Raised from a progress callback to abandon the operation that reported the progress.
+    """
+
+_progress = contextvars.ContextVar("spx_progress_callback", default=None)
+
+@contextlib.contextmanager
+def reporting(callback):
+    """
+    Calls callback(stage, done, total) from the current context while the block runs:
+    "fors" after every FORS tree, "ht" after every hypertree layer, "xmss" after every leaf of an XMSS tree being built.
+    An exception raised by the callback (e.g. Cancelled) propagates out of the operation and stops it.
+    Work done in process-pool workers (workers > 1) is reported when its results come back.
+    """
+    token = _progress.set(callback)
+    try:
+        yield
+    finally:
+        _progress.reset(token)
+
+def progress(stage, done, total):
+    callback = _progress.get()
+    if callback is not None:
+        callback(stage, done, total)
@@ -0,0 +1,178 @@
+"""
+Load testing of spx_sign / spx_verify: concurrent clients at a target rate, latency percentiles, peak memory
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from src.parameters import *
+from src.sphincs import spx_keygen, spx_sign, spx_verify
+from src.utils import summarize
+from src.bench import machine_info
+
+SCHEMA_VERSION = 1
+
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+
+OP_SIGN = "sign"
+OP_VERIFY = "verify"
+
+START_DELAY = 0.5
+
+def rss_peak_bytes():
+    """
+    Peak resident set size of this process, or None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def operation(op, params, secret_key, public_key, message, signature, sign_workers=None):
+    if op == OP_SIGN:
+        return lambda: spx_sign(message, secret_key, params=params, workers=sign_workers)
+    return lambda: spx_verify(message, signature, public_key, params=params)
+
+def tracemalloc_peak(fn):
+    """
+    Peak Python heap allocated by one call of fn, measured after a warm-up call.
+    """
+    fn()
+    already = tracemalloc.is_tracing()
+    if not already:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not already:
+            tracemalloc.stop()
+
+def _client(job):
+    """
+    One client: issues operations on its own schedule from start_at (wall clock) until deadline.
+    With an interval each operation has a due time; latency counts from that due time, so time
+    spent waiting behind a late operation is included. Returns (latencies, service times, errors, first, last, rss).
+    """
+    op, params, secret_key, public_key, message, signature, sign_workers, start_at, deadline, offset, interval, limit = job
+    fn = operation(op, params, secret_key, public_key, message, signature, sign_workers)
+
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    origin = time.perf_counter()
+    end = origin + (deadline - start_at)
+
+    latencies = []
+    services = []
+    errors = 0
+    first = time.time()
+    due = origin + offset
+    while len(latencies) < limit:
+        now = time.perf_counter()
+        if interval:
+            if due >= end:
+                break
+            if due > now:
+                time.sleep(due - now)
+        elif now >= end:
+            break
+        started = time.perf_counter()
+        try:
+            ok = fn()
+            if op == OP_VERIFY and not ok:
+                errors += 1
+        except Exception:
+            errors += 1
+        finished = time.perf_counter()
+        services.append(finished - started)
+        latencies.append(finished - (due if interval else started))
+        due += interval
+    return latencies, services, errors, first, time.time(), rss_peak_bytes()
+
+def run_load(op, params, clients, rate=None, duration=10.0, requests=None, mode=MODE_THREAD, sign_workers=None, keys=None):
+    """
+    Drives `clients` concurrent clients for `duration` seconds (or until `requests` operations in total).
+    rate is the target number of operations per second over all clients (None: as fast as possible).
+    Returns one machine-readable result dict.
+    """
+    if keys is None:
+        keys = spx_keygen(params=params)
+    secret_key, public_key = keys
+    message = os.urandom(params.n)
+    signature = spx_sign(message, secret_key, params=params) if op == OP_VERIFY else None
+
+    memory = tracemalloc_peak(operation(op, params, secret_key, public_key, message, signature, sign_workers))
+
+    interval = clients / rate if rate else 0.0
+    limit = -(-requests // clients) if requests else float("inf")
+    start_at = time.time() + START_DELAY
+    deadline = start_at + duration
+    jobs = [(op, params, secret_key, public_key, message, signature, sign_workers, start_at, deadline,
+             i / rate if rate else 0.0, interval, limit) for i in range(0, clients)]
+
+    executor = ProcessPoolExecutor if mode == MODE_PROCESS else ThreadPoolExecutor
+    with executor(max_workers=clients) as pool:
+        outcomes = list(pool.map(_client, jobs))
+
+    latencies = [x for outcome in outcomes for x in outcome[0]]
+    services = [x for outcome in outcomes for x in outcome[1]]
+    errors = sum(outcome[2] for outcome in outcomes)
+    elapsed = max(outcome[4] for outcome in outcomes) - min(outcome[3] for outcome in outcomes)
+    rss = [outcome[5] for outcome in outcomes if outcome[5] is not None]
+    if mode == MODE_THREAD:
+        rss = [rss_peak_bytes()] if rss else []
+
+    return {
+        "instance": params.instance,
+        "prf": params.prf,
+        "operation": op,
+        "mode": mode,
+        "clients": clients,
+        "sign_workers": sign_workers,
+        "target_rate": rate,
+        "duration": duration,
+        "operations": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency": summarize(latencies) if latencies else None,
+        "service_time": summarize(services) if services else None,
+        "tracemalloc_peak_bytes": memory,
+        "rss_peak_bytes": max(rss) if rss else None
+    }
+
+def run_sweep(instances, ops, client_counts, worker_counts=(None,), prf=PRF_BLAKE2B, progress=None, **kwargs):
+    """
+    run_load for every instance, operation, client count and spx_sign worker count; one key pair per instance.
+    Worker counts only apply to signing: verification runs once per client count, with sign_workers None.
+    """
+    runs = []
+    for instance in instances:
+        params = get_parameters(instance, prf=prf)
+        keys = spx_keygen(params=params)
+        for op in ops:
+            for sign_workers in (worker_counts if op == OP_SIGN else (None,)):
+                for clients in client_counts:
+                    result = run_load(op, params, clients, keys=keys, sign_workers=sign_workers, **kwargs)
+                    runs.append(result)
+                    if progress is not None:
+                        progress(result)
+    return {
+        "schema": SCHEMA_VERSION,
+        "machine": machine_info(),
+        "config": dict(kwargs, instances=list(instances), operations=list(ops), clients=list(client_counts),
+                       sign_workers=list(worker_counts), prf=prf),
+        "runs": runs
+    }
@@ -0,0 +1,32 @@
+"""
+Process pools shared by the parallel signing and verification modes
+"""
+
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+_POOLS = {}
+
+def cpu_workers(workers=None):
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def get_pool(workers=None):
+    """
+    Returns a process pool with the given number of workers, created once and reused by later calls.
+    """
+    workers = cpu_workers(workers)
+    pool = _POOLS.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _POOLS[workers] = pool
+    return pool
+
+def shutdown_pools():
+    while _POOLS:
+        _, pool = _POOLS.popitem()
+        pool.shutdown(cancel_futures=True)
+
+atexit.register(shutdown_pools)
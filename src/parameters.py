@@ -1,14 +1,111 @@
-import math
+import functools
 
 RANDOMIZE = True
 
-def get_parameters(instance="128s"):
-    params = {
-        "128s": {"n": 16, "w": 16, "h": 63, "d": 7, "k": 10, "a": 12},
-        "128f": {"n": 16, "w": 16, "h": 66, "d": 22, "k": 33, "a": 6},
-        "192s": {"n": 24, "w": 16, "h": 63, "d": 7, "k": 14, "a": 14},
-        "192f": {"n": 24, "w": 16, "h": 66, "d": 22, "k": 31, "a": 8},
-        "256s": {"n": 32, "w": 16, "h": 64, "d": 8, "k": 17, "a": 14},
-        "256f": {"n": 32, "w": 16, "h": 68, "d": 17, "k": 35, "a": 9}
-    }
-    return params.get(instance, params["128s"])
\ No newline at end of file
+PRF_BLAKE2B = "blake2b"
+PRF_LEGACY = "legacy"
+
+INSTANCES = {
+    "128s": {"n": 16, "w": 16, "h": 63, "d": 7, "k": 10, "a": 12},
+    "128f": {"n": 16, "w": 16, "h": 66, "d": 22, "k": 33, "a": 6},
+    "192s": {"n": 24, "w": 16, "h": 63, "d": 7, "k": 14, "a": 14},
+    "192f": {"n": 24, "w": 16, "h": 66, "d": 22, "k": 31, "a": 8},
+    "256s": {"n": 32, "w": 16, "h": 64, "d": 8, "k": 17, "a": 14},
+    "256f": {"n": 32, "w": 16, "h": 68, "d": 17, "k": 35, "a": 9}
+}
+
+class Parameters:
+    """
+    Immutable SPHINCS+ parameter set with every derived quantity computed once.
+    Still readable like the former dict: params["n"], params.get("a").
+    """
+    __slots__ = (
+        "instance", "n", "w", "h", "d", "k", "a", "prf",
+        "log_w", "len_1", "len_2", "len_0", "h_prime", "t",
+        "csum_shift", "csum_bytes",
+        "size_md", "size_idx_tree", "size_idx_leaf", "digest_bytes",
+        "wots_bytes", "xmss_bytes", "fors_bytes", "ht_bytes",
+        "sig_r_offset", "sig_fors_offset", "sig_ht_offset", "sig_bytes",
+        "pk_bytes", "sk_bytes"
+    )
+
+    def __init__(self, instance, n, w, h, d, k, a, prf=PRF_BLAKE2B):
+        set_field = functools.partial(object.__setattr__, self)
+        set_field("instance", instance)
+        set_field("n", n)
+        set_field("w", w)
+        set_field("h", h)
+        set_field("d", d)
+        set_field("k", k)
+        set_field("a", a)
+        set_field("prf", prf)
+
+        log_w = w.bit_length() - 1
+        len_1 = (8 * n + log_w - 1) // log_w
+        len_2 = 1
+        while w ** len_2 <= len_1 * (w - 1):
+            len_2 += 1
+        set_field("log_w", log_w)
+        set_field("len_1", len_1)
+        set_field("len_2", len_2)
+        set_field("len_0", len_1 + len_2)
+        set_field("h_prime", h // d)
+        set_field("t", 1 << a)
+
+        csum_bits = len_2 * log_w
+        set_field("csum_shift", 8 - (csum_bits % 8 or 8))
+        set_field("csum_bytes", (csum_bits + 7) // 8)
+
+        set_field("size_md", (k * a + 7) // 8)
+        set_field("size_idx_tree", (h - h // d + 7) // 8)
+        set_field("size_idx_leaf", (h // d + 7) // 8)
+        set_field("digest_bytes", self.size_md + self.size_idx_tree + self.size_idx_leaf)
+
+        set_field("wots_bytes", self.len_0 * n)
+        set_field("xmss_bytes", (self.len_0 + self.h_prime) * n)
+        set_field("fors_bytes", k * (a + 1) * n)
+        set_field("ht_bytes", d * self.xmss_bytes)
+        set_field("sig_r_offset", 0)
+        set_field("sig_fors_offset", n)
+        set_field("sig_ht_offset", n + self.fors_bytes)
+        set_field("sig_bytes", n + self.fors_bytes + self.ht_bytes)
+        set_field("pk_bytes", 2 * n)
+        set_field("sk_bytes", 4 * n)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Parameters is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Parameters is immutable")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def _key(self):
+        return (self.instance, self.n, self.w, self.h, self.d, self.k, self.a, self.prf)
+
+    def __eq__(self, other):
+        if not isinstance(other, Parameters):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return (Parameters, self._key())
+
+    def __repr__(self):
+        return ("Parameters(instance=%r, n=%d, w=%d, h=%d, d=%d, k=%d, a=%d, prf=%r)" % self._key())
+
+@functools.lru_cache(maxsize=None)
+def get_parameters(instance="128s", prf=PRF_BLAKE2B):
+    if instance not in INSTANCES:
+        instance = "128s"
+    return Parameters(instance, prf=prf, **INSTANCES[instance])
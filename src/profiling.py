@@ -0,0 +1,159 @@
+"""
+Profiling of SPHINCS+ operations with a breakdown by scheme structure, pstats and collapsed-stack output
+"""
+
+import cProfile
+import collections
+import contextlib
+import os
+import pstats
+import sys
+import threading
+import time
+
+from src import instrument
+from src.ADRS import ADRS
+
+PHASE_LABELS = {
+    "hash_msg": "message hashing (prf_msg + hash_msg)",
+    "fors": "FORS trees",
+    "ht": "hypertree (all layers)",
+    "xmss_tree": "XMSS tree building",
+    "wots_pk_gen": "WOTS+ key generation",
+    "wots_sign": "WOTS+ signing",
+    "wots_verify": "WOTS+ public key from signature"
+}
+
+def phase_label(name):
+    if name.startswith("ht_layer_"):
+        return f"hypertree layer {name[len('ht_layer_'):]}"
+    return PHASE_LABELS.get(name, name)
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+class StackSampler:
+    """
+    Samples the call stack of one thread every `interval` seconds from a background thread.
+    The samples are kept as collapsed stacks ("outer;...;inner" -> count), the input format of flamegraph tools.
+    """
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._switch_interval = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread = threading.Thread(target=self._run, name="spx-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+class Profile:
+    """
+    Result of a profiled() block: cProfile data, instrumentation counters and phase timers,
+    and optionally sampled stacks.
+    """
+
+    def __init__(self, profiler, stats, sampler, wall):
+        self.profiler = profiler
+        self.stats = stats
+        self.sampler = sampler
+        self.wall = wall
+        self._pstats = None
+
+    def pstats(self):
+        if self._pstats is None:
+            self._pstats = pstats.Stats(self.profiler)
+        return self._pstats
+
+    def _cumulative(self, filename, name):
+        """
+        Largest cumulative time among functions `name` defined in `filename`: wrappers (e.g. CountingPRF.prf)
+        include the function they wrap, so the outermost one accounts for all of it.
+        """
+        best = 0.0
+        for (path, _, func), (_, _, _, cumtime, _) in self.pstats().stats.items():
+            if func == name and os.path.basename(path) == filename:
+                best = max(best, cumtime)
+        return best
+
+    def structure(self):
+        """
+        Time attributed to the parts of the scheme, ranked: (label, seconds, calls, share of wall time).
+        Entries are inclusive and overlap (a hypertree layer contains its WOTS+ chains and PRF calls).
+        """
+        rows = [(phase_label(name), seconds, calls) for name, (calls, seconds) in self.stats.phases.items()]
+        prf_calls = sum(self.stats.prf.values()) + self.stats.prf_msg
+        chain_calls = self.stats.hash.get(ADRS.WOTS_HASH, 0)
+        rows.append(("WOTS+ chains (hash iterations)", self._cumulative("hashes.py", "chain"), chain_calls))
+        rows.append(("PRF", self._cumulative("hashes.py", "prf") + self._cumulative("hashes.py", "prf_msg"), prf_calls))
+        rows.sort(key=lambda row: -row[1])
+        return [(label, seconds, calls, seconds / self.wall if self.wall > 0 else 0.0) for label, seconds, calls in rows]
+
+    def functions(self, limit=20, sort="tottime"):
+        """
+        Top functions: (function, calls, tottime, cumtime), ranked by `sort` ("tottime" or "cumtime").
+        """
+        column = {"tottime": 2, "cumtime": 3}[sort]
+        items = sorted(self.pstats().stats.items(), key=lambda item: -item[1][column])
+        return [(f"{os.path.basename(path)}:{line}({func})", calls, tottime, cumtime)
+                for (path, line, func), (_, calls, tottime, cumtime, _) in items[:limit]]
+
+    def dump_stats(self, path):
+        self.pstats().dump_stats(path)
+
+    def write_collapsed(self, path):
+        if self.sampler is None:
+            raise ValueError("stack sampling was not enabled for this profile")
+        with open(path, "w") as f:
+            f.write(self.sampler.collapsed())
+
+@contextlib.contextmanager
+def profiled(sample_stacks=False, interval=0.001):
+    """
+    Profiles the calling thread for the duration of the block and yields a Profile that is filled in on exit:
+
+        with profiled(sample_stacks=True) as prof:
+            spx_sign(m, sk, params=params)
+        prof.structure(); prof.dump_stats("sign.pstats"); prof.write_collapsed("sign.folded")
+
+    Work done in process-pool workers (workers > 1) is not profiled.
+    """
+    profiler = cProfile.Profile()
+    sampler = StackSampler(interval=interval) if sample_stacks else None
+    result = Profile(profiler, None, sampler, 0.0)
+    with instrument.collect() as stats:
+        result.stats = stats
+        if sampler is not None:
+            sampler.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            result.wall = time.perf_counter() - start
+            if sampler is not None:
+                sampler.stop()
@@ -0,0 +1,101 @@
+"""
+Long-lived signer keeping per-key precomputed state between signatures
+"""
+
+import threading
+
+from src.parameters import *
+from src.hashes import *
+from src.ADRS import *
+from src.xmss import *
+from src.hypertree import *
+from src.cache import TreeCache, SignatureMemo, DEFAULT_MAX_BYTES, DEFAULT_MEMO_BYTES
+from src.sphincs import spx_sign
+from src.formats import read_key, FormatError
+
+class Signer:
+    """
+    Signs with one secret key, reusing built XMSS trees (TreeCache) and the complete
+    XMSS signatures of the top hypertree layers (SignatureMemo) across spx_sign calls.
+    With warm_up=True the memoized layers are filled in a background thread right away.
+    """
+
+    def __init__(self, secret_key, params=None, workers=None, cache_bytes=DEFAULT_MAX_BYTES,
+                 memo_bytes=DEFAULT_MEMO_BYTES, memo_layers=None, warm_up=False):
+        if params is None:
+            params = get_parameters()
+        self.secret_key = secret_key
+        self.public_key = [secret_key[2], secret_key[3]]
+        self.params = params
+        self.workers = workers
+        self.cache = TreeCache(max_bytes=cache_bytes)
+        self.memo = SignatureMemo(params, max_bytes=memo_bytes, layers=memo_layers)
+        self._warm_up_thread = None
+        if warm_up:
+            self.start_warm_up()
+
+    @classmethod
+    def from_file(cls, path, params=None, **kwargs):
+        """
+        Loads the secret key from a key file. The parameter set recorded in a binary key file wins over `params`;
+        a legacy file takes the instance of `params` with the legacy PRF.
+        """
+        key_params, secret_key, _ = read_key(path, params.instance if params is not None else None)
+        if len(secret_key) != 4:
+            raise FormatError(f"{path} does not hold a secret key")
+        return cls(secret_key, params=key_params, **kwargs)
+
+    def sign(self, m):
+        return spx_sign(m, self.secret_key, params=self.params, workers=self.workers, cache=self.cache, memo=self.memo)
+
+    def warm_up(self):
+        """
+        Computes every memoized XMSS signature, from the lowest memoized layer up.
+        Each layer signs the roots of the layer below, so roots are carried over from one layer to the next.
+        """
+        params = self.params
+        h_prime = params.h_prime
+        secret_seed = self.secret_key[0]
+        public_seed = self.secret_key[2]
+        ctx = HashContext(public_seed, params.n)
+        prf_ctx = prf_context(secret_seed, params)
+        key = TreeCache.key_id(secret_seed, public_seed, params)
+
+        child_roots = None
+        for layer in range(self.memo.min_layer, params.d):
+            roots = {}
+            for idx_tree in range(0, 1 << ((params.d - 1 - layer) * h_prime)):
+                levels = ht_layer_tree(secret_seed, public_seed, layer, idx_tree, params=params, ctx=ctx,
+                                       prf_ctx=prf_ctx, cache=self.cache, key=key)
+                root = levels[-1][0]
+                roots[idx_tree] = root
+
+                for idx_leaf in range(0, 1 << h_prime):
+                    if self.memo.has(layer, idx_tree, idx_leaf):
+                        continue
+                    child = (idx_tree << h_prime) | idx_leaf
+                    if child_roots is not None:
+                        m = child_roots[child]
+                    else:
+                        m = ht_layer_tree(secret_seed, public_seed, layer - 1, child, params=params, ctx=ctx,
+                                          prf_ctx=prf_ctx)[-1][0]
+                    adrs = ADRS()
+                    adrs.set_layer_address(layer)
+                    adrs.set_tree_address(idx_tree)
+                    sig_xmss, _ = xmss_sign_root(m, secret_seed, idx_leaf, public_seed, adrs, params=params, ctx=ctx,
+                                                 prf_ctx=prf_ctx, levels=levels)
+                    self.memo.put(layer, idx_tree, idx_leaf, sig_xmss, root)
+            child_roots = roots
+
+    def start_warm_up(self):
+        if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name="spx-warm-up", daemon=True)
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def stats(self):
+        return {
+            "tree_cache": self.cache.stats.as_dict(),
+            "tree_cache_bytes": self.cache.bytes,
+            "memo": self.memo.as_dict()
+        }
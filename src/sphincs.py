@@ -2,10 +2,13 @@
 Main SPHINCS+ functions
 """
 
-import math
+import logging
 import hashlib
 import random
 import os
+import itertools
+import mmap
+from collections import deque
 
 from src.utils import *
 from src.parameters import *
@@ -15,81 +18,92 @@ from src.WOTSplus import *
 from src.xmss import *
 from src.hypertree import *
 from src.FORS import *
+from src.parallel import get_pool, cpu_workers
+from src import instrument
 
-def spx_keygen(params=None):
+logger = logging.getLogger(__name__)
+
+def spx_keygen(params=None, cache=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    
+    n = params.n
+
     secret_seed = os.urandom(n)
     secret_prf = os.urandom(n)
     public_seed = os.urandom(n)
 
-    public_root = ht_pk_gen(secret_seed, public_seed, params=params)
+    stats = instrument.current()
+    ctx = hash_context(public_seed, n, stats)
+    prf_ctx = prf_context(secret_seed, params, stats)
+    public_root = ht_pk_gen(secret_seed, public_seed, params=params, ctx=ctx, prf_ctx=prf_ctx, cache=cache)
 
     return [secret_seed, secret_prf, public_seed, public_root], [public_seed, public_root]
 
-def spx_sign(m, secret_key, params=None):
+def spx_sign(m, secret_key, params=None, workers=None, cache=None, memo=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    h = params["h"]
-    d = params["d"]
-    k = params["k"]
-    a = params["a"]
-    
+    n = params.n
+    h = params.h
+    k = params.k
+    a = params.a
+    h_prime = params.h_prime
+
     adrs = ADRS()
 
     secret_seed = secret_key[0]
     secret_prf = secret_key[1]
     public_seed = secret_key[2]
     public_root = secret_key[3]
+    stats = instrument.current()
+    ctx = hash_context(public_seed, n, stats)
+    prf_ctx = prf_context(secret_seed, params, stats)
 
     opt = bytes(n)
     if RANDOMIZE:
         opt = os.urandom(n)
-    r = prf_msg(secret_prf, opt, m, params=params)
-    sig = [r]
 
-    size_md = math.floor((k * a + 7) / 8)
-    size_idx_tree = math.floor((h - h // d + 7) / 8)
-    size_idx_leaf = math.floor((h // d + 7) / 8)
+    size_md = params.size_md
+    size_idx_tree = params.size_idx_tree
 
-    digest = hash_msg(r, public_seed, public_root, m, size_md + size_idx_tree + size_idx_leaf, params=params)
+    with instrument.phase("hash_msg"):
+        r = prf_context(secret_prf, params, stats).prf_msg(opt, m)
+        digest = hash_msg(r, public_seed, public_root, m, params.digest_bytes, params=params, stats=stats)
     tmp_md = digest[:size_md]
     tmp_idx_tree = digest[size_md:(size_md + size_idx_tree)]
     tmp_idx_leaf = digest[(size_md + size_idx_tree):]
 
-    md_int = int.from_bytes(tmp_md, 'big') >> (len(tmp_md) * 8 - k * a)
-    md = md_int.to_bytes(math.ceil(k * a / 8), 'big')
+    md_int = int.from_bytes(tmp_md, 'big') >> (size_md * 8 - k * a)
+    md = md_int.to_bytes(size_md, 'big')
 
-    idx_tree = int.from_bytes(tmp_idx_tree, 'big') >> (len(tmp_idx_tree) * 8 - (h - h // d))
-    idx_leaf = int.from_bytes(tmp_idx_leaf, 'big') >> (len(tmp_idx_leaf) * 8 - (h // d))
+    idx_tree = int.from_bytes(tmp_idx_tree, 'big') >> (size_idx_tree * 8 - (h - h_prime))
+    idx_leaf = int.from_bytes(tmp_idx_leaf, 'big') >> (params.size_idx_leaf * 8 - h_prime)
 
     adrs.set_layer_address(0)
     adrs.set_tree_address(idx_tree)
     adrs.set_type(ADRS.FORS_TREE)
     adrs.set_key_pair_address(idx_leaf)
 
-    sig_fors = fors_sign(md, secret_seed, public_seed, adrs.copy(), params=params)
-    sig += [sig_fors]
-
-    pk_fors = fors_pk_from_sig(sig_fors, md, public_seed, adrs.copy(), params=params)
+    with instrument.phase("fors"):
+        sig_fors, pk_fors = fors_sign_pk(md, secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx, workers=workers)
 
     adrs.set_type(ADRS.TREE)
-    sig_ht = ht_sign(pk_fors, secret_seed, public_seed, idx_tree, idx_leaf, params=params)
-    sig += [sig_ht]
+    with instrument.phase("ht"):
+        sig_ht = ht_sign(pk_fors, secret_seed, public_seed, idx_tree, idx_leaf, params=params, ctx=ctx, prf_ctx=prf_ctx, workers=workers, cache=cache, memo=memo, public_root=public_root)
 
-    print(f"spx_sign: sig components = {[len(x) if isinstance(x, bytes) else len(x) for x in sig]}")
+    sig = r + b"".join(sig_fors) + b"".join(sig_ht)
+    logger.debug("spx_sign: sig components = %s", [len(r), params.fors_bytes, params.ht_bytes])
     return sig
 
 def spx_verify(m, sig, public_key, params=None):
     if params is None:
         params = get_parameters()
-    h = params["h"]
-    d = params["d"]
-    k = params["k"]
-    a = params["a"]
+    h = params.h
+    k = params.k
+    a = params.a
+    h_prime = params.h_prime
+
+    if isinstance(sig, (bytes, bytearray, memoryview, mmap.mmap)):
+        return spx_verify_view(m, sig, public_key, params=params)
 
     adrs = ADRS()
     r = sig[0]
@@ -98,28 +112,196 @@ def spx_verify(m, sig, public_key, params=None):
 
     public_seed = public_key[0]
     public_root = public_key[1]
+    stats = instrument.current()
+    ctx = hash_context(public_seed, params.n, stats)
 
-    size_md = math.floor((k * a + 7) / 8)
-    size_idx_tree = math.floor((h - h // d + 7) / 8)
-    size_idx_leaf = math.floor((h // d + 7) / 8)
+    size_md = params.size_md
+    size_idx_tree = params.size_idx_tree
 
-    digest = hash_msg(r, public_seed, public_root, m, size_md + size_idx_tree + size_idx_leaf, params=params)
+    digest = hash_msg(r, public_seed, public_root, m, params.digest_bytes, params=params, stats=stats)
     tmp_md = digest[:size_md]
     tmp_idx_tree = digest[size_md:(size_md + size_idx_tree)]
     tmp_idx_leaf = digest[(size_md + size_idx_tree):]
 
-    md_int = int.from_bytes(tmp_md, 'big') >> (len(tmp_md) * 8 - k * a)
-    md = md_int.to_bytes(math.ceil(k * a / 8), 'big')
+    md_int = int.from_bytes(tmp_md, 'big') >> (size_md * 8 - k * a)
+    md = md_int.to_bytes(size_md, 'big')
 
-    idx_tree = int.from_bytes(tmp_idx_tree, 'big') >> (len(tmp_idx_tree) * 8 - (h - h // d))
-    idx_leaf = int.from_bytes(tmp_idx_leaf, 'big') >> (len(tmp_idx_leaf) * 8 - (h // d))
+    idx_tree = int.from_bytes(tmp_idx_tree, 'big') >> (size_idx_tree * 8 - (h - h_prime))
+    idx_leaf = int.from_bytes(tmp_idx_leaf, 'big') >> (params.size_idx_leaf * 8 - h_prime)
 
     adrs.set_layer_address(0)
     adrs.set_tree_address(idx_tree)
     adrs.set_type(ADRS.FORS_TREE)
     adrs.set_key_pair_address(idx_leaf)
 
-    pk_fors = fors_pk_from_sig(sig_fors, md, public_seed, adrs, params=params)
+    pk_fors = fors_pk_from_sig(sig_fors, md, public_seed, adrs, params=params, ctx=ctx)
 
     adrs.set_type(ADRS.TREE)
-    return ht_verify(pk_fors, sig_ht, public_seed, idx_tree, idx_leaf, public_root, params=params)
\ No newline at end of file
+    return ht_verify(pk_fors, sig_ht, public_seed, idx_tree, idx_leaf, public_root, params=params, ctx=ctx)
+
+def spx_verify_view(m, sig, public_key, params=None):
+    """
+    spx_verify over a flat R || FORS || HT signature in any buffer (bytes, memoryview, mmap).
+    Every signature node is hashed straight out of one memoryview at offsets given by params:
+    no part of the signature is copied.
+    """
+    if params is None:
+        params = get_parameters()
+    h = params.h
+    k = params.k
+    a = params.a
+    h_prime = params.h_prime
+
+    sig = memoryview(sig)
+    if sig.nbytes != params.sig_bytes:
+        return False
+    if sig.format != "B" or sig.ndim != 1:
+        sig = sig.cast("B")
+
+    public_seed = public_key[0]
+    public_root = public_key[1]
+    stats = instrument.current()
+    ctx = hash_context(public_seed, params.n, stats)
+
+    size_md = params.size_md
+    size_idx_tree = params.size_idx_tree
+
+    r = sig[params.sig_r_offset:params.sig_fors_offset]
+    with instrument.phase("hash_msg"):
+        digest = hash_msg(r, public_seed, public_root, m, params.digest_bytes, params=params, stats=stats)
+    md_int = int.from_bytes(digest[:size_md], 'big') >> (size_md * 8 - k * a)
+    md = md_int.to_bytes(size_md, 'big')
+    idx_tree = int.from_bytes(digest[size_md:(size_md + size_idx_tree)], 'big') >> (size_idx_tree * 8 - (h - h_prime))
+    idx_leaf = int.from_bytes(digest[(size_md + size_idx_tree):], 'big') >> (params.size_idx_leaf * 8 - h_prime)
+
+    adrs = ADRS()
+    adrs.set_layer_address(0)
+    adrs.set_tree_address(idx_tree)
+    adrs.set_type(ADRS.FORS_TREE)
+    adrs.set_key_pair_address(idx_leaf)
+    with instrument.phase("fors"):
+        pk_fors = fors_pk_from_sig_view(sig, params.sig_fors_offset, md, adrs, params, ctx)
+
+    with instrument.phase("ht"):
+        return ht_verify_view(pk_fors, sig, params.sig_ht_offset, idx_tree, idx_leaf, public_root, params, ctx)
+
+def sig_to_bytes(sig):
+    """
+    Flattens a legacy [r, sig_fors, sig_ht] signature into the R || FORS || HT bytes spx_sign returns.
+    """
+    if isinstance(sig, (bytes, bytearray, memoryview)):
+        return bytes(sig)
+    return sig[0] + b"".join(sig[1]) + b"".join(sig[2])
+
+def sig_from_bytes(data, params=None):
+    if params is None:
+        params = get_parameters()
+    n = params.n
+
+    fors_offset = params.sig_fors_offset
+    ht_offset = params.sig_ht_offset
+    r = bytes(data[:n])
+    sig_fors = [bytes(data[i:i + n]) for i in range(fors_offset, ht_offset, n)]
+    sig_ht = [bytes(data[i:i + n]) for i in range(ht_offset, params.sig_bytes, n)]
+    return [r, sig_fors, sig_ht]
+
+def _verify_payloads(params, payloads):
+    results = []
+    for m, sig_bytes, pk_bytes in payloads:
+        try:
+            if len(sig_bytes) != params.sig_bytes or len(pk_bytes) != params.pk_bytes:
+                results.append(False)
+                continue
+            public_key = [pk_bytes[:params.n], pk_bytes[params.n:]]
+            results.append(bool(spx_verify(m, sig_bytes, public_key, params=params)))
+        except Exception:
+            results.append(False)
+    return results
+
+def _verify_payload(item, params):
+    """
+    (params, flat bytes payload) of one verification item, or (params, None) for a malformed item,
+    which then verifies as False instead of aborting the whole batch.
+    """
+    try:
+        if len(item) > 3 and item[3] is not None:
+            params = item[3]
+            if not isinstance(params, Parameters):
+                raise TypeError("item params must be Parameters")
+        m, sig, public_key = item[0], item[1], item[2]
+        sig = sig_to_bytes(sig)
+        if not isinstance(public_key, (bytes, bytearray, memoryview)):
+            public_key = b"".join(public_key)
+        return params, (bytes(m), bytes(sig), bytes(public_key))
+    except Exception:
+        return params, None
+
+def spx_verify_batch(items, params=None, workers=None, chunk_size=16):
+    """
+    Verifies many (m, sig, public_key[, params]) items and returns their results in input order.
+    Items are grouped by parameter set and shipped to a process pool as flat bytes in chunks of chunk_size.
+    """
+    if params is None:
+        params = get_parameters()
+
+    groups = {}
+    count = 0
+    for pos, item in enumerate(items):
+        item_params, payload = _verify_payload(item, params)
+        if payload is not None:
+            groups.setdefault(item_params, []).append((pos, payload))
+        count += 1
+    if not groups:
+        return [False] * count
+
+    pool = get_pool(workers)
+    futures = []
+    for group_params, group in groups.items():
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            future = pool.submit(_verify_payloads, group_params, [payload for _, payload in chunk])
+            futures.append(([pos for pos, _ in chunk], future))
+
+    results = [False] * count
+    for positions, future in futures:
+        for pos, ok in zip(positions, future.result()):
+            results[pos] = ok
+    return results
+
+def spx_verify_iter(items, params=None, workers=None, chunk_size=16, max_pending=None):
+    """
+    Streaming spx_verify_batch: consumes items lazily and yields results in input order.
+    At most max_pending chunks (default: two per worker) are in flight at a time.
+    """
+    if params is None:
+        params = get_parameters()
+    pool = None
+    if max_pending is None:
+        max_pending = 2 * cpu_workers(workers)
+
+    items = iter(items)
+    pending = deque()
+    while True:
+        while len(pending) < max_pending:
+            chunk = list(itertools.islice(items, chunk_size))
+            if not chunk:
+                break
+            groups = {}
+            for pos, item in enumerate(chunk):
+                item_params, payload = _verify_payload(item, params)
+                if payload is not None:
+                    groups.setdefault(item_params, []).append((pos, payload))
+            if groups and pool is None:
+                pool = get_pool(workers)
+            futures = [([pos for pos, _ in group], pool.submit(_verify_payloads, group_params, [payload for _, payload in group]))
+                       for group_params, group in groups.items()]
+            pending.append((len(chunk), futures))
+        if not pending:
+            return
+
+        size, futures = pending.popleft()
+        results = [False] * size
+        for positions, future in futures:
+            for pos, ok in zip(positions, future.result()):
+                results[pos] = ok
+        yield from results
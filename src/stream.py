@@ -0,0 +1,170 @@
+"""
+Streaming JSONL sign/verify: records in, results out, work spread over a process pool
+"""
+
+import json
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from src.parallel import cpu_workers
+from src import worker
+from src.daemon import DaemonError, OP_SIGN, OP_VERIFY, encode_field, decode_field
+
+# Input: one JSON object per line.
+#   {"id": 1, "op": "sign", "key": "release", "message": "<base64>"}
+#   {"id": 2, "op": "verify", "key": "release", "digest": "<hex>", "signature": "<base64>"}
+# "op" defaults to verify when a signature is present, "key" may be omitted when only one key is loaded.
+# Output: one JSON object per input line, in the daemon's response format, with the record's id echoed.
+
+FLUSH_INTERVAL = 0.005
+
+_IDLE = object()
+
+def _chunk_job(jobs):
+    """
+    Runs a chunk of (op, key name, message, signature) jobs in a worker, with the keys set up by the pool initializer.
+    """
+    results = []
+    for op, name, message, signature in jobs:
+        try:
+            if op == OP_SIGN:
+                results.append((True, worker.sign_job(name, message)))
+            else:
+                results.append((True, worker.verify_job(name, message, signature)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+def _parse(record, keys):
+    if not isinstance(record, dict):
+        raise DaemonError("record must be a JSON object")
+    op = record.get("op") or (OP_VERIFY if "signature" in record else OP_SIGN)
+    if op not in (OP_SIGN, OP_VERIFY):
+        raise DaemonError(f"unknown op {op!r}")
+
+    name = record.get("key")
+    if name is None and len(keys) == 1:
+        name = next(iter(keys))
+    if name not in keys:
+        raise DaemonError(f"unknown key {name!r}")
+    if op == OP_SIGN and len(keys[name][1]) != 4:
+        raise DaemonError(f"key {name!r} is a public key")
+
+    if "digest" in record:
+        try:
+            message = bytes.fromhex(record["digest"])
+        except (TypeError, ValueError):
+            raise DaemonError("field digest is not valid hex") from None
+    else:
+        message = decode_field(record.get("message"), "message")
+    signature = decode_field(record.get("signature"), "signature") if op == OP_VERIFY else None
+    return op, name, message, signature
+
+class StreamStats:
+    def __init__(self):
+        self.records = 0
+        self.errors = 0
+
+def process_stream(lines, out, keys, workers=None, max_pending=None, chunk_size=16, ordered=False):
+    """
+    Reads JSONL records from the iterable lines and writes one JSONL result per record to out.
+    keys maps a key name to (params, key) and is sent to every worker once. Records go to the pool in chunks of up to
+    chunk_size; a partial chunk is sent as soon as input pauses. At most max_pending chunks are in flight,
+    and reading stops until one completes. With ordered, results are written in input order, otherwise as they complete.
+    """
+    workers = cpu_workers(workers)
+    if max_pending is None:
+        max_pending = 2 * workers
+    stats = StreamStats()
+
+    inbox = queue.Queue(maxsize=max_pending * chunk_size)
+
+    def read():
+        for line in lines:
+            if line.strip():
+                inbox.put(line)
+        inbox.put(None)
+
+    ready = {}
+    next_seq = 0
+
+    def emit(seq, response):
+        nonlocal next_seq
+        stats.records += 1
+        if not response["ok"]:
+            stats.errors += 1
+        if not ordered:
+            out.write(json.dumps(response) + "\n")
+            return
+        ready[seq] = response
+        while next_seq in ready:
+            out.write(json.dumps(ready.pop(next_seq)) + "\n")
+            next_seq += 1
+
+    def respond(record, ok, value):
+        job = record[1]
+        if not ok:
+            response = {"ok": False, "error": value}
+        elif job[0] == OP_SIGN:
+            params = keys[job[1]][0]
+            response = {"ok": True, "signature": encode_field(value), "instance": params.instance, "prf": params.prf}
+        else:
+            response = {"ok": True, "valid": value}
+        if "id" in record[0]:
+            response["id"] = record[0]["id"]
+        return response
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=worker.init_worker, initargs=(keys,)) as pool:
+        # Workers are forked before the reader thread starts: a child forked while that thread is blocked
+        # reading stdin inherits the held stdin lock and hangs when multiprocessing closes stdin in it.
+        pool.submit(_chunk_job, []).result()
+        threading.Thread(target=read, name="spx-stream-reader", daemon=True).start()
+
+        pending = {}
+        chunk = []
+        seq = 0
+        eof = False
+        while not eof or pending or chunk:
+            line = _IDLE
+            if not eof and len(pending) < max_pending:
+                try:
+                    line = inbox.get(timeout=FLUSH_INTERVAL if chunk or pending else None)
+                except queue.Empty:
+                    pass
+                if line is None:
+                    eof = True
+                elif line is not _IDLE:
+                    record = None
+                    try:
+                        record = json.loads(line)
+                        job = _parse(record, keys)
+                    except (ValueError, DaemonError) as e:
+                        response = {"ok": False, "error": f"bad record: {e}"}
+                        if isinstance(record, dict) and "id" in record:
+                            response["id"] = record["id"]
+                        emit(seq, response)
+                    else:
+                        chunk.append((seq, (record, job)))
+                    seq += 1
+
+            if chunk and (len(chunk) >= chunk_size or line is _IDLE or eof):
+                pending[pool.submit(_chunk_job, [record[1] for _, record in chunk])] = chunk
+                chunk = []
+
+            if pending and (eof or len(pending) >= max_pending):
+                done = wait(pending, return_when=FIRST_COMPLETED)[0]
+            else:
+                done = [future for future in pending if future.done()]
+            for future in done:
+                records = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(False, f"{type(e).__name__}: {e}")] * len(records)
+                for (record_seq, record), (ok, value) in zip(records, results):
+                    emit(record_seq, respond(record, ok, value))
+            if done or line is _IDLE:
+                out.flush()
+    out.flush()
+    return stats
@@ -1,3 +1,6 @@
+import statistics
+
+
 def print_bytes_int(value):
     array = []
     for val in value:
@@ -10,4 +13,33 @@ def print_bytes_bit(value):
     for val in value:
         for j in range(7, -1, -1):
             array.append((val >> j) % 2)
-    print(array)
\ No newline at end of file
+    print(array)
+
+
+def percentile(sorted_values, q):
+    """
+    q-th percentile (0..100) of already sorted values, linear interpolation between closest ranks.
+    """
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {
+        "samples": len(values),
+        "min": values[0],
+        "max": values[-1],
+        "mean": statistics.fmean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "median": statistics.median(values),
+        "p5": percentile(values, 5),
+        "p25": percentile(values, 25),
+        "p75": percentile(values, 75),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99)
+    }
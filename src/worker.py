@@ -0,0 +1,96 @@
+"""
+Per-process key state for the worker pools of the daemon, batch, stream and asyncio modes
+"""
+
+from collections import OrderedDict
+
+from src.signer import Signer
+from src.sphincs import spx_verify
+
+# Keys registered with add_key and Signers kept per worker, least recently used dropped first.
+# A Signer holds up to its TreeCache and SignatureMemo budgets, the keys themselves are a few bytes.
+MAX_KEYS = 64
+MAX_SIGNERS = 4
+
+_keys = OrderedDict()
+_signers = OrderedDict()
+_max_signers = MAX_SIGNERS
+
+class UnknownKey(KeyError):
+    """
+    Raised for a key name this worker does not hold (never registered, or evicted by add_key).
+    """
+
+def claim_warm_up(claim):
+    """
+    True for the first worker to claim the shared flag (a multiprocessing.Value), False for all others.
+    """
+    if claim is None:
+        return False
+    with claim.get_lock():
+        if claim.value:
+            return False
+        claim.value = 1
+        return True
+
+def init_worker(keys, warm_up_claim=None):
+    """
+    Process pool initializer. keys maps a key name to (params, key) and is sent to every worker once;
+    each worker keeps its own Signer per secret key, so tree caches and memoized upper-layer signatures
+    stay warm in the worker across jobs. Every secret key given here keeps its Signer.
+    Warm-up fills the memo of every secret key and costs as much as thousands of signatures, so only the
+    one worker that claims warm_up_claim does it; the others fill their caches as requests come in.
+    """
+    global _max_signers
+    _keys.clear()
+    _signers.clear()
+    for name, (params, key) in keys.items():
+        _keys[name] = (params, list(key))
+    _max_signers = max(MAX_SIGNERS, sum(1 for _, key in _keys.values() if len(key) == 4))
+    if claim_warm_up(warm_up_claim):
+        for name, (_, key) in _keys.items():
+            if len(key) == 4:
+                signer(name).start_warm_up()
+
+def add_key(name, params, key, warm_up=False):
+    """
+    Registers a key in a running worker. Beyond MAX_KEYS the least recently used key is dropped.
+    """
+    _keys[name] = (params, list(key))
+    _keys.move_to_end(name)
+    _signers.pop(name, None)
+    while len(_keys) > MAX_KEYS:
+        evicted, _ = _keys.popitem(last=False)
+        _signers.pop(evicted, None)
+    if warm_up and len(key) == 4:
+        signer(name).start_warm_up()
+
+def key_state(name):
+    """
+    (params, key) registered under name.
+    """
+    state = _keys.get(name)
+    if state is None:
+        raise UnknownKey(name)
+    _keys.move_to_end(name)
+    return state
+
+def signer(name):
+    state = _signers.get(name)
+    if state is None:
+        params, key = key_state(name)
+        state = Signer(key, params=params)
+        _signers[name] = state
+        while len(_signers) > _max_signers:
+            _signers.popitem(last=False)
+    else:
+        _signers.move_to_end(name)
+    return state
+
+def sign_job(name, message):
+    return signer(name).sign(message)
+
+def verify_job(name, message, signature):
+    params, key = key_state(name)
+    public_key = [key[2], key[3]] if len(key) == 4 else key
+    return bool(spx_verify(message, signature, public_key, params=params))
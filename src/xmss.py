@@ -1,13 +1,19 @@
+import logging
 from src.parameters import *
 from src.hashes import *
 from src.ADRS import *
 from src.WOTSplus import *
-import math
+from src import instrument
 
-def treehash(secret_seed, s, z, public_seed, adrs: ADRS, params=None):
+logger = logging.getLogger(__name__)
+
+def treehash(secret_seed, s, z, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
 
     if s % (1 << z) != 0:
         return -1
@@ -17,7 +23,7 @@ def treehash(secret_seed, s, z, public_seed, adrs: ADRS, params=None):
     for i in range(0, 2**z):
         adrs.set_type(ADRS.WOTS_HASH)
         adrs.set_key_pair_address(s + i)
-        node = wots_pk_gen(secret_seed, public_seed, adrs.copy(), params=params)
+        node = wots_pk_gen(secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx)
 
         adrs.set_type(ADRS.TREE)
         adrs.set_tree_height(1)
@@ -26,75 +32,106 @@ def treehash(secret_seed, s, z, public_seed, adrs: ADRS, params=None):
         if len(stack) > 0:
             while stack[len(stack) - 1]['height'] == adrs.get_tree_height():
                 adrs.set_tree_index((adrs.get_tree_index() - 1) // 2)
-                node = hash(public_seed, adrs.copy(), stack.pop()['node'] + node, n)
+                node = ctx.hash(adrs, stack.pop()['node'] + node)
                 adrs.set_tree_height(adrs.get_tree_height() + 1)
 
                 if len(stack) <= 0:
                     break
 
         stack.append({'node': node, 'height': adrs.get_tree_height()})
+        instrument.progress("xmss", i + 1, 2**z)
 
     return stack.pop()['node']
 
-def xmss_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None):
+def xmss_pk_gen(secret_seed, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None):
     if params is None:
         params = get_parameters()
-    h = params["h"]
-    d = params["d"]
-    h_prime = h // d
-
-    pk = treehash(secret_seed, 0, h_prime, public_seed, adrs.copy(), params=params)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    pk = treehash(secret_seed, 0, params.h_prime, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx)
     return pk
 
-def xmss_sign(m, secret_seed, idx, public_seed, adrs, params=None):
+def xmss_tree(secret_seed, public_seed, adrs: ADRS, params=None, ctx=None, prf_ctx=None):
+    """
+    Builds the whole XMSS tree addressed by adrs in one pass.
+    Returns the node levels: levels[0] holds the WOTS+ public keys, levels[h_prime] == [root].
+    """
     if params is None:
         params = get_parameters()
-    h = params["h"]
-    d = params["d"]
-    h_prime = h // d
-    n = params["n"]
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-
-    auth = []
-    for j in range(0, h_prime):
-        ki = math.floor(idx // 2**j)
-        if ki % 2 == 1:
-            ki -= 1
-        else:
-            ki += 1
-        auth += [treehash(secret_seed, ki * 2**j, j, public_seed, adrs.copy(), params=params)]
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+    h_prime = params.h_prime
+
+    with instrument.phase("xmss_tree"):
+        nodes = []
+        leaves = 1 << h_prime
+        for i in range(0, leaves):
+            adrs.set_type(ADRS.WOTS_HASH)
+            adrs.set_key_pair_address(i)
+            nodes.append(wots_pk_gen(secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx))
+            instrument.progress("xmss", i + 1, leaves)
+        levels = [nodes]
+
+        adrs.set_type(ADRS.TREE)
+        for height in range(1, h_prime + 1):
+            adrs.set_tree_height(height)
+            children = levels[-1]
+            nodes = []
+            for i in range(0, len(children) // 2):
+                adrs.set_tree_index(i)
+                nodes.append(ctx.hash(adrs, children[2 * i] + children[2 * i + 1]))
+            levels.append(nodes)
+
+    return levels
+
+def xmss_auth_path(levels, idx):
+    return [levels[j][(idx >> j) ^ 1] for j in range(0, len(levels) - 1)]
+
+def xmss_sign_root(m, secret_seed, idx, public_seed, adrs, params=None, ctx=None, prf_ctx=None, levels=None):
+    """
+    XMSS signature of m with leaf idx, together with the root of the tree that signed it.
+    levels may hold the already built tree (see xmss_tree).
+    """
+    if params is None:
+        params = get_parameters()
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    if prf_ctx is None:
+        prf_ctx = prf_context(secret_seed, params)
+
+    if levels is None:
+        levels = xmss_tree(secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx)
+    auth = xmss_auth_path(levels, idx)
 
     adrs.set_type(ADRS.WOTS_HASH)
     adrs.set_key_pair_address(idx)
 
-    sig = wots_sign(m, secret_seed, public_seed, adrs.copy(), params=params)
+    sig = wots_sign(m, secret_seed, public_seed, adrs.copy(), params=params, ctx=ctx, prf_ctx=prf_ctx)
     sig_xmss = sig + auth
-    
-    expected_length = (len_0 + h_prime) * n 
-    total_length = sum(len(x) for x in sig_xmss) 
+
+    expected_length = params.xmss_bytes
+    total_length = sum(len(x) for x in sig_xmss)
     if total_length != expected_length:
-        print(f"xmss_sign: sig_xmss length = {total_length}, expected = {expected_length}")
+        logger.warning("xmss_sign: sig_xmss length = %s, expected = %s", total_length, expected_length)
+    return sig_xmss, levels[-1][0]
+
+def xmss_sign(m, secret_seed, idx, public_seed, adrs, params=None, ctx=None, prf_ctx=None):
+    sig_xmss, _ = xmss_sign_root(m, secret_seed, idx, public_seed, adrs, params=params, ctx=ctx, prf_ctx=prf_ctx)
     return sig_xmss
 
-def xmss_pk_from_sig(idx, sig_xmss, m, public_seed, adrs, params=None):
+def xmss_pk_from_sig(idx, sig_xmss, m, public_seed, adrs, params=None, ctx=None):
     if params is None:
         params = get_parameters()
-    n = params["n"]
-    h = params["h"]
-    d = params["d"]
-    h_prime = h // d
-    w = params["w"]
-    len_1 = math.ceil(8 * n / math.log(w, 2))
-    len_2 = math.floor(math.log(len_1 * (w - 1), 2) / math.log(w, 2)) + 1
-    len_0 = len_1 + len_2
-
-    expected_length = (len_0 + h_prime) * n
+    if ctx is None:
+        ctx = HashContext(public_seed, params.n)
+    h_prime = params.h_prime
+
+    expected_length = params.xmss_bytes
     total_length = sum(len(x) for x in sig_xmss)
     if total_length != expected_length:
-        print(f"xmss_pk_from_sig: sig_xmss length = {total_length}, expected = {expected_length}")
+        logger.debug("xmss_pk_from_sig: sig_xmss length = %s, expected = %s", total_length, expected_length)
         return None
 
     adrs.set_type(ADRS.WOTS_HASH)
@@ -103,10 +140,10 @@ def xmss_pk_from_sig(idx, sig_xmss, m, public_seed, adrs, params=None):
     auth = auth_from_sig_xmss(sig_xmss, params=params)
 
     if len(auth) != h_prime:
-        print(f"xmss_pk_from_sig: auth length = {len(auth)}, expected = {h_prime}")
+        logger.debug("xmss_pk_from_sig: auth length = %s, expected = %s", len(auth), h_prime)
         return None
 
-    node_0 = wots_pk_from_sig(sig, m, public_seed, adrs.copy(), params=params)
+    node_0 = wots_pk_from_sig(sig, m, public_seed, adrs.copy(), params=params, ctx=ctx)
     node_1 = 0
 
     adrs.set_type(ADRS.TREE)
@@ -114,13 +151,40 @@ def xmss_pk_from_sig(idx, sig_xmss, m, public_seed, adrs, params=None):
     for i in range(0, h_prime):
         adrs.set_tree_height(i + 1)
 
-        if math.floor(idx / 2**i) % 2 == 0:
+        if (idx >> i) % 2 == 0:
             adrs.set_tree_index(adrs.get_tree_index() // 2)
-            node_1 = hash(public_seed, adrs.copy(), node_0 + auth[i], n)
+            node_1 = ctx.hash(adrs, node_0 + auth[i])
         else:
             adrs.set_tree_index((adrs.get_tree_index() - 1) // 2)
-            node_1 = hash(public_seed, adrs.copy(), auth[i] + node_0, n)
+            node_1 = ctx.hash(adrs, auth[i] + node_0)
 
         node_0 = node_1
 
-    return node_0
\ No newline at end of file
+    return node_0
+
+def xmss_pk_from_sig_view(idx, sig, offset, m, adrs: ADRS, params, ctx):
+    """
+    xmss_pk_from_sig over an XMSS signature stored in the buffer sig (a memoryview) at offset:
+    the WOTS+ signature followed by h_prime authentication nodes. Nothing is sliced out or concatenated.
+    """
+    n = params.n
+    h_prime = params.h_prime
+
+    adrs.set_type(ADRS.WOTS_HASH)
+    adrs.set_key_pair_address(idx)
+    node = wots_pk_from_sig_view(sig, offset, m, adrs.copy(), params, ctx)
+
+    adrs.set_type(ADRS.TREE)
+    auth = offset + params.wots_bytes
+    tree_index = idx
+    for i in range(0, h_prime):
+        adrs.set_tree_height(i + 1)
+        tree_index >>= 1
+        adrs.set_tree_index(tree_index)
+        start = auth + i * n
+        if (idx >> i) & 1 == 0:
+            node = ctx.hash_pair(adrs, node, sig[start:start + n])
+        else:
+            node = ctx.hash_pair(adrs, sig[start:start + n], node)
+
+    return node
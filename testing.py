@@ -1,147 +1,103 @@
-import time
-import os
-import math
-from tabulate import tabulate
-from openpyxl import Workbook
-from src.sphincs import spx_keygen, spx_sign, spx_verify
-from src.parameters import get_parameters
-
-SIZE_FILE = 1024 * 1024 * 1
-
-def generate_test_file(size=SIZE_FILE):
-    file_path = "test_file.bin"
-    with open(file_path, "wb") as f:
-        f.write(os.urandom(size))
-    with open(file_path, "rb") as f:
-        data = f.read()
-    os.remove(file_path)
-    return data
-
-def measure_times(instance):
-    """Измеряет время операций SPHINCS+ для файла 1 МБ и возвращает результаты с параметрами."""
-    params = get_parameters(instance)
-    message = generate_test_file()
-    
-    start_time = time.perf_counter()
-    sk, pk = spx_keygen(params=params)
-    keygen_time = time.perf_counter() - start_time
-
-    start_time = time.perf_counter()
-    signature = spx_sign(message, sk, params=params)
-    sign_time = time.perf_counter() - start_time
-
-    start_time = time.perf_counter()
-    result = spx_verify(message, signature, pk, params=params)
-    verify_time = time.perf_counter() - start_time
-
-    if not result:
-        raise ValueError(f"Проверка подписи не удалась для {instance}!")
-
-    n = params.get("n", "N/A")
-    t = 2**params.get("a")
-
-    log_t = "N/A"
-    if t is not None and t > 0:
-        log_t = int(math.log2(t))
-
-    sec_level = params.get("sec_level", None)
-    bitsec = params.get("bitsec", None)
-    
-    if sec_level is None and n != "N/A":
-        if n == 16:
-            sec_level = 1
-        elif n == 24:
-            sec_level = 3
-        elif n == 32:
-            sec_level = 5
-        else:
-            sec_level = "N/A"
-    
-    if bitsec is None and n != "N/A":
-        bitsec = n * 8
-
-    return {
-        "instance": instance,
-        "n": n,
-        "h": params.get("h", "N/A"),
-        "d": params.get("d", "N/A"),
-        "log_t": log_t,
-        "k": params.get("k", "N/A"),
-        "w": params.get("w", "N/A"),
-        "bitsec": bitsec,
-        "sec_level": sec_level,
-        "sig_bytes": params.get("sig_bytes", "N/A"),
-        "keygen_time": keygen_time,
-        "sign_time": sign_time,
-        "verify_time": verify_time,
-        "sig_length": sum(len(x) if isinstance(x, bytes) else sum(len(y) for y in x) for x in signature)
-    }
-
-def run_tests():
-    """Запускает тесты для всех параметров и выводит таблицу в терминал и Excel."""
-    instances = ["128s", "128f", "192s", "192f", "256s", "256f"]
-    results = []
-
-    print("Запуск тестов SPHINCS+ с файлом 1 МБ...\n")
-    for instance in instances:
-        print(f"Тестирование {instance}...")
-        result = measure_times(instance)
-        results.append(result)
-
-    headers = [
-        "Набор параметров", "n", "h", "d", "log(t)", "k", "w", "bitsec", "sec level",
-        "Генерация ключей (с)", "Подпись (с)", "Проверка (с)", "Длина подписи (байт)"
-    ]
-    table_data = [
-        [
-            r["instance"],
-            r["n"],
-            r["h"],
-            r["d"],
-            r["log_t"],
-            r["k"],
-            r["w"],
-            r["bitsec"],
-            r["sec_level"],
-            f"{r['keygen_time']:.3f}",
-            f"{r['sign_time']:.3f}",
-            f"{r['verify_time']:.3f}",
-            r["sig_length"]
-        ]
-        for r in results
-    ]
-
-    print("\nРезультаты тестов:")
-    print(tabulate(table_data, headers=headers, tablefmt="pretty", numalign="center", floatfmt=".3f"))
-
+import argparse
+import json
+import sys
+from src.bench import run_suite, compare, BENCHMARKS, MICRO_BENCHMARKS, FULL_BENCHMARKS
+from src.parameters import INSTANCES, PRF_BLAKE2B, PRF_LEGACY
+
+def format_time(seconds):
+    """Время в удобных единицах."""
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} мкс"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} мс"
+    return f"{seconds:.3f} с"
+
+def print_results(doc):
+    machine = doc["machine"]
+    print(f"\nМашина: {machine['platform']}, {machine['cpu_count']} CPU, Python {machine['python']} "
+          f"({machine['implementation']}), ревизия {machine['git_revision']}")
+    print(f"{'Набор':<6} {'Бенчмарк':<14} {'медиана':>12} {'p5':>12} {'p95':>12} {'stdev':>12} {'выборок':>8} {'вызовов':>8}")
+    for instance, benches in doc["results"].items():
+        for name, r in benches.items():
+            print(f"{instance:<6} {name:<14} {format_time(r['median']):>12} {format_time(r['p5']):>12} "
+                  f"{format_time(r['p95']):>12} {format_time(r['stdev']):>12} {r['samples']:>8} {r['number']:>8}")
+
+def print_comparison(rows, threshold):
+    print(f"\nСравнение с базовым прогоном (порог {threshold:.0%}):")
+    print(f"{'Набор':<6} {'Бенчмарк':<14} {'база':>12} {'сейчас':>12} {'отношение':>10}  статус")
+    for row in rows:
+        ratio = f"{row['ratio']:.3f}" if row["ratio"] is not None else "-"
+        print(f"{row['instance']:<6} {row['benchmark']:<14} {format_time(row['baseline']):>12} "
+              f"{format_time(row['current']):>12} {ratio:>10}  {row['status']}")
+
+def write_xlsx(doc, path):
+    """Сохранение медиан в Excel (требуется openpyxl)."""
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
-    ws.title = "SPHINCS+ Test Results"
-
-    ws.append(headers)
-    for r in results:
-        ws.append([
-            r["instance"],
-            r["n"],
-            r["h"],
-            r["d"],
-            r["log_t"],
-            r["k"],
-            r["w"],
-            r["bitsec"],
-            r["sec_level"],
-            round(r["keygen_time"], 3),
-            round(r["sign_time"], 3),
-            round(r["verify_time"], 3),
-            r["sig_length"]
-        ])
-
-    excel_file = "sphincs_test_results.xlsx"
-    wb.save(excel_file)
-    print(f"\nРезультаты сохранены в файл: {excel_file}")
+    ws.title = "SPHINCS+ Benchmarks"
+    ws.append(["Набор параметров", "Бенчмарк", "Медиана (с)", "p5 (с)", "p95 (с)", "stdev (с)", "Выборок", "Вызовов в выборке"])
+    for instance, benches in doc["results"].items():
+        for name, r in benches.items():
+            ws.append([instance, name, r["median"], r["p5"], r["p95"], r["stdev"], r["samples"], r["number"]])
+    wb.save(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки SPHINCS+: компоненты (hash, prf, chain, treehash, ...) и полные операции")
+    parser.add_argument("--instances", nargs="+", default=["128f"], choices=list(INSTANCES) + ["all"],
+                        help="Наборы параметров (по умолчанию: 128f; all — все)")
+    parser.add_argument("--bench", nargs="+", choices=list(BENCHMARKS) + ["micro", "full"],
+                        help="Бенчмарки: имена, micro (компоненты) или full (keygen/sign/verify). По умолчанию: все")
+    parser.add_argument("--prf", type=str, default=PRF_BLAKE2B, choices=[PRF_BLAKE2B, PRF_LEGACY], help="PRF (по умолчанию: blake2b)")
+    parser.add_argument("--repeat", type=int, default=7, help="Число замеров на бенчмарк (по умолчанию: 7)")
+    parser.add_argument("--warmup", type=int, default=1, help="Число прогревочных замеров (по умолчанию: 1)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Минимальная длительность одного замера в секундах, быстрые функции вызываются в цикле (по умолчанию: 0.05)")
+    parser.add_argument("--out", type=str, help="Сохранить результаты в JSON")
+    parser.add_argument("--xlsx", type=str, help="Сохранить медианы в Excel (нужен openpyxl)")
+    parser.add_argument("--compare", type=str, metavar="BASELINE", help="Сравнить с базовым JSON и отметить регрессии")
+    parser.add_argument("--results", type=str, help="Не запускать бенчмарки, а взять результаты из JSON (для --compare)")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Относительное замедление медианы, считающееся регрессией (по умолчанию: 0.10)")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            doc = json.load(f)
+    else:
+        instances = list(INSTANCES) if "all" in args.instances else args.instances
+        names = []
+        for name in args.bench or list(BENCHMARKS):
+            group = {"micro": MICRO_BENCHMARKS, "full": FULL_BENCHMARKS}.get(name, [name])
+            names += [x for x in group if x not in names]
+
+        def progress(instance, name, result):
+            print(f"{instance} {name}: {format_time(result['median'])} (медиана из {result['samples']})", flush=True)
+
+        doc = run_suite(instances, names, prf=args.prf, repeat=args.repeat, warmup=args.warmup,
+                        min_time=args.min_time, progress=progress)
+
+    print_results(doc)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\nРезультаты сохранены в файл: {args.out}")
+    if args.xlsx:
+        write_xlsx(doc, args.xlsx)
+        print(f"Результаты сохранены в файл: {args.xlsx}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, doc, threshold=args.threshold)
+        print_comparison(rows, args.threshold)
+        regressions = [row for row in rows if row["status"] == "regression"]
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            sys.exit(1)
 
 if __name__ == "__main__":
-    try:
-        run_tests()
-    except Exception as e:
-        print(f"Ошибка при выполнении тестов: {str(e)}")
\ No newline at end of file
+    main()
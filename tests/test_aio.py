@@ -0,0 +1,29 @@
+import asyncio
+
+from src.parameters import get_parameters
+from src.sphincs import spx_keygen, spx_verify
+from src.aio import AsyncSPX
+
+def test_async_sign_verify_across_event_loops():
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    executor = AsyncSPX(workers=1, max_concurrency=1)
+
+    async def round_trip(message):
+        # Two calls at once contend for the single slot, which binds the semaphore to this loop.
+        signature, _ = await asyncio.gather(executor.sign(message, sk, params=params),
+                                            executor.sign(message, sk, params=params))
+        results = await executor.verify_many([(message, signature, pk), (b"other", signature, pk),
+                                              (message, b"short", pk)], params=params)
+        return signature, results
+
+    async def close():
+        await executor.close()
+
+    try:
+        for message in (b"first", b"second"):
+            signature, results = asyncio.run(round_trip(message))
+            assert spx_verify(message, signature, pk, params=params)
+            assert results == [True, False, False]
+    finally:
+        asyncio.run(close())
@@ -0,0 +1,49 @@
+import os
+
+from src.parameters import get_parameters
+from src.sphincs import spx_keygen
+from src.batch import run_batch, sign_files, list_files, read_manifest, hash_file, file_digest, signature_path, \
+    BatchTotals, OP_SIGN, OP_VERIFY
+
+def test_run_batch_signs_and_verifies_files(tmp_path):
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    for name, data in (("a.txt", b"first"), ("b.txt", b"second"), ("c.txt", b"")):
+        (tmp_path / name).write_bytes(data)
+    files = list_files([str(tmp_path)])
+    assert [os.path.basename(path) for path in files] == ["a.txt", "b.txt", "c.txt"]
+
+    signed = sorted(run_batch(OP_SIGN, files, sk, params=params, workers=1), key=lambda r: r["path"])
+    assert [r["signature"] for r in signed] == [signature_path(path) for path in files]
+    assert list_files([str(tmp_path)]) == files
+
+    (tmp_path / "b.txt").write_bytes(b"changed")
+    os.remove(signature_path(files[2]))
+    totals = BatchTotals(len(files))
+    results = {}
+    for result in run_batch(OP_VERIFY, files, pk, params=params, workers=1):
+        totals.add(result)
+        results[os.path.basename(result["path"])] = result
+    assert results["a.txt"]["valid"] and results["b.txt"]["valid"] is False
+    assert "error" in results["c.txt"]
+    assert totals.done == 3 and totals.failed == 2
+
+def test_sign_files_from_manifest(tmp_path):
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    data = tmp_path / "data"
+    data.mkdir()
+    for i in range(5):
+        (data / f"{i}.bin").write_bytes(bytes([i]) * (1000 * i))
+    manifest = tmp_path / "files.txt"
+    manifest.write_text("# release\n" + "".join(f"data/{i}.bin\n" for i in range(5)) + "\ndata/missing.bin\n")
+    files = read_manifest(str(manifest))
+    assert files == [str(data / f"{i}.bin") for i in range(5)] + [str(data / "missing.bin")]
+    assert hash_file(files[3]) == (file_digest(files[3]), 3000)
+
+    results = {r["path"]: r for r in sign_files(files, sk, params=params, workers=1, hash_threads=2, chunk_size=2)}
+    assert set(results) == set(files)
+    assert "error" in results[files[-1]]
+    assert all(results[path]["signature"] == signature_path(path) for path in files[:-1])
+    verified = list(run_batch(OP_VERIFY, files[:-1], pk, params=params, workers=1))
+    assert len(verified) == 5 and all(r["valid"] for r in verified)
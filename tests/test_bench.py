@@ -0,0 +1,36 @@
+import pytest
+
+from src.utils import percentile, summarize
+from src.bench import run_benchmark, run_suite, compare, BENCHMARKS
+
+def test_percentile_interpolates_between_ranks():
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 0) == 1.0 and percentile(values, 100) == 5.0
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 10) == pytest.approx(1.4)
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 50) is None
+
+def test_summarize_and_run_benchmark():
+    summary = summarize([3.0, 1.0, 2.0])
+    assert summary["samples"] == 3 and summary["min"] == 1.0 and summary["max"] == 3.0
+    assert summary["median"] == summary["mean"] == 2.0 and summary["stdev"] == 1.0
+    assert summarize([2.0])["stdev"] == 0.0
+
+    calls = []
+    result = run_benchmark(lambda: calls.append(None), repeat=3, warmup=2, number=5)
+    assert result["number"] == 5 and result["samples"] == 3
+    assert len(calls) == (3 + 2) * 5
+
+def test_run_suite_and_compare():
+    doc = run_suite(["128f"], names=["hash", "prf"], repeat=2, warmup=0, min_time=0.001)
+    assert set(doc["results"]["128f"]) == {"hash", "prf"}
+    assert doc["config"]["benchmarks"] == ["hash", "prf"] and doc["machine"]["cpu_count"]
+
+    def document(**medians):
+        return {"results": {"128f": {name: {"median": median} for name, median in medians.items()}}}
+    rows = compare(document(hash=1.0, prf=1.0, chain=1.0), document(hash=1.5, prf=0.5, chain=1.05, sign=2.0))
+    status = {row["benchmark"]: row["status"] for row in rows}
+    assert status == {"hash": "regression", "prf": "improvement", "chain": "ok", "sign": "new"}
+    assert rows[0]["benchmark"] == "hash"
+    assert set(BENCHMARKS) >= {"hash", "chain", "ht_sign", "sign", "verify"}
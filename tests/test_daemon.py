@@ -0,0 +1,43 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from src.parameters import get_parameters
+from src.sphincs import spx_keygen, spx_verify
+from src.daemon import SigningDaemon, DaemonClient, DaemonError
+
+def wait_for(path, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, f"{path} never appeared"
+        time.sleep(0.01)
+
+def test_daemon_round_trip(tmp_path):
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    socket_path = str(tmp_path / "spx.sock")
+    daemon = SigningDaemon(socket_path, {"release": (params, sk)}, workers=1, warm_up=False)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        wait_for(socket_path)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        assert [name for name in os.listdir(tmp_path)] == ["spx.sock"]
+        with DaemonClient(socket_path, timeout=60) as client:
+            signature, signed_params = client.sign(b"hello", "release")
+            assert signed_params == params
+            assert spx_verify(b"hello", signature, pk, params=params)
+            assert client.verify(b"hello", signature, "release")
+            assert not client.verify(b"other", signature, "release")
+            with pytest.raises(DaemonError, match="unknown key"):
+                client.sign(b"hello", "missing")
+            assert client.health()["keys"]["release"]["secret"]
+            stats = client.stats()
+            assert stats["requests"] == {"sign": 2, "verify": 2} and stats["errors"] == {"sign": 1}
+    finally:
+        daemon.shutdown()
+        thread.join()
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,77 @@
+import pickle
+
+import pytest
+
+from src.parameters import get_parameters, PRF_LEGACY
+from src.sphincs import spx_keygen, spx_sign, spx_verify, sig_to_bytes
+from src.formats import dump_signature, load_signature, load_key, encode_key, decode_key, FormatError, \
+    KEY_HEADER_BYTES, FORMAT_PICKLE, FORMAT_BINARY, write_signature, mapped_signature
+
+def test_pickle_signature_keeps_nested_layout():
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    sig = spx_sign(b"hello", sk, params=params)
+
+    data = dump_signature(sig, params, fmt=FORMAT_PICKLE)
+    sig_data = pickle.loads(data)
+    assert sig_data["instance"] == "128f"
+    r, sig_fors, sig_ht = sig_data["signature"]
+    assert len(r) == params.n
+    assert len(sig_fors) == params.k * (params.a + 1)
+    assert len(sig_ht) == params.d * (params.len_0 + params.h_prime)
+    assert sig_to_bytes(sig_data["signature"]) == sig
+
+    instance, loaded = load_signature(data)
+    assert instance == "128f"
+    assert spx_verify(b"hello", loaded, pk, params=params)
+
+def test_legacy_pickle_key_gets_legacy_prf():
+    key = [bytes(16), bytes(16)]
+    params, loaded, extra = load_key(pickle.dumps(key), "128f")
+    assert params == get_parameters("128f", prf=PRF_LEGACY)
+    assert loaded == key and extra == b""
+
+    params, loaded, _ = load_key(encode_key(key, get_parameters("128f")), "256s")
+    assert params == get_parameters("128f")
+
+def test_binary_key_rejects_corruption_and_wrong_magic():
+    params = get_parameters("128f")
+    key = [bytes(range(i, i + params.n)) for i in range(4)]
+    data = encode_key(key, params, extra=b"note")
+    assert load_key(data) == (params, key, b"note")
+
+    for offset in (KEY_HEADER_BYTES, len(data) - 1):
+        corrupted = bytearray(data)
+        corrupted[offset] ^= 1
+        with pytest.raises(FormatError, match="checksum"):
+            load_key(bytes(corrupted))
+    with pytest.raises(FormatError, match="length"):
+        load_key(data[:-1])
+    with pytest.raises(FormatError, match="not a binary"):
+        decode_key(b"SPXS" + data[4:])
+    with pytest.raises(FormatError):
+        load_key(b"SPXS" + data[4:])
+
+def test_verify_mapped_signature_and_truncated_buffers(tmp_path):
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    sig = spx_sign(b"hello", sk, params=params)
+
+    for fmt in (FORMAT_BINARY, FORMAT_PICKLE):
+        path = tmp_path / f"{fmt}.sig"
+        write_signature(path, sig, params, fmt=fmt)
+        with mapped_signature(path) as (instance, mapped):
+            assert instance == "128f"
+            assert spx_verify(b"hello", mapped, pk, params=params)
+            assert not spx_verify(b"world", mapped, pk, params=params)
+
+    view = memoryview(sig)
+    for truncated in (sig[:-1], view[:-params.n], view[:0], bytearray(sig[:params.n])):
+        assert not spx_verify(b"hello", truncated, pk, params=params)
+    assert not spx_verify(b"hello", sig + b"\0", pk, params=params)
+
+    path = tmp_path / "truncated.sig"
+    path.write_bytes(dump_signature(sig, params, fmt=FORMAT_BINARY)[:-1])
+    with pytest.raises(FormatError, match="length"):
+        with mapped_signature(path):
+            pass
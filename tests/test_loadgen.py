@@ -0,0 +1,23 @@
+from src.parameters import get_parameters
+from src.parallel import shutdown_pools
+from src.loadgen import run_load, run_sweep, MODE_THREAD, OP_SIGN, OP_VERIFY
+
+def test_run_load_counts_requests():
+    params = get_parameters("128f")
+    result = run_load(OP_VERIFY, params, 2, duration=30.0, requests=4, mode=MODE_THREAD)
+    assert result["operations"] == 4 and result["errors"] == 0
+    assert result["clients"] == 2 and result["sign_workers"] is None
+    assert result["latency"]["samples"] == 4 and result["throughput"] > 0
+    assert result["tracemalloc_peak_bytes"] > 0
+
+def test_run_sweep_over_worker_counts():
+    rows = []
+    try:
+        doc = run_sweep(["128f"], [OP_SIGN, OP_VERIFY], [1], worker_counts=[1, 2], progress=rows.append,
+                        duration=30.0, requests=1, mode=MODE_THREAD)
+    finally:
+        shutdown_pools()
+    assert doc["runs"] == rows
+    assert [(r["operation"], r["sign_workers"]) for r in rows] == [(OP_SIGN, 1), (OP_SIGN, 2), (OP_VERIFY, None)]
+    assert all(r["operations"] == 1 and r["errors"] == 0 for r in rows)
+    assert doc["config"]["sign_workers"] == [1, 2] and doc["config"]["clients"] == [1]
@@ -0,0 +1,35 @@
+import pstats
+
+import pytest
+
+from src.parameters import get_parameters
+from src.sphincs import spx_keygen, spx_sign
+from src.profiling import profiled, phase_label
+from src import instrument
+
+def test_profiled_sign_breakdown(tmp_path):
+    params = get_parameters("128f")
+    sk, _ = spx_keygen(params=params)
+    with profiled(sample_stacks=True, interval=0.0005) as prof:
+        spx_sign(b"hello", sk, params=params)
+    assert instrument.current() is None and prof.wall > 0
+
+    rows = {label: (seconds, calls, share) for label, seconds, calls, share in prof.structure()}
+    assert {"FORS trees", "hypertree (all layers)", "hypertree layer 0", "PRF", "WOTS+ chains (hash iterations)"} <= set(rows)
+    assert rows["hypertree (all layers)"][1] == 1 and rows["PRF"][1] > 0
+    assert all(0 <= share <= 1.5 for _, _, share in rows.values())
+    assert len(prof.functions(limit=5)) == 5
+
+    prof.dump_stats(tmp_path / "sign.pstats")
+    assert pstats.Stats(str(tmp_path / "sign.pstats")).total_calls > 0
+    prof.write_collapsed(tmp_path / "sign.folded")
+    for line in (tmp_path / "sign.folded").read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+def test_collapsed_needs_sampling(tmp_path):
+    with profiled() as prof:
+        pass
+    with pytest.raises(ValueError):
+        prof.write_collapsed(tmp_path / "none.folded")
+    assert phase_label("ht_layer_3") == "hypertree layer 3" and phase_label("other") == "other"
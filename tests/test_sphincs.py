@@ -0,0 +1,289 @@
+import hashlib
+import threading
+
+import pytest
+
+import src.sphincs as sphincs
+from src.parameters import get_parameters, PRF_LEGACY
+from src.hypertree import ht_pk_gen, ht_sign
+from src.parallel import shutdown_pools
+from src.cache import TreeCache, SignatureMemo
+from src.signer import Signer
+from src import instrument
+from src.ADRS import ADRS
+from src.FORS import fors_tree, fors_treehash, fors_sk_gen
+from src.WOTSplus import chain
+from src.xmss import treehash, xmss_tree, xmss_auth_path, xmss_sign_root, xmss_pk_from_sig
+
+# Deterministic legacy-PRF 128f signature of b"hello", fixed before the blake2b PRF became the default.
+LEGACY_128F_ROOT = "011bb2cebe339a839c285afb456441f5"
+LEGACY_128F_SIG_SHA256 = "2364642a411b50b91797617afb30ee18b19aabdb515bd9be4882151fc7e95f0a"
+
+def flat(sig):
+    if isinstance(sig, bytes):
+        return sig
+    return b"".join(flat(part) for part in sig)
+
+def fixed_key(params):
+    n = params["n"]
+    secret_seed = bytes(range(1, n + 1))
+    secret_prf = bytes(range(50, 50 + n))
+    public_seed = bytes(range(100, 100 + n))
+    root = ht_pk_gen(secret_seed, public_seed, params=params)
+    return [secret_seed, secret_prf, public_seed, root]
+
+@pytest.fixture
+def deterministic(monkeypatch):
+    monkeypatch.setattr(sphincs, "RANDOMIZE", False)
+
+def test_legacy_prf_known_answer(deterministic):
+    params = get_parameters("128f", prf=PRF_LEGACY)
+    secret_key = fixed_key(params)
+    assert secret_key[3].hex() == LEGACY_128F_ROOT
+
+    sig = sphincs.spx_sign(b"hello", secret_key, params=params)
+    assert len(flat(sig)) == 17088
+    assert hashlib.sha256(flat(sig)).hexdigest() == LEGACY_128F_SIG_SHA256
+    assert sphincs.spx_verify(b"hello", sig, secret_key[2:], params=params)
+
+def test_sign_rejects_key_of_other_prf(deterministic):
+    secret_key = fixed_key(get_parameters("128f", prf=PRF_LEGACY))
+    with pytest.raises(ValueError):
+        sphincs.spx_sign(b"hello", secret_key, params=get_parameters("128f"))
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_sign_same_with_workers(deterministic, cached):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+
+    def sign(m, workers):
+        if not cached:
+            return sphincs.spx_sign(m, secret_key, params=params, workers=workers)
+        return sphincs.spx_sign(m, secret_key, params=params, workers=workers, cache=caches[workers][0], memo=caches[workers][1])
+
+    caches = {workers: (TreeCache(), SignatureMemo(params)) for workers in (1, 2)}
+    try:
+        for m in (b"hello", b"hello", b"world"):
+            assert sign(m, 2) == sign(m, 1)
+    finally:
+        shutdown_pools()
+
+def test_parallel_hypertree_matches_serial():
+    params = get_parameters("128f")
+    secret_seed, _, public_seed, root = fixed_key(params)
+    m = bytes(range(params.n))
+    try:
+        for idx_tree, idx_leaf in ((0, 0), ((1 << (params.h - params.h_prime)) - 1, 5)):
+            serial = ht_sign(m, secret_seed, public_seed, idx_tree, idx_leaf, params=params, public_root=root)
+            parallel = ht_sign(m, secret_seed, public_seed, idx_tree, idx_leaf, params=params, workers=2, public_root=root)
+            assert parallel == serial
+        with pytest.raises(ValueError):
+            ht_sign(m, secret_seed, public_seed, 0, 0, params=params, workers=2, public_root=bytes(params.n))
+    finally:
+        shutdown_pools()
+
+def test_verify_batch_malformed_items_are_false(deterministic):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+    public_key = secret_key[2:]
+    sig = sphincs.spx_sign(b"hello", secret_key, params=params)
+    items = [
+        (b"hello", sig, public_key),
+        (b"hello", None, public_key),
+        (b"hello", sig, None),
+        ("hello", sig, public_key),
+        (b"hello", sig),
+        (b"hello", sig, public_key, {}),
+        (b"world", sig, public_key),
+        (b"hello", flat(sig), public_key),
+    ]
+    expected = [True, False, False, False, False, False, False, True]
+    try:
+        assert sphincs.spx_verify_batch(items, params=params, workers=2) == expected
+        assert list(sphincs.spx_verify_iter(items, params=params, workers=2, chunk_size=3)) == expected
+    finally:
+        shutdown_pools()
+
+def test_verify_batch_without_valid_items_starts_no_pool(monkeypatch):
+    def no_pool(workers=None):
+        raise AssertionError("pool started")
+    monkeypatch.setattr(sphincs, "get_pool", no_pool)
+    assert sphincs.spx_verify_batch([]) == []
+    assert list(sphincs.spx_verify_iter([])) == []
+    assert sphincs.spx_verify_batch([(b"m", None, None)]) == [False]
+    assert list(sphincs.spx_verify_iter([(b"m", None, None)] * 3, chunk_size=2)) == [False] * 3
+
+def test_adrs_layout_matches_baseline():
+    # layer (4) || tree address (12) || type (4) || three words (4 each), as the baseline to_bin produced
+    adrs = ADRS()
+    adrs.set_layer_address(5)
+    adrs.set_tree_address(0x0123456789abcdef01)
+    adrs.set_type(ADRS.FORS_TREE)
+    adrs.set_key_pair_address(0x2a)
+    adrs.set_tree_height(3)
+    adrs.set_tree_index(0x1234)
+    assert adrs.to_bin().hex() == "000000050000000123456789abcdef01000000030000002a0000000300001234"
+
+    other = adrs.copy()
+    other.set_type(ADRS.WOTS_HASH)
+    other.set_chain_address(7)
+    other.set_hash_address(9)
+    assert other.to_bin().hex() == "000000050000000123456789abcdef0100000000000000000000000700000009"
+    assert adrs.to_bin().hex() == "000000050000000123456789abcdef01000000030000002a0000000300001234"
+    assert ADRS(other.snapshot()).to_bin() == other.to_bin()
+    assert other.get_key_pair_address() == 0 and adrs.get_tree_height() == 3 and adrs.get_tree_index() == 0x1234
+
+def test_parameters_are_cached_and_frozen():
+    params = get_parameters("128f")
+    assert get_parameters("128f") is params
+    assert get_parameters("128f", prf=PRF_LEGACY) is not params
+    assert params["n"] == params.n == 16 and params.get("a") == 6
+    assert params.h_prime == 3 and params.len_0 == 35
+    assert params.sig_bytes == params.n + params.fors_bytes + params.ht_bytes == 17088
+    with pytest.raises(AttributeError):
+        params.n = 32
+    with pytest.raises(KeyError):
+        params["missing"]
+    assert {params: 1}[get_parameters("128f")] == 1
+
+def test_xmss_tree_matches_treehash():
+    params = get_parameters("128f")
+    secret_seed, _, public_seed, _ = fixed_key(params)
+    adrs = ADRS()
+    adrs.set_layer_address(1)
+    adrs.set_tree_address(5)
+    levels = xmss_tree(secret_seed, public_seed, adrs.copy(), params=params)
+    assert levels[-1] == [treehash(secret_seed, 0, params.h_prime, public_seed, adrs.copy(), params=params)]
+
+    for idx in range(0, 1 << params.h_prime):
+        expected = [treehash(secret_seed, ((idx >> j) ^ 1) << j, j, public_seed, adrs.copy(), params=params)
+                    for j in range(0, params.h_prime)]
+        assert xmss_auth_path(levels, idx) == expected
+
+    m = bytes(params.n)
+    sig_xmss, root = xmss_sign_root(m, secret_seed, 6, public_seed, adrs.copy(), params=params)
+    assert root == levels[-1][0]
+    assert xmss_pk_from_sig(6, sig_xmss, m, public_seed, adrs.copy(), params=params) == root
+
+def test_fors_tree_matches_treehash():
+    params = get_parameters("128f")
+    secret_seed, _, public_seed, _ = fixed_key(params)
+    t = params.t
+    adrs = ADRS()
+    adrs.set_tree_address(3)
+    adrs.set_type(ADRS.FORS_TREE)
+    adrs.set_key_pair_address(2)
+
+    for i, idx in ((0, 0), (5, 37), (params.k - 1, t - 1)):
+        sk, auth, root = fors_tree(secret_seed, i, idx, public_seed, adrs.copy(), params=params)
+        assert sk == fors_sk_gen(secret_seed, adrs.copy(), i * t + idx, params=params)
+        assert root == fors_treehash(secret_seed, i * t, params.a, public_seed, adrs.copy(), params=params)
+        assert auth == [fors_treehash(secret_seed, i * t + (((idx >> j) ^ 1) << j), j, public_seed, adrs.copy(), params=params)
+                        for j in range(0, params.a)]
+
+@pytest.mark.parametrize("start, steps, expected", [
+    (0, 15, "dada0847d9648065e0229a0d85fc876b"),
+    (3, 5, "74e596d368c32c4d509473b02bb88cb6"),
+    (14, 1, "2c93d78913ba305d6721fcea7dcf9a3a"),
+    (0, 0, "000102030405060708090a0b0c0d0e0f"),
+])
+def test_chain_matches_baseline(start, steps, expected):
+    # Values of the baseline recursive chain for the same input and address
+    params = get_parameters("128f")
+    adrs = ADRS()
+    adrs.set_layer_address(2)
+    adrs.set_tree_address(7)
+    adrs.set_type(ADRS.WOTS_HASH)
+    adrs.set_key_pair_address(4)
+    adrs.set_chain_address(11)
+    x = bytes(range(16))
+    public_seed = bytes(range(100, 116))
+    assert chain(x, start, steps, public_seed, adrs, params=params).hex() == expected
+
+def test_tree_cache_evicts_lowest_layer_first():
+    levels = [[bytes(16)] * 2, [bytes(16)]]
+    size = TreeCache.levels_size(levels)
+    cache = TreeCache(max_bytes=3 * size)
+    cache.put("k", 2, 0, levels)
+    cache.put("k", 0, 1, levels)
+    cache.put("k", 0, 2, levels)
+    assert cache.get("k", 0, 1) is levels
+    cache.put("k", 1, 0, levels)
+
+    # over budget: layer 0 goes first, least recently used entry of it first
+    assert len(cache) == 3 and cache.bytes == 3 * size
+    assert cache.get("k", 0, 2) is None
+    assert cache.get("k", 0, 1) is levels
+    assert cache.get("k", 2, 0) is levels and cache.get("k", 1, 0) is levels
+    assert cache.stats.as_dict() == {
+        "hits": 4, "misses": 1, "evictions": 1,
+        "layer_hits": {0: 2, 1: 1, 2: 1}, "layer_misses": {0: 1}
+    }
+
+    # larger than the whole budget: never cached, nothing evicted for it
+    cache.put("k", 3, 0, [[bytes(16)] * 64])
+    assert cache.get("k", 3, 0) is None and len(cache) == 3
+
+    skipped = TreeCache(max_bytes=size, min_layer=1)
+    skipped.put("k", 0, 0, levels)
+    assert len(skipped) == 0 and skipped.get("k", 0, 0) is None
+
+def test_sign_with_cache_matches_uncached(deterministic):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+    cache = TreeCache()
+    expected = sphincs.spx_sign(b"hello", secret_key, params=params)
+    assert sphincs.spx_sign(b"hello", secret_key, params=params, cache=cache) == expected
+    assert sphincs.spx_sign(b"hello", secret_key, params=params, cache=cache) == expected
+    assert cache.stats.hits == params.d and cache.stats.misses == params.d
+
+def test_warmed_up_signer_matches_serial(deterministic):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+    signer = Signer(secret_key, params=params, memo_layers=1)
+    signer.warm_up()
+    assert len(signer.memo) == 1 << params.h_prime
+
+    for m in (b"hello", b"world"):
+        assert signer.sign(m) == sphincs.spx_sign(m, secret_key, params=params)
+    assert signer.memo.misses == 0 and signer.memo.hits == 2
+
+def test_instrument_counts_only_the_collecting_thread(deterministic):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+    seen = []
+    with instrument.collect() as stats:
+        sig = sphincs.spx_sign(b"hello", secret_key, params=params)
+        thread = threading.Thread(target=lambda: seen.append(instrument.current()))
+        thread.start()
+        thread.join()
+    assert seen == [None] and instrument.current() is None
+    assert stats.hash_msg == 1 and stats.prf_msg == 1
+    assert stats.total_hashes() > 0 and set(stats.as_dict()["phases"]) >= {"hash_msg", "fors", "ht"}
+
+    signed = stats.total_hashes()
+    with instrument.collect(stats):
+        assert sphincs.spx_verify(b"hello", sig, secret_key[2:], params=params)
+    assert stats.hash_msg == 2 and signed < stats.total_hashes()
+    # the legacy PRF hashes internally; that must not show up as hash_msg calls
+    with instrument.collect() as legacy:
+        sphincs.spx_sign(b"hello", fixed_key(get_parameters("128f", prf=PRF_LEGACY)), params=get_parameters("128f", prf=PRF_LEGACY))
+    assert legacy.hash_msg == 1
+
+def test_progress_reports_and_cancels(deterministic):
+    params = get_parameters("128f")
+    secret_key = fixed_key(params)
+    reports = []
+    with instrument.reporting(lambda *event: reports.append(event)):
+        sig = sphincs.spx_sign(b"hello", secret_key, params=params)
+    assert sig == sphincs.spx_sign(b"hello", secret_key, params=params)
+    assert [e for e in reports if e[0] == "fors"][-1] == ("fors", params.k, params.k)
+    assert [e[1] for e in reports if e[0] == "ht"] == list(range(1, params.d + 1))
+
+    def cancel_in_hypertree(stage, done, total):
+        if stage == "ht":
+            raise instrument.Cancelled()
+    with pytest.raises(instrument.Cancelled):
+        with instrument.reporting(cancel_in_hypertree):
+            sphincs.spx_sign(b"hello", secret_key, params=params)
+    instrument.progress("ht", 1, 1)
@@ -0,0 +1,36 @@
+import base64
+import io
+import json
+
+from src.parameters import get_parameters
+from src.sphincs import spx_keygen, spx_verify
+from src.stream import process_stream
+
+def b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+def test_process_stream_ordered_with_malformed_records():
+    params = get_parameters("128f")
+    sk, pk = spx_keygen(params=params)
+    keys = {"release": (params, sk), "public": (params, pk)}
+    lines = [json.dumps({"id": i, "op": "sign", "key": "release", "message": b64(bytes([i]))}) + "\n" for i in range(6)]
+    lines[2] = "not json\n"
+    lines[4] = json.dumps({"id": 4, "op": "sign", "key": "public", "message": b64(b"x")}) + "\n"
+    lines.insert(3, "\n")
+    out = io.StringIO()
+
+    stats = process_stream(lines, out, keys, workers=2, chunk_size=2, ordered=True)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert stats.records == 6 and stats.errors == 2
+    assert [r.get("id") for r in results] == [0, 1, None, 3, 4, 5]
+    assert [r["ok"] for r in results] == [True, True, False, True, False, True]
+    for r in results:
+        if r["ok"]:
+            signature = base64.b64decode(r["signature"])
+            assert spx_verify(bytes([r["id"]]), signature, pk, params=params)
+
+    verify = [json.dumps({"id": 0, "key": "public", "message": b64(bytes([0])), "signature": results[0]["signature"]}),
+              json.dumps({"id": 1, "key": "public", "message": b64(b"other"), "signature": results[0]["signature"]})]
+    out = io.StringIO()
+    process_stream(verify, out, keys, workers=1, ordered=True)
+    assert [json.loads(line)["valid"] for line in out.getvalue().splitlines()] == [True, False]
@@ -0,0 +1,32 @@
+import multiprocessing
+
+import pytest
+
+from src import worker
+from src.parameters import get_parameters
+
+def test_keys_and_signers_are_bounded(monkeypatch):
+    monkeypatch.setattr(worker, "MAX_KEYS", 3)
+    params = get_parameters("128f")
+    worker.init_worker({})
+    for i in range(5):
+        worker.add_key(i, params, [bytes([i]) * 16] * 4)
+        worker.signer(i)
+
+    with pytest.raises(worker.UnknownKey):
+        worker.key_state(0)
+    assert list(worker._keys) == [2, 3, 4]
+    assert len(worker._signers) <= worker.MAX_SIGNERS
+
+def test_init_worker_keeps_a_signer_per_secret_key():
+    params = get_parameters("128f")
+    keys = {i: (params, [bytes([i]) * 16] * 4) for i in range(worker.MAX_SIGNERS + 2)}
+    worker.init_worker(keys)
+    for name in keys:
+        worker.signer(name)
+    assert len(worker._signers) == len(keys)
+
+def test_only_one_worker_claims_the_warm_up():
+    claim = multiprocessing.Value("b", 0)
+    assert [worker.claim_warm_up(claim) for _ in range(3)] == [True, False, False]
+    assert not worker.claim_warm_up(None)